@@ -87,6 +87,8 @@ class Problem:
         if "comparator" in kwargs: self.default_cmp = eval(kwargs["comparator"])
         self.weight = kwargs.get("weight", 1)
         self.default_timeout = kwargs.get("timeout", 1)
+        # The speed test kernels that represent the work of this problem (None to use all of them)
+        self.profile = kwargs.get("profile", None)
         self.grade = 0
         self.maximum_grade = 0
     
@@ -141,9 +143,10 @@ class Problem:
 
 def main(args: argparse.Namespace):
     time_scale = args.timescale
+    kernel_multipliers = None
     if time_scale.lower() == "default":
         import speed_test
-        time_scale = speed_test.get_time_limit_multiplier()
+        kernel_multipliers = speed_test.get_kernel_multipliers()
     else:
         time_scale = float(time_scale)
 
@@ -174,6 +177,8 @@ def main(args: argparse.Namespace):
     else:
         problems = [(problem, "*") for index, problem in enumerate(problems)]
     for problem, pattern in problems:
+        if kernel_multipliers is not None:
+            time_scale = speed_test.profile_multiplier(kernel_multipliers, problem.profile)
         problem.run(args.debug, pattern, time_scale)
         print()
         total_grade += problem.grade
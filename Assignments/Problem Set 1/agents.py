@@ -1,6 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Dict, Generic, List
+from typing import Callable, Dict, Generic, Iterable, List, Optional, Tuple
+import math, time
+
+from frontier import IndexedPriorityQueue
 from problem import HeuristicFunction, Problem, S, A, Solution
+from search_stats import SearchStats
 
 # This is an abstract class for all goal based agents
 class GoalBasedAgent(ABC, Generic[S, A]):
@@ -66,4 +70,125 @@ class InformedSearchAgent(GoalBasedAgent[S, A]):
             for action in solution:
                 self.policy[current] = action
                 current = problem.get_successor(current, action)
-        return self.policy.get(state)
\ No newline at end of file
+        return self.policy.get(state)
+
+# A heuristic that estimates the path cost between any two states (it must be consistent: h(a, c) <= h(a, b) + cost(b, c))
+# (e.g. the manhattan distance between the player positions of two dungeon states)
+PairwiseHeuristic = Callable[[Problem[S, A], S, S], float]
+
+# This agent plans with D* Lite: it searches backward from the goal states to its current state
+# and keeps the g-values between its decisions, so after it moves or after some action costs change
+# only the states whose distance to the goal changed are expanded again instead of searching from scratch.
+# It needs a reversible problem (get_goal_states and get_predecessors must be implemented).
+# If the problem changes (e.g. a wall is added or an action cost changes), call notify_changes with the changed state-action pairs.
+# If a stats object is given, every plan and repair is reported to it as a search.
+class IncrementalReplanningAgent(GoalBasedAgent[S, A]):
+    def __init__(self, heuristic: Optional[PairwiseHeuristic] = None, stats: Optional[SearchStats] = None) -> None:
+        super().__init__()
+        self.heuristic = heuristic or (lambda *_: 0)
+        self.stats = stats
+        self.problem: Optional[Problem[S, A]] = None
+        # The number of states expanded by all the plans and repairs (to compare with searching from scratch)
+        self.expanded = 0
+        # The number of frontier entries pushed by all the plans and repairs
+        self.generated = 0
+
+    # Starts a new plan for the given problem
+    def reset(self, problem: Problem[S, A], start: S) -> None:
+        self.problem = problem
+        self.start = start
+        # The start state when the key modifier was last updated
+        self.last_start = start
+        # The key modifier: instead of updating the keys of the whole frontier when the start moves,
+        # the distance moved is added to the keys of the new entries
+        self.key_modifier = 0.0
+        # g is the cost to the goal found by the last expansion of a state
+        # and rhs is the one step lookahead: the best cost through the successors' g-values
+        self.g: Dict[S, float] = {}
+        self.rhs: Dict[S, float] = {}
+        self.goals = set(problem.get_goal_states())
+        self.frontier: IndexedPriorityQueue[S, None] = IndexedPriorityQueue()
+        for goal in self.goals:
+            self.rhs[goal] = 0.0
+            self.frontier.push(goal, self.key(goal))
+            self.generated += 1
+
+    def key(self, state: S) -> Tuple[float, float]:
+        value = min(self.g.get(state, math.inf), self.rhs.get(state, math.inf))
+        return value + self.heuristic(self.problem, self.start, state) + self.key_modifier, value
+
+    # Returns the cheapest (cost to the goal, action) over the actions of the state
+    def best_action(self, state: S) -> Tuple[float, Optional[A]]:
+        problem, g = self.problem, self.g
+        best, best_action = math.inf, None
+        for action in problem.get_actions(state):
+            value = problem.get_cost(state, action) + g.get(problem.get_successor(state, action), math.inf)
+            if value < best:
+                best, best_action = value, action
+        return best, best_action
+
+    def update_state(self, state: S) -> None:
+        if state not in self.goals:
+            self.rhs[state] = self.best_action(state)[0]
+        if self.g.get(state, math.inf) != self.rhs.get(state, math.inf):
+            self.frontier.push(state, self.key(state))
+            self.generated += 1
+        else:
+            self.frontier.remove(state)
+
+    # Expands the states whose cost to the goal changed until the cost of the start state is known
+    def compute_plan(self) -> None:
+        frontier, g, rhs = self.frontier, self.g, self.rhs
+        start = self.start
+        while frontier:
+            if self.stats is not None: self.stats.observe_frontier(len(frontier))
+            state, old_key, _ = frontier.peek()
+            if not (old_key < self.key(start) or rhs.get(start, math.inf) != g.get(start, math.inf)):
+                break
+            new_key = self.key(state)
+            if old_key < new_key:
+                # The key is outdated since the start moved
+                frontier.push(state, new_key)
+                continue
+            frontier.pop()
+            self.expanded += 1
+            if g.get(state, math.inf) > rhs.get(state, math.inf):
+                g[state] = rhs[state]
+            else:
+                g[state] = math.inf
+                self.update_state(state)
+            for previous, _ in self.problem.get_predecessors(state):
+                self.update_state(previous)
+
+    # Tells the agent that the cost or the result of these actions changed
+    def notify_changes(self, changes: Iterable[Tuple[S, A]]) -> None:
+        if self.problem is None: return
+        search_start, expanded, generated = time.perf_counter(), self.expanded, self.generated
+        for state, _ in changes:
+            self.update_state(state)
+        self._report(search_start, expanded, generated, searches=0)
+
+    # Adds the work done since the given counters were read to the stats object (if any)
+    def _report(self, search_start: float, expanded: int, generated: int, searches: int = 1) -> None:
+        if self.stats is None: return
+        self.stats.nodes_expanded += self.expanded - expanded
+        self.stats.nodes_generated += self.generated - generated
+        self.stats.searches += searches
+        self.stats.add_phase_time("search", time.perf_counter() - search_start)
+
+    def act(self, problem: Problem[S, A], state: S) -> A:
+        search_start, expanded, generated = time.perf_counter(), self.expanded, self.generated
+        if problem is not self.problem:
+            self.reset(problem, state)
+        # The keys in the frontier were computed for the last start, the distance moved since then is covered by the key modifier
+        # (it must be updated on every move, otherwise the keys pushed later are too small compared to the old ones)
+        self.key_modifier += self.heuristic(problem, self.last_start, state)
+        self.last_start = state
+        self.start = state
+        self.compute_plan()
+        cost, action = self.best_action(state)
+        self._report(search_start, expanded, generated)
+        # if no solution was found, we return None
+        if cost == math.inf:
+            return None
+        return action
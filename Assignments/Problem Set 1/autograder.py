@@ -87,10 +87,12 @@ class Problem:
         if "comparator" in kwargs: self.default_cmp = eval(kwargs["comparator"])
         self.weight = kwargs.get("weight", 1)
         self.default_timeout = kwargs.get("timeout", 1)
+        # The speed test kernels that represent the work of this problem (None to use all of them)
+        self.profile = kwargs.get("profile", None)
         self.grade = 0
         self.maximum_grade = 0
     
-    def run(self):
+    def run(self, time_scale: float = 1):
         print(f"Problem: {self.name}")
         test_cases = get_test_cases(os.path.join(root, self.testcases_path))
         self.grade = 0
@@ -98,7 +100,7 @@ class Problem:
         for test_index, test_case in enumerate(test_cases):
             description = test_case.get("description", f"Test Case {test_index+1}")
             timeout = test_case.get("timeout", self.default_timeout)
-            print(f"{test_index+1}: {description} :: time-limit = {timeout}sec")
+            print(f"{test_index+1}: {description} :: time-limit = {timeout*time_scale}sec")
             fn = self.default_fn
             if "function" in test_case: fn = eval(test_case["function"])
             input_args = test_case.get("input_args", [])
@@ -113,7 +115,7 @@ class Problem:
             weight = test_case.get("weight", 1)
             maximum_grade = self.weight * weight * test_case.get("maximum_grade", 1)
             self.maximum_grade += maximum_grade
-            result = run_test(fn, fn_args, cmp, cmp_args, timeout)
+            result = run_test(fn, fn_args, cmp, cmp_args, timeout * time_scale)
             if result is None:
                 print("Function is not implemented yet")
                 continue
@@ -140,6 +142,13 @@ def main(args: argparse.Namespace):
     name, problems = read_problems()
     set_solution_path(args.solution)
     problems = [Problem(**problem) for problem in problems]
+    time_scale = args.timescale
+    kernel_multipliers = None
+    if time_scale.lower() == "default":
+        import speed_test
+        kernel_multipliers = speed_test.get_kernel_multipliers()
+    else:
+        time_scale = float(time_scale)
     print(f"\n{name}\n")
     total_grade = 0
     maximum_grade = 0
@@ -158,7 +167,9 @@ def main(args: argparse.Namespace):
         except:
             pass
     for problem in problems:
-        problem.run()
+        if kernel_multipliers is not None:
+            time_scale = speed_test.profile_multiplier(kernel_multipliers, problem.profile)
+        problem.run(time_scale)
         print()
         total_grade += problem.grade
         maximum_grade += problem.maximum_grade
@@ -169,5 +180,6 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Automatically grades the solutions for the problem set")
     parser.add_argument("--question", "-q", default="all", help="choose the question(s) to include in the grading (or prefix with ~ to exclude)")
     parser.add_argument("--solution", "-s", default="")
+    parser.add_argument("--timescale", "-t", type=str, default="default", help="A scaling factor for the timeout")
     args = parser.parse_args()
     main(args)
\ No newline at end of file
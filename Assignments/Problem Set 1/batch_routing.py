@@ -0,0 +1,190 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse, heapq, json, multiprocessing, time
+
+from graph import CompactGraph, CompactGraphProblem, compact_graph_heuristic
+from search import AStarSearch
+
+# This file contains the batch version of the graph routing problem: many (start, goal) queries on the same graph
+# The graph is loaded and converted to the compact format once, and everything that only depends on the graph
+# (the landmarks, the contraction hierarchy, ...) is built once and shared by all the queries.
+# The queries that start from the same node are answered by a single Dijkstra search that stops once all their goals are reached.
+# Large batches are split in chunks that are solved by a pool of processes and the results are returned as soon as they are ready.
+
+# The available algorithms
+ALGORITHMS = ("dijkstra", "astar", "landmarks", "ch")
+
+# Batches with fewer queries than this are solved in the current process (starting the pool would take longer)
+PARALLEL_THRESHOLD = 256
+
+# The number of queries in each chunk sent to the pool
+CHUNK_SIZE = 64
+
+# The answer of a query: the node names after the start (the same format as the path returned by the search functions)
+# and the path cost (the path is None and the cost is infinity if the goal can not be reached)
+@dataclass(frozen=True)
+class RouteResult:
+    index: int      # The position of the query in the batch (the results are not returned in order)
+    start: str
+    goal: str
+    path: Optional[List[str]]
+    cost: float
+
+# Everything that is shared by the queries on one graph
+class RoutingContext:
+    def __init__(self, graph_path: str, algorithm: str) -> None:
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown algorithm '{algorithm}', expected one of {', '.join(ALGORITHMS)}")
+        self.graph_path = graph_path
+        self.algorithm = algorithm
+        # Only the compact graph is built (the queries never need the GraphNode objects)
+        with open(graph_path, 'r') as f:
+            self.graph = CompactGraph.from_definition(json.load(f).get("graph", {}))
+        # The landmarks and the hierarchy are loaded from the files next to the graph (or built and saved there)
+        self.heuristic = compact_graph_heuristic
+        self.hierarchy = None
+        if algorithm == "landmarks":
+            from landmarks import LandmarkHeuristic
+            self.heuristic = LandmarkHeuristic.load_or_build(self.graph, graph_path)
+        elif algorithm == "ch":
+            from contraction_hierarchy import ContractionHierarchy
+            self.hierarchy = ContractionHierarchy.load_or_build(self.graph, graph_path)
+
+    # Returns the node number of every name (a ValueError is raised for unknown names)
+    def intern(self, name: str) -> int:
+        node = self.graph.ids.get(name)
+        if node is None:
+            raise ValueError(f"Unknown node '{name}' in graph '{self.graph_path}'")
+        return node
+
+    def result(self, index: int, start: int, goal: int, nodes: Optional[List[int]]) -> RouteResult:
+        names = self.graph.names
+        if nodes is None:
+            return RouteResult(index, names[start], names[goal], None, float('inf'))
+        graph = self.graph
+        cost = sum(graph.costs[graph.edge(source, target)] for source, target in zip(nodes, nodes[1:]))
+        return RouteResult(index, names[start], names[goal], [names[node] for node in nodes[1:]], cost)
+
+    # Solves the queries (index, start node, goal node) and returns their results
+    def solve(self, queries: List[Tuple[int, int, int]]) -> List[RouteResult]:
+        if self.algorithm == "dijkstra":
+            return self.solve_by_source(queries)
+        results = []
+        for index, start, goal in queries:
+            if self.hierarchy is not None:
+                answer = self.hierarchy.query(start, goal)
+                nodes = None if answer is None else answer[1]
+            else:
+                edges = AStarSearch(CompactGraphProblem(self.graph, start, goal), start, self.heuristic)
+                nodes = None if edges is None else [start] + [self.graph.targets[edge] for edge in edges]
+            results.append(self.result(index, start, goal, nodes))
+        return results
+
+    # Answers the queries that share a start node with one Dijkstra search that stops when all of their goals are settled
+    def solve_by_source(self, queries: List[Tuple[int, int, int]]) -> List[RouteResult]:
+        goals_by_start: Dict[int, List[Tuple[int, int]]] = {}
+        for index, start, goal in queries:
+            goals_by_start.setdefault(start, []).append((index, goal))
+        results = []
+        offsets, targets, costs = self.graph.offsets, self.graph.targets, self.graph.costs
+        for start, goals in goals_by_start.items():
+            remaining = set(goal for _, goal in goals)
+            distances = {start: 0.0}
+            parents = {start: -1}
+            queue = [(0.0, start)]
+            while queue and remaining:
+                distance, node = heapq.heappop(queue)
+                if distance > distances[node]: continue
+                remaining.discard(node)
+                for edge in range(offsets[node], offsets[node + 1]):
+                    next_node, next_distance = targets[edge], distance + costs[edge]
+                    if next_distance < distances.get(next_node, float('inf')):
+                        distances[next_node] = next_distance
+                        parents[next_node] = node
+                        heapq.heappush(queue, (next_distance, next_node))
+            for index, goal in goals:
+                nodes = None
+                if goal in distances and goal not in remaining:
+                    nodes, node = [], goal
+                    while node != -1:
+                        nodes.append(node)
+                        node = parents[node]
+                    nodes.reverse()
+                results.append(self.result(index, start, goal, nodes))
+        return results
+
+# The context of the current worker process, it is only set in the workers by _initialize_worker
+# (the parent process never sets it, it passes its context to every pool in the initializer arguments)
+_worker_context: Optional[RoutingContext] = None
+
+# With the "fork" start method, the context is inherited by the workers without being copied or loaded again
+# With the other start methods, the context can not be sent cheaply so every worker loads the graph files itself
+def _initialize_worker(context: Optional[RoutingContext], graph_path: str, algorithm: str) -> None:
+    global _worker_context
+    _worker_context = context if context is not None else RoutingContext(graph_path, algorithm)
+
+def _solve_chunk(queries: List[Tuple[int, int, int]]) -> List[RouteResult]:
+    return _worker_context.solve(queries)
+
+# Splits the queries in chunks, keeping the queries with the same start together for the one-to-many Dijkstra
+# If split is True, a start with more than "size" queries is split in several chunks so the workers share its queries
+# (each of its chunks runs its own Dijkstra search, so the queries solved in the current process are never split)
+def _chunks(queries: List[Tuple[int, int, int]], size: int, split: bool = True) -> List[List[Tuple[int, int, int]]]:
+    by_start: Dict[int, List[Tuple[int, int, int]]] = {}
+    for query in queries:
+        by_start.setdefault(query[1], []).append(query)
+    chunks, chunk = [], []
+    for group in by_start.values():
+        step = size if split else len(group)
+        for offset in range(0, len(group), step):
+            chunk.extend(group[offset: offset + step])
+            if len(chunk) >= size:
+                chunks.append(chunk)
+                chunk = []
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+# Solves every (start name, goal name) query on the graph and yields the results as soon as they are ready
+# The results are not in the order of the queries, use RouteResult.index to match them
+# If processes is 1 (or the batch is small), everything is solved in the current process
+def solve_many(graph_path: str, queries: Iterable[Tuple[str, str]], algorithm: str = "dijkstra",
+               processes: Optional[int] = None, context: Optional[RoutingContext] = None) -> Iterator[RouteResult]:
+    if context is None:
+        context = RoutingContext(graph_path, algorithm)
+    interned = [(index, context.intern(start), context.intern(goal)) for index, (start, goal) in enumerate(queries)]
+    if processes == 1 or len(interned) < PARALLEL_THRESHOLD:
+        for chunk in _chunks(interned, CHUNK_SIZE, split=False):
+            yield from context.solve(chunk)
+        return
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    initargs = (context if method == "fork" else None, graph_path, context.algorithm)
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context(method),
+                             initializer=_initialize_worker, initargs=initargs) as executor:
+        futures = [executor.submit(_solve_chunk, chunk) for chunk in _chunks(interned, CHUNK_SIZE)]
+        for future in as_completed(futures):
+            yield from future.result()
+
+# Reads the queries from a text file where every line contains a start name and a goal name separated by spaces
+def read_queries(path: str) -> List[Tuple[str, str]]:
+    with open(path, 'r') as f:
+        return [tuple(line.split()[:2]) for line in f if line.strip()]
+
+def main(args: argparse.Namespace):
+    start = time.time()
+    queries = read_queries(args.queries)
+    for result in sorted(solve_many(args.graph, queries, args.algorithm, args.processes), key=lambda result: result.index):
+        path = "no path" if result.path is None else '->'.join([result.start] + result.path)
+        print(f"{result.start} -> {result.goal}: {path} (cost: {result.cost})")
+    print(f"Solved {len(queries)} queries in {time.time() - start} seconds")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve many routing queries on one graph")
+    parser.add_argument("graph", help="path to the graph")
+    parser.add_argument("queries", help="path to a text file with a 'start goal' pair of node names on every line")
+    parser.add_argument("--algorithm", "-a", default="dijkstra", choices=ALGORITHMS,
+                        help="the algorithm used to answer the queries")
+    parser.add_argument("--processes", "-p", type=int, default=None,
+                        help="the number of worker processes (1 to solve everything in this process)")
+    main(parser.parse_args())
@@ -0,0 +1,105 @@
+from typing import Callable, Dict, List
+import argparse, json, platform, random, timeit
+
+from mathutils import Point, PointTable, TuplePoint
+
+# This file contains the micro-benchmarks of the Point implementations
+# Every kernel runs one operation over the same list of coordinates for each implementation,
+# so the loop overhead is the same for all of them and the difference is the cost of the operation itself.
+# Run it from the problem set directory: python -m bench.point_benchmark
+
+# The implementations that are compared: a function that creates a point from its coordinates
+IMPLEMENTATIONS: Dict[str, Callable[[int, int], object]] = {
+    "dataclass": Point,             # The frozen dataclass with slots (the one used by the problems)
+    "tuple": TuplePoint,            # The tuple subclass
+    "shared": PointTable(256).at,   # The dataclass points but every coordinate is created once and then looked up in a point table
+}
+
+# Returns the kernels of an implementation: every kernel is a function that runs its operation once per coordinate
+def make_kernels(factory: Callable[[int, int], object], size: int, seed: int = 0) -> Dict[str, Callable[[], None]]:
+    rng = random.Random(seed)
+    coordinates = [(rng.randrange(256), rng.randrange(256)) for _ in range(size)]
+    points = [factory(x, y) for x, y in coordinates]
+    vector = factory(1, 0)
+    # Half of the points are in the set (like a walkable check on a grid where half of the cells are walls)
+    walkable = set(points[::2])
+
+    def construction():
+        for x, y in coordinates:
+            factory(x, y)
+
+    def hashing():
+        for point in points:
+            hash(point)
+
+    def addition():
+        for point in points:
+            point + vector
+
+    def membership():
+        for point in points:
+            point in walkable
+
+    def unpacking():
+        for point in points:
+            x, y = point
+
+    def attributes():
+        for point in points:
+            point.x, point.y
+
+    return {
+        "construction": construction,
+        "hashing": hashing,
+        "addition": addition,
+        "membership": membership,
+        "unpacking": unpacking,
+        "attributes": attributes,
+    }
+
+# Runs every kernel of every implementation and returns the time per operation in nanoseconds
+# (the best of "repeat" runs, since the slower runs are slowed down by the rest of the system)
+def run(size: int = 100_000, repeat: int = 5, implementations: List[str] = None) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name in implementations or list(IMPLEMENTATIONS):
+        kernels = make_kernels(IMPLEMENTATIONS[name], size)
+        results[name] = {
+            kernel: min(timeit.repeat(function, number=1, repeat=repeat)) / size * 1e9
+            for kernel, function in kernels.items()
+        }
+    return results
+
+def format_table(results: Dict[str, Dict[str, float]]) -> str:
+    names = list(results)
+    kernels = list(next(iter(results.values())))
+    baseline = names[0]
+    lines = [f"{'kernel':<14}" + ''.join(f"{name:>22}" for name in names)]
+    for kernel in kernels:
+        row = f"{kernel:<14}"
+        for name in names:
+            value = results[name][kernel]
+            # Every implementation is also shown relative to the first one (lower is faster)
+            row += f"{value:>12.1f} ns ({value / results[baseline][kernel]:4.2f}x)"
+        lines.append(row)
+    return '\n'.join(lines)
+
+def main(args: argparse.Namespace):
+    results = run(args.size, args.repeat, args.implementations)
+    print(format_table(results))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                "python": platform.python_version(),
+                "size": args.size,
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the Point implementations")
+    parser.add_argument("--size", "-n", type=int, default=100_000, help="the number of points used by every kernel")
+    parser.add_argument("--repeat", "-r", type=int, default=5, help="the number of runs of every kernel (the best one is kept)")
+    parser.add_argument("--implementations", "-i", nargs="+", choices=list(IMPLEMENTATIONS), default=None,
+                        help="the implementations to compare (all of them by default)")
+    parser.add_argument("--json", default=None, help="export the results to the given json file")
+    main(parser.parse_args())
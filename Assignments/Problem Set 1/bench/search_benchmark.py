@@ -0,0 +1,321 @@
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+import argparse, glob, json, math, os, platform, random, re, sys, time, tracemalloc
+
+from problem import HeuristicFunction, Problem
+from graph import GraphRoutingProblem, graphrouting_heuristic
+from dungeon import DungeonProblem, DungeonTile
+from parking import ParkingProblem
+from search_stats import SearchStats, current_commit
+from frontier import LazyPriorityQueue
+from helpers.utils import fetch_recorded_calls, fetch_tracked_call_count
+import search, dungeon_heuristic, parking_heuristic
+
+# This file contains the benchmark suite of the search functions
+# Every search function of search.py is run on the graphs, the dungeons and the parking lots of this problem set
+# and on generated instances of increasing size. For every run, we record:
+#   the wall time (the best of a few runs), the expanded nodes, the expanded nodes per second, the peak memory (using tracemalloc)
+#   and the length and cost of the solution
+# The results can be compared with a baseline file (bench/baselines/search.json is committed) to catch the regressions:
+# a run is reported if it got slower, used more memory or expanded more nodes than the baseline by more than the tolerance,
+# or if an optimal search returned a solution whose cost differs from the baseline.
+# Only the expanded nodes and the solution costs fail the comparison by default since they do not depend on the machine,
+# the wall time and the peak memory are advisory unless --gate-time is given (e.g. when comparing with a baseline of the same machine).
+# Regenerate the baseline with --update-baseline at the commit that changes the expected results.
+# Run it from the problem set directory: python -m bench.search_benchmark
+
+# The directory of the problem set (the instances are read relative to it)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The baseline that is compared by default
+DEFAULT_BASELINE = os.path.join(ROOT, "bench", "baselines", "search.json")
+
+# An instance is a problem to solve and the heuristic used by the informed searches
+# The problem is loaded again before each run so the caches of one run (e.g. the heuristic cache) do not help the next one
+@dataclass(frozen=True)
+class Instance:
+    name: str
+    domain: str     # "graph", "dungeon" or "parking"
+    load: Callable[[], Problem]
+    heuristic: HeuristicFunction
+
+# An algorithm runs one search function on a problem and returns its solution
+# The non deterministic ones (e.g. the portfolio which returns the first search to finish) do not have their expanded nodes compared
+# The optimal ones (whose solutions cost at most 1 times the optimal cost) must keep the solution cost of the baseline
+@dataclass(frozen=True)
+class Algorithm:
+    name: str
+    run: Callable[[Problem, HeuristicFunction, SearchStats], Optional[list]]
+    domains: Tuple[str, ...] = ("graph", "dungeon", "parking")
+    deterministic: bool = True
+    optimal: bool = False
+
+def _uninformed(search_fn, **kwargs) -> Callable[[Problem, HeuristicFunction, SearchStats], Optional[list]]:
+    return lambda problem, heuristic, stats: search_fn(problem, problem.get_initial_state(), stats=stats, **kwargs)
+
+def _informed(search_fn, **kwargs) -> Callable[[Problem, HeuristicFunction, SearchStats], Optional[list]]:
+    return lambda problem, heuristic, stats: search_fn(problem, problem.get_initial_state(), heuristic, stats=stats, **kwargs)
+
+# Jump Point Search works on the grid of a dungeon: it finds a path from the start to the exit (ignoring the coins)
+def _jump_point_search(problem: DungeonProblem, heuristic: HeuristicFunction, stats: SearchStats) -> Optional[list]:
+    layout = problem.layout
+    table = search.JumpPointTable(layout.grid, layout.width)
+    return search.JumpPointSearch(table, layout.cell(layout.start), layout.exit_cell, stats=stats)
+
+ALGORITHMS: List[Algorithm] = [
+    Algorithm("bfs", _uninformed(search.BreadthFirstSearch)),
+    Algorithm("dfs", _uninformed(search.DepthFirstSearch)),
+    Algorithm("ucs", _uninformed(search.UniformCostSearch), optimal=True),
+    Algorithm("ucs-lazy", _uninformed(search.UniformCostSearch, frontier_type=LazyPriorityQueue), optimal=True),
+    Algorithm("bidir", _uninformed(search.BidirectionalSearch), domains=("graph", "dungeon"), optimal=True),
+    Algorithm("astar", _informed(search.AStarSearch), optimal=True),
+    Algorithm("astar-lazy", _informed(search.AStarSearch, frontier_type=LazyPriorityQueue), optimal=True),
+    Algorithm("gbfs", _informed(search.BestFirstSearch)),
+    Algorithm("wastar", _informed(search.WeightedAStarSearch)),
+    Algorithm("arastar", _informed(search.AnytimeRepairingAStar)),
+    Algorithm("idastar", _informed(search.IterativeDeepeningAStar), optimal=True),
+    Algorithm("smastar", _informed(search.SimplifiedMemoryBoundedAStar), optimal=True),
+    Algorithm("portfolio", _informed(search.PortfolioSearch), deterministic=False),
+    Algorithm("jps", _jump_point_search, domains=("dungeon",)),
+]
+
+# The algorithms that are not run on some instances since they would need minutes and gigabytes of memory:
+#   the uninformed searches on the largest dungeon and parking lot and
+#   IDA* on the generated graphs (with real valued costs, almost every iteration only raises the threshold past one more path)
+UNINFORMED = {"bfs", "dfs", "ucs", "ucs-lazy", "bidir"}
+SKIPPED: Dict[str, Set[str]] = {
+    "dungeons/dungeon4": UNINFORMED,
+    "parks/park6": UNINFORMED,
+    "generated/graph32": {"idastar"},
+    "generated/graph64": {"idastar"},
+}
+
+# Generates a square dungeon with random walls, a corridor along two sides that guarantees a path from the start to the exit
+# and a few coins (the same size and seed always give the same dungeon)
+def generate_dungeon(size: int, coins: int = 2, wall_ratio: float = 0.25, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    tiles = [[DungeonTile.WALL if rng.random() < wall_ratio else DungeonTile.EMPTY for _ in range(size)] for _ in range(size)]
+    # The player starts at the bottom left corner and the exit is at the top right corner
+    # and the left column and the top row are always empty
+    for index in range(size):
+        tiles[index][0] = tiles[0][index] = DungeonTile.EMPTY
+    tiles[size - 1][0] = DungeonTile.PLAYER
+    tiles[0][size - 1] = DungeonTile.EXIT
+    # The coins are only put on the empty tiles that can be reached from the start
+    reachable, stack = {(0, size - 1)}, [(0, size - 1)]
+    while stack:
+        x, y = stack.pop()
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= nx < size and 0 <= ny < size and (nx, ny) not in reachable and tiles[ny][nx] != DungeonTile.WALL:
+                reachable.add((nx, ny))
+                stack.append((nx, ny))
+    empty = [(x, y) for y in range(size) for x in range(size) if tiles[y][x] == DungeonTile.EMPTY and (x, y) in reachable]
+    for x, y in rng.sample(empty, coins):
+        tiles[y][x] = DungeonTile.COIN
+    return '\n'.join(''.join(row) for row in tiles)
+
+# Generates the definition of a graph whose nodes are on a square grid and connected to their right, left, up and down neighbors
+# Some of the edges are removed (and some are one way) but the edges along the border always connect the start to the goal
+def generate_graph(size: int, removed_ratio: float = 0.2, seed: int = 0) -> Dict:
+    rng = random.Random(seed)
+    name = lambda x, y: f"n{x}_{y}"
+    graph = {name(x, y): {"position": [x, y], "adjacent": []} for y in range(size) for x in range(size)}
+    for y in range(size):
+        for x in range(size):
+            for dx, dy in ((1, 0), (0, 1)):
+                nx, ny = x + dx, y + dy
+                if nx >= size or ny >= size: continue
+                border = y == 0 or nx == size - 1
+                if not border and rng.random() < removed_ratio: continue
+                graph[name(x, y)]["adjacent"].append(name(nx, ny))
+                if border or rng.random() < 0.5:
+                    graph[name(nx, ny)]["adjacent"].append(name(x, y))
+    return {"graph": graph, "start": name(0, 0), "goal": name(size - 1, size - 1)}
+
+# The sizes of the generated instances (to see how the searches scale)
+GENERATED_SIZES = (16, 32, 64)
+
+# Returns all the instances of the benchmark
+def instances() -> Iterator[Instance]:
+    relative = lambda path: os.path.splitext(os.path.relpath(path, ROOT))[0].replace(os.sep, "/")
+    for path in sorted(glob.glob(os.path.join(ROOT, "graphs", "*.json"))):
+        yield Instance(relative(path), "graph", lambda path=path: GraphRoutingProblem.from_file(path), graphrouting_heuristic)
+    for path in sorted(glob.glob(os.path.join(ROOT, "dungeons", "*.txt"))):
+        yield Instance(relative(path), "dungeon", lambda path=path: DungeonProblem.from_file(path), dungeon_heuristic.strong_heuristic)
+    for path in sorted(glob.glob(os.path.join(ROOT, "parks", "*.txt"))):
+        yield Instance(relative(path), "parking", lambda path=path: ParkingProblem.from_file(path), parking_heuristic.strong_heuristic)
+    for size in GENERATED_SIZES:
+        text = generate_dungeon(size, seed=size)
+        yield Instance(f"generated/dungeon{size}", "dungeon", lambda text=text: DungeonProblem.from_text(text), dungeon_heuristic.strong_heuristic)
+    for size in GENERATED_SIZES:
+        definition = generate_graph(size, seed=size)
+        yield Instance(f"generated/graph{size}", "graph", lambda definition=definition: GraphRoutingProblem.from_definition(definition), graphrouting_heuristic)
+
+# The measurements of one algorithm on one instance
+@dataclass
+class BenchmarkResult:
+    instance: str
+    algorithm: str
+    wall_time: float            # The best wall time of the runs (in seconds)
+    nodes_expanded: int
+    nodes_per_second: float
+    peak_memory: int            # The peak memory allocated during the search (in bytes)
+    solution_length: Optional[int]
+    solution_cost: Optional[float] # The sum of the action costs of the solution (None if no solution was found)
+    deterministic: bool
+    optimal: bool
+
+    @property
+    def key(self) -> str:
+        return f"{self.instance}:{self.algorithm}"
+
+# The goal tests are tracked to count the explored nodes in the autograder, so the tracked calls are cleared after every run
+# (the recorded calls of the graph problem would otherwise keep growing and be counted in the memory of the next runs)
+def _clear_tracked_calls() -> None:
+    fetch_recorded_calls(GraphRoutingProblem.is_goal)
+    fetch_tracked_call_count(DungeonProblem.is_goal)
+    fetch_tracked_call_count(ParkingProblem.is_goal)
+
+# Returns the sum of the action costs of the solution starting from the initial state (None if there is no solution)
+def _solution_cost(problem: Problem, solution: Optional[list]) -> Optional[float]:
+    if solution is None:
+        return None
+    cost, state = 0, problem.get_initial_state()
+    for action in solution:
+        cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    return cost
+
+# Runs an algorithm on an instance "repeat" times to measure the time and one more time under tracemalloc to measure the memory
+# (tracemalloc slows down every allocation so the timed runs are done without it)
+def run_benchmark(instance: Instance, algorithm: Algorithm, repeat: int = 3) -> BenchmarkResult:
+    best_time, stats, solution = float('inf'), None, None
+    for _ in range(repeat):
+        problem = instance.load()
+        stats = SearchStats()
+        start = time.perf_counter()
+        solution = algorithm.run(problem, instance.heuristic, stats)
+        best_time = min(best_time, time.perf_counter() - start)
+        _clear_tracked_calls()
+    solution_cost = _solution_cost(problem, solution)
+    problem = instance.load()
+    tracemalloc.start()
+    try:
+        algorithm.run(problem, instance.heuristic, SearchStats())
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        _clear_tracked_calls()
+    return BenchmarkResult(
+        instance.name, algorithm.name, best_time, stats.nodes_expanded,
+        stats.nodes_expanded / best_time if best_time > 0 else 0.0,
+        peak_memory, None if solution is None else len(solution), solution_cost, algorithm.deterministic, algorithm.optimal,
+    )
+
+# Runs every algorithm on every instance whose "instance:algorithm" key matches the pattern (if any)
+def run_suite(pattern: Optional[str] = None, repeat: int = 3, verbose: bool = True) -> List[BenchmarkResult]:
+    results = []
+    for instance in instances():
+        for algorithm in ALGORITHMS:
+            if instance.domain not in algorithm.domains: continue
+            if algorithm.name in SKIPPED.get(instance.name, ()): continue
+            if pattern is not None and not re.search(pattern, f"{instance.name}:{algorithm.name}"): continue
+            result = run_benchmark(instance, algorithm, repeat)
+            if verbose:
+                print(format_result(result), flush=True)
+            results.append(result)
+    return results
+
+def format_result(result: BenchmarkResult) -> str:
+    cost = "no solution" if result.solution_cost is None else f"cost {result.solution_cost:.6g}"
+    return (f"{result.key:<36} {result.wall_time * 1000:10.2f} ms {result.nodes_expanded:9d} nodes "
+            f"{result.nodes_per_second:11.0f} nodes/s {result.peak_memory / 1024:10.1f} KiB {cost}")
+
+# The description of the machine that ran the benchmark (the times are only comparable on the same machine)
+def host_info() -> Dict[str, str]:
+    return {"machine": platform.machine(), "processor": platform.processor(), "system": platform.system(), "python": platform.python_version()}
+
+def save_results(path: str, results: List[BenchmarkResult]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({
+            "host": host_info(),
+            "commit": current_commit(),
+            "results": {result.key: asdict(result) for result in results},
+        }, f, indent=2)
+
+# The tolerances used to compare the results with the baseline
+# A result is a regression if it exceeds the baseline by more than the relative tolerance and the absolute slack
+# (the slack avoids reporting the noise of the searches that take a few microseconds)
+@dataclass(frozen=True)
+class Tolerances:
+    time: float = 0.5           # 50% slower
+    time_slack: float = 0.005   # and at least 5 milliseconds slower
+    memory: float = 0.25        # 25% more memory
+    memory_slack: int = 64 * 1024 # and at least 64 KiB more
+    nodes: float = 0.0          # any increase in the expanded nodes of a deterministic search
+    gate_time: bool = False     # if False, the wall time and the peak memory regressions are only advisory
+
+# Compares the results with the baseline and returns the regressions, the advisory regressions and the improvements as messages
+# (the wall time and the peak memory regressions are advisory unless tolerances.gate_time is True)
+# A deterministic optimal search that returns a solution of another cost than the baseline (or no solution) is always a regression
+def compare(results: List[BenchmarkResult], baseline: Dict, tolerances: Tolerances = Tolerances()) -> Tuple[List[str], List[str], List[str]]:
+    regressions, advisories, improvements = [], [], []
+    expected = baseline.get("results", {})
+    def check(key: str, label: str, value: float, old: float, relative: float, slack: float, unit: str, gated: bool = True) -> None:
+        if value > old * (1 + relative) and value - old > slack:
+            (regressions if gated else advisories).append(f"{key}: {label} increased from {old:.6g}{unit} to {value:.6g}{unit}")
+        elif value < old / (1 + relative) and old - value > slack:
+            improvements.append(f"{key}: {label} decreased from {old:.6g}{unit} to {value:.6g}{unit}")
+    for result in results:
+        old = expected.get(result.key)
+        if old is None: continue
+        check(result.key, "wall time", result.wall_time, old["wall_time"], tolerances.time, tolerances.time_slack, "s", tolerances.gate_time)
+        check(result.key, "peak memory", result.peak_memory, old["peak_memory"], tolerances.memory, tolerances.memory_slack, "B", tolerances.gate_time)
+        if result.deterministic:
+            check(result.key, "expanded nodes", result.nodes_expanded, old["nodes_expanded"], tolerances.nodes, 0, "")
+        if result.deterministic and result.optimal and "solution_cost" in old:
+            value, expected_cost = result.solution_cost, old["solution_cost"]
+            if (value is None) != (expected_cost is None) or (value is not None and not math.isclose(value, expected_cost, rel_tol=1e-9)):
+                regressions.append(f"{result.key}: solution cost changed from {expected_cost} to {value}")
+    return regressions, advisories, improvements
+
+def main(args: argparse.Namespace):
+    results = run_suite(args.filter, args.repeat)
+    if args.output:
+        save_results(args.output, results)
+    if args.update_baseline:
+        save_results(args.baseline, results)
+        print(f"Saved the baseline to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"There is no baseline at {args.baseline} (run with --update-baseline to create it)")
+        return
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    if baseline.get("host") != host_info():
+        print("WARNING: the baseline was recorded on another machine, the times and the memory are only indicative")
+    tolerances = Tolerances(time=args.time_tolerance, memory=args.memory_tolerance, nodes=args.nodes_tolerance, gate_time=args.gate_time)
+    regressions, advisories, improvements = compare(results, baseline, tolerances)
+    for message in improvements:
+        print("Improved:", message)
+    for message in advisories:
+        print("Slower (advisory):", message)
+    for message in regressions:
+        print("REGRESSION:", message)
+    print(f"{len(regressions)} regression(s), {len(advisories)} advisory regression(s) and {len(improvements)} improvement(s) compared with {args.baseline}")
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the search functions and compare them with a baseline")
+    parser.add_argument("--filter", "-f", default=None, help="only run the benchmarks whose 'instance:algorithm' matches this regular expression")
+    parser.add_argument("--repeat", "-r", type=int, default=3, help="the number of timed runs of every benchmark (the best one is kept)")
+    parser.add_argument("--output", "-o", default=None, help="export the results to the given json file")
+    parser.add_argument("--baseline", "-b", default=DEFAULT_BASELINE, help="the baseline to compare with")
+    parser.add_argument("--update-baseline", action="store_true", default=False, help="save the results as the new baseline instead of comparing")
+    parser.add_argument("--time-tolerance", type=float, default=Tolerances.time, help="the allowed relative increase of the wall time")
+    parser.add_argument("--memory-tolerance", type=float, default=Tolerances.memory, help="the allowed relative increase of the peak memory")
+    parser.add_argument("--nodes-tolerance", type=float, default=Tolerances.nodes, help="the allowed relative increase of the expanded nodes")
+    parser.add_argument("--gate-time", action="store_true", default=False, help="also fail on the wall time and peak memory regressions (they are advisory by default)")
+    main(parser.parse_args())
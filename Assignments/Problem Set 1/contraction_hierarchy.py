@@ -0,0 +1,329 @@
+from array import array
+from typing import Dict, List, Optional, Tuple, Union
+import heapq, os, time
+
+from graph import CompactGraph, CompactGraphProblem, GraphNode, GraphRoutingProblem, load_graph_arrays, save_graph_arrays
+from search_stats import SearchStats
+
+# This file contains the contraction hierarchy of the graph routing problem
+# The preprocessing removes ("contracts") the nodes one by one from the least important to the most important.
+# When a node is removed, a shortcut edge is added between each pair of its neighbors (u -> node -> w)
+# unless another path from u to w that is not longer exists without the node (a "witness").
+# The order in which the nodes were removed is their rank. Every shortest path of the graph then has an equivalent path
+# that only goes up in rank then only goes down, so a query runs two small Dijkstra searches that only follow edges
+# going up in rank: one forward from the start and one backward from the goal. They meet at the highest node of the path.
+# Finally, every shortcut on the path is replaced by the two edges it was made of.
+# The preprocessing is done once per graph and the hierarchy is saved next to the graph file.
+
+# The maximum number of nodes settled by a witness search
+# A smaller limit makes the preprocessing faster but it may add useless shortcuts (the queries are still exact)
+WITNESS_LIMIT = 200
+# The limit used to update the importance of the neighbors of each contracted node
+# and the number of edges above which a neighbor's importance is not simulated again
+ESTIMATE_WITNESS_LIMIT = 50
+ESTIMATE_DEGREE_LIMIT = 16
+
+# The contraction stops when the average degree of the remaining graph goes above this limit
+# since contracting the last (densest) nodes takes most of the preprocessing time.
+# These nodes are left as the "core": all their edges are kept in both directions and the queries search it like Dijkstra.
+CORE_DEGREE = 32
+
+# Returns the path where the hierarchy of the given graph file is saved (e.g. "graphs/graph1.json" -> "graphs/graph1.ch")
+def hierarchy_path(graph_path: str) -> str:
+    return os.path.splitext(graph_path)[0] + ".ch"
+
+# The upward edges of the hierarchy are stored in the compressed sparse row format (see CompactGraph)
+# The forward edges leaving node 'v' go to the higher nodes that 'v' has an edge to
+# and the backward edges of node 'v' go to the higher nodes that have an edge to 'v'
+# middles[e] is the node that the shortcut 'e' skips (-1 if 'e' is an edge of the original graph)
+class ContractionHierarchy:
+    def __init__(self, rank: array,
+                 forward: Tuple[array, array, array, array], backward: Tuple[array, array, array, array]) -> None:
+        self.rank = rank
+        self.forward = forward
+        self.backward = backward
+        # The skipped node of every shortcut u -> w (stored with the key u * size + w) to unpack the paths
+        size = len(rank)
+        shortcuts: Dict[int, int] = {}
+        offsets, targets, _, middles = forward
+        for node in range(size):
+            for edge in range(offsets[node], offsets[node + 1]):
+                if middles[edge] != -1:
+                    shortcuts[node * size + targets[edge]] = middles[edge]
+        offsets, sources, _, middles = backward
+        for node in range(size):
+            for edge in range(offsets[node], offsets[node + 1]):
+                if middles[edge] != -1:
+                    shortcuts[sources[edge] * size + node] = middles[edge]
+        self.shortcuts = shortcuts
+
+    def __len__(self) -> int:
+        return len(self.rank)
+
+    @staticmethod
+    def build(graph: CompactGraph, witness_limit: int = WITNESS_LIMIT, core_degree: float = CORE_DEGREE) -> 'ContractionHierarchy':
+        size = len(graph)
+        # The remaining graph: outgoing[u][w] = (cost, skipped node) and incoming[w][u] = cost
+        outgoing: List[Dict[int, Tuple[float, int]]] = [{} for _ in range(size)]
+        incoming: List[Dict[int, float]] = [{} for _ in range(size)]
+        offsets, targets, costs = graph.offsets, graph.targets, graph.costs
+        for node in range(size):
+            for edge in range(offsets[node], offsets[node + 1]):
+                target, cost = targets[edge], costs[edge]
+                if target != node and (target not in outgoing[node] or cost < outgoing[node][target][0]):
+                    outgoing[node][target] = (cost, -1)
+                    incoming[target][node] = cost
+
+        # Returns the shortcuts (u, w, cost) needed to contract the node
+        def shortcuts_of(node: int, witness_limit: int = witness_limit) -> List[Tuple[int, int, float]]:
+            shortcuts = []
+            exits = outgoing[node]
+            for source, first_cost in incoming[node].items():
+                wanted = {target: first_cost + cost for target, (cost, _) in exits.items() if target != source}
+                if not wanted: continue
+                limit = max(wanted.values())
+                # A Dijkstra from the source that ignores the node and stops after settling a few nodes
+                # It also stops when all the targets are settled
+                distances = {source: 0.0}
+                queue = [(0.0, source)]
+                settled, remaining = 0, len(wanted)
+                while queue and settled < witness_limit and remaining:
+                    distance, current = heapq.heappop(queue)
+                    if distance > distances[current]: continue
+                    if distance > limit: break
+                    settled += 1
+                    if current in wanted: remaining -= 1
+                    for next_node, (cost, _) in outgoing[current].items():
+                        if next_node == node: continue
+                        next_distance = distance + cost
+                        if next_distance < distances.get(next_node, float('inf')):
+                            distances[next_node] = next_distance
+                            heapq.heappush(queue, (next_distance, next_node))
+                for target, cost in wanted.items():
+                    if distances.get(target, float('inf')) > cost:
+                        shortcuts.append((source, target, cost))
+            return shortcuts
+
+        # The importance of a node is its edge difference (the shortcuts it adds minus the edges it removes)
+        # plus the number of its neighbors that were already contracted and its level in the hierarchy
+        # (so that the contracted nodes are spread over the graph and the hierarchy stays shallow)
+        contracted_neighbors = [0] * size
+        levels = [0] * size
+        def importance(node: int, shortcuts: List[Tuple[int, int, float]]) -> int:
+            return 2 * (len(shortcuts) - len(incoming[node]) - len(outgoing[node])) + contracted_neighbors[node] + levels[node]
+
+        priorities = [importance(node, shortcuts_of(node)) for node in range(size)]
+        queue = [(priority, node) for node, priority in enumerate(priorities)]
+        heapq.heapify(queue)
+        contracted = [False] * size
+        rank = array('i', [0]) * size
+        upward_forward: List[List[Tuple[int, float, int]]] = [[] for _ in range(size)]
+        upward_backward: List[List[Tuple[int, float, int]]] = [[] for _ in range(size)]
+        order = 0
+        edge_count = sum(len(edges) for edges in outgoing)
+        while queue and edge_count <= core_degree * (size - order):
+            priority, node = heapq.heappop(queue)
+            # Skip the outdated entries of the nodes whose importance was updated
+            if contracted[node] or priority != priorities[node]: continue
+            # The importance may have changed since it was computed (lazy update), so it is computed again
+            shortcuts = shortcuts_of(node)
+            priority = importance(node, shortcuts)
+            if queue and priority > queue[0][0]:
+                priorities[node] = priority
+                heapq.heappush(queue, (priority, node))
+                continue
+            contracted[node] = True
+            rank[node] = order
+            order += 1
+            # The edges that remain around the node all go to higher nodes
+            neighbors = set(outgoing[node]).union(incoming[node])
+            edge_count -= len(outgoing[node]) + len(incoming[node])
+            for target, (cost, middle) in outgoing[node].items():
+                upward_forward[node].append((target, cost, middle))
+                del incoming[target][node]
+            for source, cost in incoming[node].items():
+                upward_backward[node].append((source, cost, outgoing[source][node][1]))
+                del outgoing[source][node]
+            outgoing[node], incoming[node] = {}, {}
+            for source, target, cost in shortcuts:
+                if target not in outgoing[source] or cost < outgoing[source][target][0]:
+                    if target not in outgoing[source]: edge_count += 1
+                    outgoing[source][target] = (cost, node)
+                    incoming[target][source] = cost
+            # The importance of the neighbors changed since they lost an edge and may have gained shortcuts
+            # (a smaller witness search is enough to estimate it, and for the nodes with many edges
+            # only the cheap terms are updated since the importance is computed again anyway before contracting them)
+            for neighbor in neighbors:
+                contracted_neighbors[neighbor] += 1
+                level = max(levels[neighbor], levels[node] + 1)
+                if len(incoming[neighbor]) + len(outgoing[neighbor]) <= ESTIMATE_DEGREE_LIMIT:
+                    levels[neighbor] = level
+                    priorities[neighbor] = importance(neighbor, shortcuts_of(neighbor, ESTIMATE_WITNESS_LIMIT))
+                else:
+                    priorities[neighbor] += 1 + level - levels[neighbor]
+                    levels[neighbor] = level
+                heapq.heappush(queue, (priorities[neighbor], neighbor))
+
+        # The remaining nodes are the core, they get the highest ranks and keep all their edges
+        for node in range(size):
+            if contracted[node]: continue
+            rank[node] = order
+            order += 1
+            upward_forward[node] = [(target, cost, middle) for target, (cost, middle) in outgoing[node].items()]
+            upward_backward[node] = [(source, cost, outgoing[source][node][1]) for source, cost in incoming[node].items()]
+
+        # Converts the upward edges of every node to the compressed sparse row format
+        def compress(edges: List[List[Tuple[int, float, int]]]) -> Tuple[array, array, array, array]:
+            offsets, targets, costs, middles = array('i', [0]), array('i'), array('d'), array('i')
+            for node_edges in edges:
+                for target, cost, middle in node_edges:
+                    targets.append(target)
+                    costs.append(cost)
+                    middles.append(middle)
+                offsets.append(len(targets))
+            return offsets, targets, costs, middles
+
+        return ContractionHierarchy(rank, compress(upward_forward), compress(upward_backward))
+
+    # Returns the cost and the nodes (from the start to the goal) of the shortest path (None if there is no path)
+    # If a stats object is given, the settled nodes of both searches are added to it
+    def query(self, start: int, goal: int, stats: Optional[SearchStats] = None) -> Optional[Tuple[float, List[int]]]:
+        if start == goal:
+            return 0.0, [start]
+        searches = (self.forward, self.backward)
+        distances: Tuple[Dict[int, float], Dict[int, float]] = ({start: 0.0}, {goal: 0.0})
+        parents: Tuple[Dict[int, int], Dict[int, int]] = ({start: -1}, {goal: -1})
+        queues = ([(0.0, start)], [(0.0, goal)])
+        inf = float('inf')
+        best, meeting = inf, -1
+        settled = 0
+        while queues[0] or queues[1]:
+            # Always continue the search whose next node is closer
+            side = 0 if queues[0] and (not queues[1] or queues[0][0][0] <= queues[1][0][0]) else 1
+            distance, node = heapq.heappop(queues[side])
+            # Any path found later is at least as long as the best one
+            if distance >= best: break
+            own = distances[side]
+            if distance > own[node]: continue
+            settled += 1
+            other_distance = distances[1 - side].get(node)
+            if other_distance is not None and distance + other_distance < best:
+                best, meeting = distance + other_distance, node
+            # Stall on demand: if a higher node that was already reached has an edge that reaches this node with a shorter distance,
+            # this node is not on a shortest path of this search so its edges are not followed
+            offsets, targets, costs, _ = searches[1 - side]
+            stalled = False
+            for edge in range(offsets[node], offsets[node + 1]):
+                if own.get(targets[edge], inf) + costs[edge] < distance:
+                    stalled = True
+                    break
+            if stalled: continue
+            offsets, targets, costs, _ = searches[side]
+            parent, queue = parents[side], queues[side]
+            for edge in range(offsets[node], offsets[node + 1]):
+                next_node, next_distance = targets[edge], distance + costs[edge]
+                if next_distance < own.get(next_node, inf):
+                    own[next_node] = next_distance
+                    parent[next_node] = node
+                    heapq.heappush(queue, (next_distance, next_node))
+        if stats is not None:
+            stats.nodes_expanded += settled
+            stats.nodes_generated += len(distances[0]) + len(distances[1])
+        if meeting == -1:
+            return None
+        # The path goes up from the start to the meeting node then down to the goal
+        upward, node = [], meeting
+        while node != -1:
+            upward.append(node)
+            node = parents[0][node]
+        upward.reverse()
+        node = parents[1][meeting]
+        while node != -1:
+            upward.append(node)
+            node = parents[1][node]
+        return best, self.unpack(upward)
+
+    # Replaces every shortcut between two consecutive nodes of the path by the original edges
+    def unpack(self, path: List[int]) -> List[int]:
+        size, shortcuts = len(self.rank), self.shortcuts
+        nodes = [path[0]]
+        for source, target in zip(path, path[1:]):
+            stack = [(source, target)]
+            while stack:
+                source, target = stack.pop()
+                middle = shortcuts.get(source * size + target)
+                if middle is None:
+                    nodes.append(target)
+                else:
+                    # The first half is pushed last so it is unpacked first
+                    stack.append((middle, target))
+                    stack.append((source, middle))
+        return nodes
+
+    # The rank and the edges are saved as plain arrays (see save_graph_arrays)
+    def save(self, graph: CompactGraph, path: str) -> None:
+        arrays = [("rank", self.rank)]
+        for direction, edges in (("forward", self.forward), ("backward", self.backward)):
+            arrays += [(f"{direction}{index}", data) for index, data in enumerate(edges)]
+        save_graph_arrays(path, "contraction_hierarchy", graph, arrays)
+
+    # Loads the hierarchy from the given file (None if the file does not exist, has another format or belongs to another graph)
+    @staticmethod
+    def load(graph: CompactGraph, path: str) -> Optional['ContractionHierarchy']:
+        arrays = load_graph_arrays(path, "contraction_hierarchy", graph)
+        if arrays is None:
+            return None
+        names = ["rank"] + [f"{direction}{index}" for direction in ("forward", "backward") for index in range(4)]
+        if any(name not in arrays or arrays[name].typecode != typecode for name, typecode in zip(names, "iiidiiidi")):
+            return None
+        rank = arrays["rank"]
+        forward, backward = (tuple(arrays[f"{direction}{index}"] for index in range(4)) for direction in ("forward", "backward"))
+        # The offsets have an entry per node (and one more) and the last one is the number of edges
+        for offsets, *edges in (forward, backward):
+            if len(offsets) != len(graph) + 1 or any(len(data) != offsets[-1] for data in edges):
+                return None
+        if len(rank) != len(graph):
+            return None
+        return ContractionHierarchy(rank, forward, backward)
+
+    # Loads the hierarchy saved next to the graph file if it matches the graph, otherwise builds it and saves it
+    # (if the directory is not writable, it is still built but not saved)
+    @staticmethod
+    def load_or_build(graph: CompactGraph, graph_path: str) -> 'ContractionHierarchy':
+        path = hierarchy_path(graph_path)
+        hierarchy = ContractionHierarchy.load(graph, path)
+        if hierarchy is None:
+            hierarchy = ContractionHierarchy.build(graph)
+            try:
+                hierarchy.save(graph, path)
+            except OSError:
+                pass
+        return hierarchy
+
+# Solves the graph routing problem with a contraction hierarchy and returns the path in the same format as the search functions
+# (the list of nodes after the initial state for GraphRoutingProblem and the list of edges for CompactGraphProblem)
+# If no hierarchy is given, it is built once for the problem and kept in the problem cache
+def ContractionHierarchySearch(problem: Union[GraphRoutingProblem, CompactGraphProblem], initial_state: Union[GraphNode, int],
+                               hierarchy: Optional[ContractionHierarchy] = None, stats: Optional[SearchStats] = None) -> Optional[list]:
+    search_start = time.perf_counter()
+    if isinstance(problem, GraphRoutingProblem) and problem.graph is None:
+        problem.to_compact()
+    graph = problem.graph
+    if hierarchy is None:
+        hierarchy = problem.cache().get("contraction_hierarchy")
+        if hierarchy is None:
+            hierarchy = problem.cache()["contraction_hierarchy"] = ContractionHierarchy.build(graph)
+    if isinstance(problem, GraphRoutingProblem):
+        start, goal = graph.ids[initial_state.name], graph.ids[problem.goal.name]
+    else:
+        start, goal = initial_state, problem.goal
+    result = hierarchy.query(start, goal, stats)
+    if stats is not None:
+        stats.searches += 1
+        stats.add_phase_time("search", time.perf_counter() - search_start)
+    if result is None:
+        return None
+    _, path = result
+    if isinstance(problem, GraphRoutingProblem):
+        return [problem.nodes[node] for node in path[1:]]
+    return [graph.edge(source, target) for source, target in zip(path, path[1:])]
@@ -0,0 +1,135 @@
+from array import array
+from typing import Dict, List, Optional, Sequence
+import hashlib, json, os, sys
+
+# This file contains the distance oracle of the grid levels
+# It runs one breadth first search from each point of interest (e.g. the coins, the exit and the start of a dungeon)
+# and keeps the distances from that point to every cell in a compact array indexed by the cell index.
+# Since moving on the grid is reversible, the distance between a point of interest and any other cell is then a single lookup.
+# The tables only depend on the layout so they are saved to a cache file named after a hash of the layout
+# and the next runs on the same level load them instead of searching again.
+
+# The version of the cache files: the files of another version are ignored and built again,
+# so it must be increased whenever their content changes
+DISTANCE_FILE_FORMAT_VERSION = 1
+
+# The directory where the distance tables are saved (it is ignored by git)
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "distances")
+
+# The distance stored for the cells that cannot be reached from the source
+UNREACHABLE = -1
+
+# Returns the distance from the source cell to every cell using breadth first search
+# "neighbors[4 * cell + direction]" is the cell reached by moving from "cell" in "direction" (-1 if it is a wall)
+def breadth_first_distances(neighbors: Sequence[int], source: int) -> array:
+    size = len(neighbors) // 4
+    distances = array('i', [UNREACHABLE]) * size
+    distances[source] = 0
+    # A list is used as the queue since cells are never removed, we only move the index of the queue's head
+    queue = [source]
+    head = 0
+    while head < len(queue):
+        cell = queue[head]
+        head += 1
+        next_distance = distances[cell] + 1
+        for neighbor in neighbors[4 * cell: 4 * cell + 4]:
+            if neighbor != -1 and distances[neighbor] == UNREACHABLE:
+                distances[neighbor] = next_distance
+                queue.append(neighbor)
+    return distances
+
+# Returns a hash that identifies the walkable cells of a grid together with the chosen points of interest
+def layout_fingerprint(width: int, height: int, neighbors: Sequence[int], sources: Sequence[int]) -> str:
+    digest = hashlib.sha1(f"{width}x{height}".encode())
+    digest.update(array('i', neighbors).tobytes())
+    digest.update(array('i', sources).tobytes())
+    return digest.hexdigest()
+
+class DistanceOracle:
+    def __init__(self, neighbors: Sequence[int], sources: Sequence[int], rows: List[array]) -> None:
+        self.neighbors = neighbors
+        self.sources = list(sources)
+        # The distance table of each source cell (the point of interest tables and any table computed later on demand)
+        self._rows: Dict[int, array] = dict(zip(self.sources, rows))
+
+    # Runs a breadth first search from every source
+    @staticmethod
+    def build(neighbors: Sequence[int], sources: Sequence[int]) -> 'DistanceOracle':
+        return DistanceOracle(neighbors, sources, [breadth_first_distances(neighbors, source) for source in sources])
+
+    # Loads the tables from the cache file with the given fingerprint if it exists, otherwise builds them and saves them
+    # If the cache directory is not writable, the tables are still built but they are not saved
+    @staticmethod
+    def load_or_build(fingerprint: str, neighbors: Sequence[int], sources: Sequence[int], directory: Optional[str] = CACHE_DIRECTORY) -> 'DistanceOracle':
+        if directory is None:
+            return DistanceOracle.build(neighbors, sources)
+        path = os.path.join(directory, f"{fingerprint}.bin")
+        oracle = DistanceOracle.load(path, fingerprint, neighbors, sources)
+        if oracle is None:
+            oracle = DistanceOracle.build(neighbors, sources)
+            oracle.save(path, fingerprint)
+        return oracle
+
+    # Loads the tables saved by "save"
+    # Returns None if the file does not exist, is incomplete, has another format version or was saved for another layout or machine
+    @staticmethod
+    def load(path: str, fingerprint: str, neighbors: Sequence[int], sources: Sequence[int]) -> Optional['DistanceOracle']:
+        size = len(neighbors) // 4
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                if not isinstance(header, dict) or header.get("format") != DISTANCE_FILE_FORMAT_VERSION or header.get("fingerprint") != fingerprint \
+                        or header.get("byteorder") != sys.byteorder or header.get("itemsize") != array('i').itemsize \
+                        or header.get("sources") != list(sources) or header.get("size") != size:
+                    return None
+                data = array('i')
+                data.fromfile(f, size * len(sources))
+                if f.read(1):
+                    return None
+        except (OSError, ValueError, EOFError):
+            return None
+        return DistanceOracle(neighbors, sources, [data[index * size: (index + 1) * size] for index in range(len(sources))])
+
+    # Writes the point of interest tables to the given path: the first line is a json header with the format version,
+    # the layout fingerprint, the byte order, the item size, the sources and the table size, then the raw bytes of the tables follow
+    # (the file is replaced atomically so readers never see half a file)
+    def save(self, path: str, fingerprint: str) -> None:
+        header = {
+            "format": DISTANCE_FILE_FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "byteorder": sys.byteorder,
+            "itemsize": array('i').itemsize,
+            "sources": self.sources,
+            "size": len(self.neighbors) // 4,
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            with open(temporary_path, 'wb') as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                for source in self.sources:
+                    self._rows[source].tofile(f)
+            os.replace(temporary_path, path)
+        except OSError:
+            pass
+
+    # Returns the distances from the given cell to every cell
+    # The tables of cells that are not points of interest are computed on the first request and kept in memory only
+    def row(self, cell: int) -> array:
+        row = self._rows.get(cell)
+        if row is None:
+            row = self._rows[cell] = breadth_first_distances(self.neighbors, cell)
+        return row
+
+    # Returns the length of the shortest path between two cells (infinity if there is no path)
+    def distance(self, start: int, end: int) -> float:
+        rows = self._rows
+        row = rows.get(start)
+        if row is None:
+            row = rows.get(end)
+            if row is None:
+                row = self.row(start)
+            else:
+                end = start
+        distance = row[end]
+        return float('inf') if distance == UNREACHABLE else distance
@@ -1,8 +1,11 @@
+from array import array
 from dataclasses import dataclass
-from typing import FrozenSet, Iterable
+from typing import FrozenSet, Iterable, Iterator, Optional, Tuple, Union
 from enum import Enum
+import re
 
-from mathutils import Direction, Point
+from mathutils import Direction, Point, PointTable, grid_neighbor_tables
+from distance_oracle import DistanceOracle, layout_fingerprint
 from problem import Problem
 from helpers.utils import track_call_count
 
@@ -18,45 +21,227 @@ class DungeonTile(str, Enum):
     EXIT   = "E"
     PLAYER = "@"
 
-# For the dungeon state, we use dataclass to automatically implement:
+# The walkable cells of a dungeon stored as one byte per cell (1 if the cell is walkable and 0 otherwise)
+# where the cell (x, y) is at "y * width + x". It can be used like the set of the walkable points:
+#   "point in walkable" checks the byte of the point and iterating over it gives the walkable points
+# but it does not need one Point object per cell, so it is much smaller and faster to build for huge dungeons.
+# The points it returns come from its own point table, so a cell gives the same Point every time.
+class WalkableGrid:
+    __slots__ = ("width", "height", "cells", "points")
+
+    def __init__(self, width: int, height: int, cells: Union[bytes, bytearray], points: Optional[PointTable] = None) -> None:
+        self.width = width
+        self.height = height
+        self.cells = bytes(cells)
+        self.points = points or PointTable(width)
+
+    # Builds the grid from the set of the walkable points
+    @staticmethod
+    def from_points(width: int, height: int, points: Iterable[Point]) -> 'WalkableGrid':
+        cells = bytearray(width * height)
+        for point in points:
+            cells[point.y * width + point.x] = 1
+        return WalkableGrid(width, height, cells)
+
+    # Any pair of integer coordinates is accepted (a Point, a TuplePoint or a plain (x, y) tuple) since they are all unpacked to x, y
+    # Points are the common case so their fields are read directly instead of going through Point.__iter__
+    def __contains__(self, point: object) -> bool:
+        if type(point) is Point:
+            x, y = point.x, point.y
+        else:
+            try:
+                x, y = point
+            except (TypeError, ValueError):
+                return False
+            if not (isinstance(x, int) and isinstance(y, int)):
+                return False
+        return 0 <= x < self.width and 0 <= y < self.height and self.cells[y * self.width + x] == 1
+
+    def __iter__(self) -> Iterator[Point]:
+        point = self.points.point
+        cell = self.cells.find(1)
+        while cell != -1:
+            yield point(cell)
+            cell = self.cells.find(1, cell + 1)
+
+    def __len__(self) -> int:
+        return self.cells.count(1)
+
+    def __reduce__(self):
+        return (WalkableGrid, (self.width, self.height, self.cells))
+
+# For the dungeon layout, we use dataclass to automatically implement:
 #   the constructor and to make the class immutable
 # We disable the automatic equality implementation since we don't need it;
 # we only need the default equality which compares objects by pointers.
 # The layout contains the problem details that are unchangeable across states such as:
-#   The walkable area (locations without walls) and the exit location
+#   The walkable area (locations without walls), the exit location, the coins that exist at the start and the player's start location
+# Every cell gets the index "y * width + x" and every coin gets the index of its position in "coins".
+# These indices let the states be stored as a single integer (see DungeonState) and
+# the tables built in __post_init__ let the problem move between cells without creating any Point.
+# The walkable area can be given as a set of points or as a WalkableGrid (which is what from_text creates),
+# both support "point in layout.walkable" and iterating over the walkable points.
+# The coins and the start are optional so a layout can still be created with the original fields (width, height, walkable, exit).
+# A set of coins is sorted in reading order so the same level always gives the same coin indices.
+# The exit and the start can be None: a layout without an exit has no goal state (exit_cell is -1).
 @dataclass(eq=False, frozen=True)
 class DungeonLayout:
-    __slots__ = ("width", "height", "walkable", "exit")
+    __slots__ = ("width", "height", "walkable", "exit", "coins", "start",
+                 "grid", "points", "neighbors", "actions", "coin_ids", "coin_cells", "exit_cell", "cell_bits", "cell_mask", "_distances")
     width: int
     height: int
-    walkable: FrozenSet[Point]
-    exit: Point
+    walkable: Union[FrozenSet[Point], WalkableGrid]
+    exit: Optional[Point]
+    coins: Tuple[Point, ...]
+    start: Optional[Point]
+
+    # The dataclass can not give defaults to fields listed in __slots__ so the constructor is written here
+    def __init__(self, width: int, height: int, walkable: Union[FrozenSet[Point], WalkableGrid], exit: Optional[Point],
+                 coins: Iterable[Point] = (), start: Optional[Point] = None) -> None:
+        if not isinstance(coins, tuple):
+            coins = tuple(sorted(coins, key=lambda coin: (coin.y, coin.x))) if isinstance(coins, (set, frozenset)) else tuple(coins)
+        set_attribute = object.__setattr__
+        for name, value in (("width", width), ("height", height), ("walkable", walkable), ("exit", exit), ("coins", coins), ("start", start)):
+            set_attribute(self, name, value)
+        self.__post_init__()
+
+    def __post_init__(self):
+        size = self.width * self.height
+        walkable = self.walkable
+        if not isinstance(walkable, WalkableGrid):
+            walkable = WalkableGrid.from_points(self.width, self.height, walkable)
+        # For each cell, the cell reached by moving in each direction is stored at "neighbors[4 * cell + direction]" (-1 if it is a wall)
+        # and "actions[cell]" is the tuple of the directions that do not lead into a wall
+        neighbors, actions = grid_neighbor_tables(walkable.cells, self.width, self.height)
+        # The index of the coin on every cell (-1 if the cell has no coin)
+        coin_ids = array('i', [-1]) * size
+        for index, coin in enumerate(self.coins):
+            coin_ids[self.cell(coin)] = index
+        set_attribute = object.__setattr__
+        # grid[cell] is 1 if the cell is walkable and 0 otherwise
+        set_attribute(self, "grid", walkable.cells)
+        # The layout shares the point table of its walkable grid
+        set_attribute(self, "points", walkable.points)
+        set_attribute(self, "neighbors", neighbors)
+        set_attribute(self, "actions", actions)
+        set_attribute(self, "coin_ids", coin_ids)
+        set_attribute(self, "coin_cells", tuple(self.cell(coin) for coin in self.coins))
+        set_attribute(self, "exit_cell", -1 if self.exit is None else self.cell(self.exit))
+        # A state key stores the player cell in the lowest "cell_bits" bits and the coin mask above them
+        set_attribute(self, "cell_bits", max(size - 1, 1).bit_length())
+        set_attribute(self, "cell_mask", (1 << self.cell_bits) - 1)
+        set_attribute(self, "_distances", None)
+
+    # Returns the distance oracle of this layout which holds the maze distance from every coin, the exit and the start to every cell
+    # It is built on the first call (or loaded from the cache directory if this layout was seen before)
+    def distances(self) -> DistanceOracle:
+        if self._distances is None:
+            # The coins come first so the table of coin "i" is the i-th source (a missing exit or start has no table)
+            sources = [*self.coin_cells, *(self.cell(point) for point in (self.exit, self.start) if point is not None)]
+            fingerprint = layout_fingerprint(self.width, self.height, self.neighbors, sources)
+            object.__setattr__(self, "_distances", DistanceOracle.load_or_build(fingerprint, self.neighbors, sources))
+        return self._distances
+
+    # The tables are not pickled since the constructor rebuilds them (this is needed to send layouts to other processes)
+    def __reduce__(self):
+        return (DungeonLayout, (self.width, self.height, self.walkable, self.exit, self.coins, self.start))
+
+    # Returns the index of the cell at the given point
+    def cell(self, point: Point) -> int:
+        return point.y * self.width + point.x
+
+    # Returns the point of the cell with the given index (the points are shared so no new Point is created for a known cell)
+    def point(self, cell: int) -> Point:
+        return self.points.point(cell)
+
+    # Returns the mask of the given coins where bit "i" is set if the coin "coins[i]" is in the collection
+    # A ValueError is raised for a coin that is not in "coins" (the layout must be created with all the coins of the level)
+    def coin_mask(self, coins: Iterable[Point]) -> int:
+        mask = 0
+        for coin in coins:
+            index = self.coin_ids[self.cell(coin)] if coin in self.walkable else -1
+            if index == -1:
+                raise ValueError(f"{coin} is not one of the coins of the layout, the layout must be created with all the coins of the level")
+            mask |= 1 << index
+        return mask
+
+    # Returns the coins whose bits are set in the given mask
+    def coins_in(self, mask: int) -> FrozenSet[Point]:
+        return frozenset(coin for index, coin in enumerate(self.coins) if mask >> index & 1)
+
+    # Returns the integer that encodes a player cell and a coin mask
+    def encode(self, player: Point, remaining_coins: Iterable[Point]) -> int:
+        return self.cell(player) | (self.coin_mask(remaining_coins) << self.cell_bits)
 
-# For the dungeon state, we use dataclass with frozen=True to automatically implement:
-#   the constructor, the == operator, the hash function and to make the class immutable
+# The dungeon state is stored as a single integer "key" which contains the player cell and the mask of the remaining coins
+# So hashing and comparing states is as cheap as hashing and comparing integers.
+# We use dataclass with frozen=True to automatically implement the constructor and to make the class immutable
+# and we write the == operator and the hash function ourselves so that they only look at the key.
 # Now it can be added to sets and used as keys in dictionaries
-# This will contain a reference to the dungeon layout and it will contain environment details that change across states such as:
-#   The player location and the locations of the remaining coins 
-@dataclass(frozen=True)
+# This will contain a reference to the dungeon layout and the key which holds the environment details that change across states such as:
+#   The player location and the locations of the remaining coins (available as the properties "player" and "remaining_coins")
+# A state can also be created with the original fields: DungeonState(layout, player, remaining_coins)
+@dataclass(eq=False, frozen=True)
 class DungeonState:
-    __slots__ = ("layout", "player", "remaining_coins")
+    __slots__ = ("layout", "key")
     layout: DungeonLayout
-    player: Point
-    remaining_coins: FrozenSet[Point]
+    key: int
+
+    def __init__(self, layout: DungeonLayout, key: Union[int, Point, None] = None,
+                 remaining_coins: Optional[Iterable[Point]] = None, player: Optional[Point] = None) -> None:
+        if remaining_coins is not None or player is not None:
+            key = layout.encode(key if player is None else player, remaining_coins or ())
+        elif not isinstance(key, int):
+            raise TypeError(f"A DungeonState needs an int key or a player and the remaining coins, got {key!r}")
+        object.__setattr__(self, "layout", layout)
+        object.__setattr__(self, "key", key)
+
+    # Creates a state from the player location and the locations of the remaining coins
+    @staticmethod
+    def from_points(layout: DungeonLayout, player: Point, remaining_coins: Iterable[Point]) -> 'DungeonState':
+        return DungeonState(layout, layout.encode(player, remaining_coins))
+
+    @property
+    def player_cell(self) -> int:
+        return self.key & self.layout.cell_mask
+
+    @property
+    def coin_mask(self) -> int:
+        return self.key >> self.layout.cell_bits
+
+    @property
+    def player(self) -> Point:
+        return self.layout.point(self.key & self.layout.cell_mask)
+
+    @property
+    def remaining_coins(self) -> FrozenSet[Point]:
+        return self.layout.coins_in(self.key >> self.layout.cell_bits)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, DungeonState) and self.key == other.key and self.layout is other.layout
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __reduce__(self):
+        return (DungeonState, (self.layout, self.key))
 
     # This operator will convert the state to a string containing the grid representation of the level at the current state
     def __str__(self) -> str:
-        def position_to_str(position):
-            if position not in self.layout.walkable:
+        layout = self.layout
+        player, mask = self.player_cell, self.coin_mask
+        def cell_to_str(cell):
+            if not layout.grid[cell]:
                 return DungeonTile.WALL
-            if position == self.player:
+            if cell == player:
                 return DungeonTile.PLAYER
-            if position == self.layout.exit:
+            if cell == layout.exit_cell:
                 return DungeonTile.EXIT
-            if position in self.remaining_coins:
+            coin = layout.coin_ids[cell]
+            if coin != -1 and mask >> coin & 1:
                 return DungeonTile.COIN
             return DungeonTile.EMPTY
-        return '\n'.join(''.join(position_to_str(Point(x, y)) for x in range(self.layout.width)) for y in range(self.layout.height))
+        return '\n'.join(''.join(cell_to_str(y * layout.width + x) for x in range(layout.width)) for y in range(layout.height))
 
 # This is a list of all the possible actions for the dungeon agent
 AllDungeonActions = [
@@ -76,59 +261,98 @@ class DungeonProblem(Problem[DungeonState, Direction]):
         return self.initial_state
 
     # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    # The goal key has the player at the exit and an empty coin mask, so it is equal to the exit cell
     @track_call_count
     def is_goal(self, state: DungeonState) -> bool:
-        return len(state.remaining_coins) == 0 and state.player == self.layout.exit
+        return state.key == self.layout.exit_cell
 
+    # The walkable directions of every cell are precomputed by the layout (walking into walls is not allowed)
     def get_actions(self, state: DungeonState) -> Iterable[Direction]:
-        actions = []
-        for direction in Direction:
-            position = state.player + direction.to_vector()
-            # Disallow walking into walls
-            if position not in self.layout.walkable: continue
-            actions.append(direction)
-        return actions
+        layout = self.layout
+        return layout.actions[state.key & layout.cell_mask]
 
     def get_successor(self, state: DungeonState, action: Direction) -> DungeonState:
-        player = state.player + action.to_vector()
-        remaining_coins = state.remaining_coins
-        if player not in self.layout.walkable:
+        layout = state.layout
+        key = state.key
+        player = layout.neighbors[4 * (key & layout.cell_mask) + action]
+        if player == -1:
             # If we try to walk into a wall, the state does not change
             return state
-        if player in remaining_coins:
-            # If we walk over a coin, we take it
-            remaining_coins -= {player}
-        return DungeonState(state.layout, player, remaining_coins)
+        mask = key >> layout.cell_bits
+        coin = layout.coin_ids[player]
+        if coin != -1:
+            # If we walk over a coin, we take it (clearing a bit that is already clear does nothing)
+            mask &= ~(1 << coin)
+        return DungeonState(layout, player | (mask << layout.cell_bits))
 
     def get_cost(self, state: DungeonState, action: Direction) -> float:
         # All actions have the same cost
         return 1
 
+    # The only goal state is the one where the player is at the exit with no remaining coins (there is none without an exit)
+    def get_goal_states(self) -> Iterable[DungeonState]:
+        if self.layout.exit_cell == -1:
+            return []
+        return [DungeonState(self.layout, self.layout.exit_cell)]
+
+    # The dungeon is only reversible if it has no coins: when the player stands on a tile that had a coin,
+    # the coin could have been taken by this move or by an earlier one and get_predecessors returns both states
+    # but many of them can never be reached (e.g. a coin taken before the player could walk to it)
+    # so BidirectionalSearch falls back to uniform cost search on the dungeons with coins
+    def is_reversible(self) -> bool:
+        return not self.layout.coins
+
+    # The player came from a walkable neighbor in the opposite direction of the action
+    # With coins, the returned states include every state that leads to the given one (and some that can not be reached),
+    # which is enough for the searches that only update the states they are given (e.g. IncrementalReplanningAgent)
+    def get_predecessors(self, state: DungeonState) -> Iterable[Tuple[DungeonState, Direction]]:
+        layout = self.layout
+        player, mask = state.player_cell, state.coin_mask
+        coin = layout.coin_ids[player]
+        predecessors = []
+        for direction in Direction:
+            previous = layout.neighbors[4 * player + (direction + 2) % 4]
+            if previous == -1: continue
+            # The player never stands on a coin that is not taken yet
+            previous_coin = layout.coin_ids[previous]
+            if previous_coin != -1 and mask >> previous_coin & 1: continue
+            predecessors.append((DungeonState(layout, previous | (mask << layout.cell_bits)), direction))
+            if coin != -1:
+                predecessors.append((DungeonState(layout, previous | ((mask | 1 << coin) << layout.cell_bits)), direction))
+        return predecessors
+
     # Read a dungeon problem from text containing a grid of tiles
+    # The text is handled as bytes: the rows are padded with walls to the same width and joined,
+    # then a single translation gives the walkable grid and the special tiles are found with byte searches
+    # so no Point is created for the empty tiles (a dungeon with millions of tiles loads in a fraction of a second)
     @staticmethod
-    def from_text(text: str) -> 'DungeonProblem':
-        walkable, coins =  set(), set()
-        player: Point = None
-        exit: Point = None
-        lines = [line for line in (line.strip() for line in text.splitlines()) if line]
-        width, height = max(len(line) for line in lines), len(lines)
-        for y, line in enumerate(lines):
-            for x, char in enumerate(line):
-                if char != DungeonTile.WALL:
-                    walkable.add(Point(x, y))
-                    if char == DungeonTile.PLAYER:
-                        player = Point(x, y)
-                    elif char == DungeonTile.COIN:
-                        coins.add(Point(x, y))
-                    elif char == DungeonTile.EXIT:
-                        exit = Point(x, y)
+    def from_text(text: Union[str, bytes]) -> 'DungeonProblem':
+        data = text.encode() if isinstance(text, str) else text
+        lines = [line for line in (line.strip() for line in data.splitlines()) if line]
+        width, height = max((len(line) for line in lines), default=0), len(lines)
+        wall = DungeonTile.WALL.encode()
+        tiles = b''.join(line.ljust(width, wall) for line in lines)
+        walkable = WalkableGrid(width, height, tiles.translate(_WALKABLE_BYTES))
+        def position(cell: int) -> Optional[Point]:
+            return None if cell == -1 else walkable.points.point(cell)
+        # If a tile appears more than once, the last one is used (as if the tiles were read one by one)
+        player = position(tiles.rfind(DungeonTile.PLAYER.encode()))
+        exit = position(tiles.rfind(DungeonTile.EXIT.encode()))
+        # The coins are found in reading order so the same level always gives the same coin indices
+        coins = tuple(position(match.start()) for match in re.finditer(re.escape(DungeonTile.COIN.encode()), tiles))
+        # A level without an exit is loaded (it has no solution) but the initial state needs the player
+        if player is None:
+            raise ValueError(f"The dungeon has no player tile '{DungeonTile.PLAYER.value}'")
         problem = DungeonProblem()
-        problem.layout = DungeonLayout(width, height, frozenset(walkable), exit)
-        problem.initial_state = DungeonState(problem.layout, player, frozenset(coins))
+        problem.layout = DungeonLayout(width, height, walkable, exit, coins, player)
+        problem.initial_state = DungeonState.from_points(problem.layout, player, coins)
         return problem
 
     # Read a dungeon problem from file containing a grid of tiles
     @staticmethod
     def from_file(path: str) -> 'DungeonProblem':
-        with open(path, 'r') as f:
-            return DungeonProblem.from_text(f.read())
\ No newline at end of file
+        with open(path, 'rb') as f:
+            return DungeonProblem.from_text(f.read())
+
+# Maps every tile byte to 1 (walkable) except the wall which is mapped to 0
+_WALKABLE_BYTES = bytes(int(byte != ord(DungeonTile.WALL)) for byte in range(256))
\ No newline at end of file
@@ -0,0 +1,196 @@
+from typing import Any, Dict, Generic, Hashable, Iterator, List, Tuple, TypeVar
+import heapq
+
+# This file contains the priority queues used as frontiers by the cost-based and informed searches
+# Both frontiers are keyed by the state so pushing a state that is already in the frontier
+# replaces its old entry instead of adding a duplicate next to it.
+# UniformCostSearch and AStarSearch use the indexed heap by default and take the frontier class as an option
+# (run "python -m bench.search_benchmark -f lazy" to compare the two).
+# Unlike queue.PriorityQueue, they do not take any locks since a search runs on a single thread.
+
+# K is the key type (the state) and V is the payload that is stored with it (e.g. the search node)
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# A binary heap that keeps the position of every key inside the heap array
+# so the priority of a key can be changed in place (decrease-key) in O(log n)
+class IndexedPriorityQueue(Generic[K, V]):
+    def __init__(self) -> None:
+        # Every heap entry is a list [priority, key, item]
+        self._heap: List[List[Any]] = []
+        # The index of each key's entry in the heap
+        self._positions: Dict[K, int] = {}
+        # The largest number of entries the frontier held at once
+        self.peak_size = 0
+        # The number of times an existing key got a new priority instead of a new entry
+        self.updates = 0
+        # The entries are updated in place so there is never a stale entry to pop (kept to match LazyPriorityQueue)
+        self.stale_pops = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __bool__(self) -> bool:
+        return bool(self._heap)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._positions
+
+    def empty(self) -> bool:
+        return not self._heap
+
+    # Returns the priority of a key that is currently in the frontier
+    def priority(self, key: K) -> Any:
+        return self._heap[self._positions[key]][0]
+
+    # Returns the (key, item) pairs in the frontier (in no particular order)
+    def items(self) -> Iterator[Tuple[K, V]]:
+        return ((entry[1], entry[2]) for entry in self._heap)
+
+    # Returns the (key, priority, item) with the lowest priority without removing it
+    def peek(self) -> Tuple[K, Any, V]:
+        top = self._heap[0]
+        return top[1], top[0], top[2]
+
+    # Adds the key if it is not in the frontier, otherwise replaces its priority and item
+    def push(self, key: K, priority: Any, item: V = None) -> None:
+        position = self._positions.get(key)
+        if position is None:
+            position = len(self._heap)
+            self._heap.append([priority, key, item])
+            self._positions[key] = position
+            if position >= self.peak_size:
+                self.peak_size = position + 1
+            self._sift_up(position)
+            return
+        entry = self._heap[position]
+        old_priority = entry[0]
+        entry[0] = priority
+        entry[2] = item
+        self.updates += 1
+        if priority < old_priority:
+            self._sift_up(position)
+        else:
+            self._sift_down(position)
+
+    # Removes and returns the (key, priority, item) with the lowest priority
+    def pop(self) -> Tuple[K, Any, V]:
+        heap = self._heap
+        last = heap.pop()
+        if heap:
+            top = heap[0]
+            heap[0] = last
+            self._positions[last[1]] = 0
+            self._sift_down(0)
+        else:
+            top = last
+        del self._positions[top[1]]
+        return top[1], top[0], top[2]
+
+    # Removes the key from the frontier (if it is in the frontier)
+    def remove(self, key: K) -> None:
+        position = self._positions.pop(key, None)
+        if position is None:
+            return
+        heap = self._heap
+        last = heap.pop()
+        if position < len(heap):
+            heap[position] = last
+            self._positions[last[1]] = position
+            self._sift_up(position)
+            self._sift_down(self._positions[last[1]])
+
+    def _sift_up(self, position: int) -> None:
+        heap, positions = self._heap, self._positions
+        entry = heap[position]
+        priority = entry[0]
+        while position > 0:
+            parent_position = (position - 1) >> 1
+            parent = heap[parent_position]
+            if not priority < parent[0]:
+                break
+            heap[position] = parent
+            positions[parent[1]] = position
+            position = parent_position
+        heap[position] = entry
+        positions[entry[1]] = position
+
+    def _sift_down(self, position: int) -> None:
+        heap, positions = self._heap, self._positions
+        size = len(heap)
+        entry = heap[position]
+        priority = entry[0]
+        while True:
+            child_position = 2 * position + 1
+            if child_position >= size:
+                break
+            child = heap[child_position]
+            right_position = child_position + 1
+            if right_position < size and heap[right_position][0] < child[0]:
+                child_position = right_position
+                child = heap[right_position]
+            if not child[0] < priority:
+                break
+            heap[position] = child
+            positions[child[1]] = position
+            position = child_position
+        heap[position] = entry
+        positions[entry[1]] = position
+
+# A marker for entries that were replaced by a newer entry for the same key
+_REMOVED = object()
+
+# A heapq based frontier that handles priority changes by lazy deletion:
+# the old entry is marked as removed and skipped when it reaches the top of the heap
+# It does less work per push than the indexed heap but the heap can hold stale entries
+class LazyPriorityQueue(Generic[K, V]):
+    def __init__(self) -> None:
+        self._heap: List[List[Any]] = []
+        # The live entry of each key in the frontier
+        self._entries: Dict[K, List[Any]] = {}
+        self._sequence = 0
+        # The largest number of entries (including stale ones) the heap held at once
+        self.peak_size = 0
+        self.updates = 0
+        # The number of removed entries that were popped and thrown away
+        self.stale_pops = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def empty(self) -> bool:
+        return not self._entries
+
+    def priority(self, key: K) -> Any:
+        return self._entries[key][0]
+
+    def push(self, key: K, priority: Any, item: V = None) -> None:
+        old_entry = self._entries.get(key)
+        if old_entry is not None:
+            # The key is the third element of the entry
+            old_entry[2] = _REMOVED
+            self.updates += 1
+        # The sequence number keeps the entries comparable without ever comparing the keys
+        self._sequence += 1
+        entry = [priority, self._sequence, key, item]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+        if len(self._heap) > self.peak_size:
+            self.peak_size = len(self._heap)
+
+    def pop(self) -> Tuple[K, Any, V]:
+        heap = self._heap
+        while heap:
+            priority, _, key, item = heapq.heappop(heap)
+            if key is _REMOVED:
+                self.stale_pops += 1
+                continue
+            del self._entries[key]
+            return key, priority, item
+        raise IndexError("pop from an empty priority queue")
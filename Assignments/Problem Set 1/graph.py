@@ -1,31 +1,167 @@
-from typing import Dict, Iterable, List
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from dataclasses import dataclass
-import json
+import hashlib, json, math, os, sys
 
 from problem import Problem
 from mathutils import Point, euclidean_distance
-from helpers.utils import record_calls
+from helpers.utils import record_calls, track_call_count
+
+# NumPy is optional, it is only used to compute the edge costs of large graphs at once
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # In the graph routing problem, the state is a graph node
 # We use dataclass with frozen=True to automatically implement:
-#   the constructor, the == operator, the hash function and to make the class immutable
+#   the constructor, the == operator and to make the class immutable
 # Now it can be added to sets and used as keys in dictionaries
 # This will the node name and position 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False)
 class GraphNode:
     name: str
     position: Point
 
+    # The hash is computed once since the nodes are used as dictionary keys on every step of the search
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_hash", hash((self.name, self.position)))
+
+    # The nodes of a graph are created once so most comparisons are between the same object
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, GraphNode):
+            return NotImplemented
+        return self.name == other.name and self.position == other.position
+
+    def __hash__(self) -> int:
+        return self._hash
+
     def __str__(self) -> str:
         return self.name
 
+# The graph stored in the compressed sparse row (CSR) format where the nodes are numbered from 0 to size - 1
+# The edges leaving node 'i' are the edges from offsets[i] to offsets[i + 1] - 1
+# and edge 'e' goes to node targets[e] with the cost costs[e]
+class CompactGraph:
+    def __init__(self, names: List[str], xs: array, ys: array, offsets: array, targets: array, costs: array) -> None:
+        self.names = names
+        self.ids = {name: node for node, name in enumerate(names)}
+        self.xs, self.ys = xs, ys
+        self.offsets, self.targets, self.costs = offsets, targets, costs
+        # The reversed graph is only needed for backward search so it is built on the first request
+        self._reverse: Optional[Tuple[array, array, array]] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # Returns the indices of the edges leaving the given node
+    def edges(self, node: int) -> range:
+        return range(self.offsets[node], self.offsets[node + 1])
+
+    # Returns the nodes that can be reached from the given node in one step
+    def neighbors(self, node: int) -> Sequence[int]:
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    # Returns the cheapest edge from the node to the other node (-1 if there is no such edge)
+    def edge(self, node: int, other: int) -> int:
+        best = -1
+        for edge in range(self.offsets[node], self.offsets[node + 1]):
+            if self.targets[edge] == other and (best == -1 or self.costs[edge] < self.costs[best]):
+                best = edge
+        return best
+
+    # Returns the positions of all the nodes as a (size x 2) array (only available if NumPy is installed)
+    def positions(self) -> 'np.ndarray':
+        return np.stack((np.frombuffer(self.xs, dtype=np.float64), np.frombuffer(self.ys, dtype=np.float64)), axis=1)
+
+    # Returns the straight line distance between two nodes
+    def distance(self, node: int, other: int) -> float:
+        dx, dy = self.xs[node] - self.xs[other], self.ys[node] - self.ys[other]
+        return math.sqrt(dx * dx + dy * dy)
+
+    # Returns a hash of the edges of the graph (the files computed from a graph are only valid for the same graph)
+    def fingerprint(self) -> str:
+        digest = hashlib.sha1(str(len(self)).encode())
+        for data in (self.offsets, self.targets, self.costs):
+            digest.update(data.tobytes())
+        return digest.hexdigest()
+
+    # Returns the reversed edges in the same format: (offsets, sources, edges) where the edges entering node 'i'
+    # are from offsets[i] to offsets[i + 1] - 1 and entry 'r' is the edge "edges[r]" of the graph that starts at sources[r]
+    def reverse(self) -> Tuple[array, array, array]:
+        if self._reverse is None:
+            size, offsets, targets = len(self), self.offsets, self.targets
+            counts = array('i', [0]) * (size + 1)
+            for target in targets:
+                counts[target + 1] += 1
+            for node in range(size):
+                counts[node + 1] += counts[node]
+            reverse_offsets = array('i', counts)
+            sources = array('i', [0]) * len(targets)
+            edges = array('i', [0]) * len(targets)
+            for node in range(size):
+                for edge in range(offsets[node], offsets[node + 1]):
+                    position = counts[targets[edge]]
+                    counts[targets[edge]] = position + 1
+                    sources[position] = node
+                    edges[position] = edge
+            self._reverse = (reverse_offsets, sources, edges)
+        return self._reverse
+
+    # Builds the graph from the "graph" entry of the json format in a single pass over the nodes
+    # The nodes are numbered in the order of the file and the neighbors of each node are sorted by name
+    # (adjacent nodes that are not defined in the graph are ignored)
+    @staticmethod
+    def from_definition(graph_def: Dict[str, Dict]) -> 'CompactGraph':
+        names = list(graph_def)
+        ids = {name: node for node, name in enumerate(names)}
+        xs, ys = array('d'), array('d')
+        offsets, targets = array('i', [0]), array('i')
+        for item in graph_def.values():
+            x, y = item.get("position", [0, 0])
+            xs.append(x)
+            ys.append(y)
+            targets.extend(ids[adjacent] for adjacent in sorted(item.get("adjacent", [])) if adjacent in ids)
+            offsets.append(len(targets))
+        return CompactGraph(names, xs, ys, offsets, targets, CompactGraph.edge_lengths(xs, ys, offsets, targets))
+
+    # Computes the straight line length of every edge
+    @staticmethod
+    def edge_lengths(xs: array, ys: array, offsets: array, targets: array) -> array:
+        if np is not None and len(targets) > 0:
+            x, y = np.frombuffer(xs, dtype=np.float64), np.frombuffer(ys, dtype=np.float64)
+            sources = np.repeat(np.arange(len(xs)), np.diff(np.frombuffer(offsets, dtype=np.int32)))
+            destinations = np.frombuffer(targets, dtype=np.int32)
+            dx, dy = x[sources] - x[destinations], y[sources] - y[destinations]
+            return array('d', np.sqrt(dx * dx + dy * dy).tobytes())
+        costs = array('d')
+        for node in range(len(xs)):
+            x, y = xs[node], ys[node]
+            for edge in range(offsets[node], offsets[node + 1]):
+                dx, dy = x - xs[targets[edge]], y - ys[targets[edge]]
+                costs.append(math.sqrt(dx * dx + dy * dy))
+        return costs
+
 # This is the implementation of the graph routing problem
 class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
-    def __init__(self, start: GraphNode, goal: GraphNode, adjacency: Dict[GraphNode, List[GraphNode]]) -> None:
+    def __init__(self, start: GraphNode, goal: GraphNode, adjacency: Dict[GraphNode, List[GraphNode]],
+                 costs: Optional[Dict[GraphNode, Dict[GraphNode, float]]] = None, graph: Optional[CompactGraph] = None) -> None:
         super().__init__()
         self.start = start
         self.goal = goal
         self.adjacency = adjacency
+        # The cost of every edge (costs[node][next_node]) is computed once instead of on every relaxation
+        if costs is None:
+            costs = {node: {next_node: euclidean_distance(node.position, next_node.position) for next_node in adjacent}
+                     for node, adjacent in adjacency.items()}
+        self.costs = costs
+        # The compact version of the graph (if the problem was loaded from a file) and the node of each of its numbers
+        self.graph = graph
+        self.nodes: Optional[List[GraphNode]] = None
+        # The reversed adjacency is only needed for backward search so it is built on the first request
+        self.reverse_adjacency: Dict[GraphNode, List[GraphNode]] = None
     
     def get_initial_state(self) -> GraphNode:
         return self.start
@@ -45,22 +181,150 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
     
     # The cost of an action is the distance between the current node and the next node 
     def get_cost(self, state: GraphNode, action: GraphNode) -> float:
-        return euclidean_distance(state.position, action.position)
+        return self.costs[state][action]
+
+    # The only goal state is the goal node
+    def get_goal_states(self) -> Iterable[GraphNode]:
+        return [self.goal]
+
+    # The predecessors of a node are the nodes that have an edge to it and the action is the node itself
+    def get_predecessors(self, state: GraphNode) -> Iterable[Tuple[GraphNode, GraphNode]]:
+        if self.reverse_adjacency is None:
+            reverse_adjacency: Dict[GraphNode, List[GraphNode]] = {}
+            for node, adjacent in self.adjacency.items():
+                for next_node in adjacent:
+                    reverse_adjacency.setdefault(next_node, []).append(node)
+            self.reverse_adjacency = reverse_adjacency
+        return [(previous, state) for previous in self.reverse_adjacency.get(state, [])]
+
+    # Returns the same problem where the states are the node numbers of the compact graph (see CompactGraphProblem)
+    def to_compact(self) -> 'CompactGraphProblem':
+        graph = self.graph
+        if graph is None:
+            nodes = list(self.adjacency)
+            nodes += [node for node in {self.start, self.goal}.union(*self.adjacency.values()) if node not in self.adjacency]
+            self.nodes = nodes
+            graph = self.graph = CompactGraph.from_definition({
+                node.name: {"position": list(node.position), "adjacent": [next_node.name for next_node in self.adjacency.get(node, [])]}
+                for node in nodes
+            })
+        return CompactGraphProblem(graph, graph.ids[self.start.name], graph.ids[self.goal.name])
     
     # Read a graph routing problem from file
     @staticmethod
     def from_file(path: str) -> 'GraphRoutingProblem':
-        problem_def: Dict[str, Dict] = json.load(open(path, 'r'))
+        return GraphRoutingProblem.from_definition(json.load(open(path, 'r')))
+
+    # Create a graph routing problem from its definition (the content of a graph file: the graph, the start and the goal)
+    @staticmethod
+    def from_definition(problem_def: Dict[str, Dict]) -> 'GraphRoutingProblem':
         graph_def: Dict[str, Dict] = problem_def.get("graph", {})
-        node_dict = {name: GraphNode(name, Point(*item.get("position", [0,0]))) for name, item in graph_def.items()}
+        graph = CompactGraph.from_definition(graph_def)
+        # Every node is created once and the edges of the compact graph are shared by the adjacency lists and the cost tables
+        nodes = [GraphNode(name, Point(*item.get("position", [0,0]))) for name, item in graph_def.items()]
         adjacency: Dict[GraphNode, List[GraphNode]] = {}
-        for name, item in graph_def.items():
-            node = node_dict[name]
-            adjacent = [node_dict[adjacent] for adjacent in sorted(item.get("adjacent", [])) if adjacent in node_dict]
-            adjacency[node] = adjacent
-        start = node_dict[problem_def.get("start", "")]
-        goal = node_dict[problem_def.get("goal", "")]
-        return GraphRoutingProblem(start, goal, adjacency)
+        costs: Dict[GraphNode, Dict[GraphNode, float]] = {}
+        offsets, targets, edge_costs = graph.offsets, graph.targets, graph.costs
+        for index, node in enumerate(nodes):
+            begin, end = offsets[index], offsets[index + 1]
+            adjacent = adjacency[node] = [nodes[target] for target in targets[begin:end]]
+            costs[node] = dict(zip(adjacent, edge_costs[begin:end]))
+        start = nodes[graph.ids[problem_def.get("start", "")]]
+        goal = nodes[graph.ids[problem_def.get("goal", "")]]
+        problem = GraphRoutingProblem(start, goal, adjacency, costs, graph)
+        problem.nodes = nodes
+        return problem
 
 def graphrouting_heuristic(problem: GraphRoutingProblem, state: GraphNode) -> float:
-    return euclidean_distance(state.position, problem.goal.position)
\ No newline at end of file
+    return euclidean_distance(state.position, problem.goal.position)
+
+# The straight line distance between any two nodes (used by the incremental replanning agent)
+def graphrouting_distance(problem: GraphRoutingProblem, state: GraphNode, other: GraphNode) -> float:
+    return euclidean_distance(state.position, other.position)
+
+# The integer version of the graph routing problem for large graphs
+# The states are node numbers and the actions are edge numbers, so every function is a lookup in the compact graph
+# and nothing is allocated during the search
+class CompactGraphProblem(Problem[int, int]):
+    def __init__(self, graph: CompactGraph, start: int, goal: int) -> None:
+        super().__init__()
+        self.graph = graph
+        self.start = start
+        self.goal = goal
+
+    def get_initial_state(self) -> int:
+        return self.start
+
+    # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    @track_call_count
+    def is_goal(self, state: int) -> bool:
+        return state == self.goal
+
+    def get_actions(self, state: int) -> Iterable[int]:
+        offsets = self.graph.offsets
+        return range(offsets[state], offsets[state + 1])
+
+    def get_successor(self, state: int, action: int) -> int:
+        return self.graph.targets[action]
+
+    def get_cost(self, state: int, action: int) -> float:
+        return self.graph.costs[action]
+
+    def get_goal_states(self) -> Iterable[int]:
+        return [self.goal]
+
+    def get_predecessors(self, state: int) -> Iterable[Tuple[int, int]]:
+        offsets, sources, edges = self.graph.reverse()
+        return [(sources[entry], edges[entry]) for entry in range(offsets[state], offsets[state + 1])]
+
+    # Returns the name of the node reached after each action of the given solution
+    def path_names(self, actions: Iterable[int]) -> List[str]:
+        return [self.graph.names[self.graph.targets[action]] for action in actions]
+
+def compact_graph_heuristic(problem: CompactGraphProblem, state: int) -> float:
+    return problem.graph.distance(state, problem.goal)
+
+def compact_graph_distance(problem: CompactGraphProblem, state: int, other: int) -> float:
+    return problem.graph.distance(state, other)
+
+# The version of the files that keep the arrays computed from a graph (the landmarks and the contraction hierarchies)
+# The files of another version are ignored and computed again, so it must be increased whenever their content changes
+GRAPH_FILE_FORMAT_VERSION = 1
+
+# Saves arrays computed from the graph: the first line is a json header with the format version, the kind of file,
+# the graph fingerprint and the name, typecode and length of every array, then the raw bytes of the arrays follow in the same order
+# The file only contains data (unlike a pickle, loading it can not run any code)
+def save_graph_arrays(path: str, kind: str, graph: CompactGraph, arrays: Sequence[Tuple[str, array]]) -> None:
+    header = {
+        "format": GRAPH_FILE_FORMAT_VERSION,
+        "kind": kind,
+        "fingerprint": graph.fingerprint(),
+        "byteorder": sys.byteorder,
+        "arrays": [[name, values.typecode, len(values)] for name, values in arrays],
+    }
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as f:
+        f.write(json.dumps(header).encode() + b"\n")
+        for _, values in arrays:
+            values.tofile(f)
+    os.replace(temporary_path, path)
+
+# Loads the arrays saved by save_graph_arrays as a dictionary from their names to their values
+# Returns None if the file does not exist, is incomplete, has another format version or kind, or was saved for another graph
+def load_graph_arrays(path: str, kind: str, graph: CompactGraph) -> Optional[Dict[str, array]]:
+    try:
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            if not isinstance(header, dict) or header.get("format") != GRAPH_FILE_FORMAT_VERSION or header.get("kind") != kind \
+                    or header.get("byteorder") != sys.byteorder or header.get("fingerprint") != graph.fingerprint():
+                return None
+            arrays = {}
+            for name, typecode, length in header["arrays"]:
+                values = array(typecode)
+                values.fromfile(f, length)
+                arrays[name] = values
+            if f.read(1):
+                return None
+    except (OSError, ValueError, TypeError, KeyError, EOFError):
+        return None
+    return arrays
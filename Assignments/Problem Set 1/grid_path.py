@@ -0,0 +1,161 @@
+from array import array
+from typing import List, Optional, Sequence, Tuple
+import time
+
+from frontier import IndexedPriorityQueue
+from mathutils import Direction
+from node_arena import NodeArena
+from search_stats import SearchStats
+
+# This file contains the path finding on 4-connected grids where every move costs 1 (e.g. the walkable cells of a dungeon)
+# It does not depend on any problem class: a grid is a flat sequence of cells and the cells are given by their index (y * width + x)
+# search.py exports JumpPointSearch and JumpPointTable with the other search functions
+
+# The precomputed jumps of a 4-connected grid used by JumpPointSearch
+# The grid is a flat sequence where grid[y * width + x] is truthy if the cell (x, y) is walkable and the cells are given by their index
+# A cell is a jump point for a direction if the shortest paths that enter it while moving in that direction may turn there,
+# which happens if it has a "forced" neighbor: a walkable side neighbor whose cell behind it (in the direction we came from) is a wall
+# so it is not reachable by a path that turned earlier
+# While moving vertically, a cell is also a jump point if a horizontal jump from it finds a jump point.
+# For every cell and direction (at index 4 * cell + direction) the table stores:
+#   spans: the number of steps that can be done in that direction before hitting a wall
+#   jumps: the number of steps to the first jump point in that direction (0 if there is none before the wall)
+# They are built by sweeping each row and column once (against the direction) so every jump becomes a lookup.
+class JumpPointTable:
+    def __init__(self, grid: Sequence[int], width: int) -> None:
+        self.width = width
+        self.height = height = len(grid) // width
+        size = width * height
+        self.spans = spans = array('i', [0]) * (4 * size)
+        self.jumps = jumps = array('i', [0]) * (4 * size)
+
+        # A copy of the grid with a border of walls so the neighbors of any cell can be read without checking the bounds
+        padded_width = width + 2
+        padded = bytearray(padded_width * (height + 2))
+        for y in range(height):
+            row = (y + 1) * padded_width + 1
+            padded[row: row + width] = bytes(map(bool, grid[y * width: (y + 1) * width]))
+
+        # The horizontal directions are swept first since the vertical jump points depend on the horizontal jumps
+        for direction in (Direction.RIGHT, Direction.LEFT, Direction.UP, Direction.DOWN):
+            vector = direction.to_vector()
+            horizontal = vector.x != 0
+            step = vector.y * padded_width + vector.x
+            next_offset = 4 * (vector.y * width + vector.x)
+            # The offsets from the entry of this direction to the entries of the horizontal directions of the same cell
+            right, left = Direction.RIGHT - direction, Direction.LEFT - direction
+            direction = int(direction)
+            # The side neighbors of a horizontal move are above and below it and those of a vertical move are to its left and right
+            side_a, side_b = (padded_width, -padded_width) if horizontal else (1, -1)
+            ys = range(height - 1, -1, -1) if step > 0 else range(height)
+            xs = range(width - 1, -1, -1) if step > 0 else range(width)
+            for y in ys:
+                padded_row, row = (y + 1) * padded_width + 1, y * width
+                for x in xs:
+                    next_cell = padded_row + x + step
+                    if not padded[next_cell]: continue
+                    index = 4 * (row + x) + direction
+                    next_index = index + next_offset
+                    spans[index] = spans[next_index] + 1
+                    # The next cell is a jump point if it has a forced neighbor
+                    # (or, for vertical moves, if a horizontal jump from it finds a jump point)
+                    if (padded[next_cell + side_a] and not padded[next_cell + side_a - step]
+                        or padded[next_cell + side_b] and not padded[next_cell + side_b - step]
+                        or not horizontal and (jumps[next_index + right] or jumps[next_index + left])):
+                        jumps[index] = 1
+                    elif jumps[next_index]:
+                        jumps[index] = jumps[next_index] + 1
+
+    # Returns the jump point found by moving from the cell in the given direction (None if a wall is hit first) and its distance
+    # The goal is also a jump point (and so is any cell, while moving vertically, from which the goal can be seen horizontally)
+    def jump(self, cell: int, direction: Direction, goal: int) -> Tuple[Optional[int], int]:
+        width, spans = self.width, self.spans
+        index = 4 * cell + direction
+        span, distance = spans[index], self.jumps[index]
+        x, y = cell % width, cell // width
+        goal_x, goal_y = goal % width, goal // width
+        vector = direction.to_vector()
+        if vector.x != 0:
+            goal_distance = (goal_x - x) * vector.x
+            if goal_y == y and 0 < goal_distance <= span and (distance == 0 or goal_distance < distance):
+                return goal, goal_distance
+        else:
+            goal_distance = (goal_y - y) * vector.y
+            if 0 < goal_distance <= span and (distance == 0 or goal_distance < distance):
+                row_cell = goal_y * width + x
+                side = Direction.RIGHT if goal_x > x else Direction.LEFT
+                if abs(goal_x - x) <= spans[4 * row_cell + side]:
+                    return row_cell, goal_distance
+        if distance == 0:
+            return None, span
+        return cell + distance * (vector.y * width + vector.x), distance
+
+# Jump Point Search for the shortest path between two cells of a 4-connected grid where every move costs 1
+# Instead of adding every neighbor to the frontier, the search moves in a straight line until it reaches a jump point
+# and only the jump points are added to the frontier (see JumpPointTable)
+# The returned path is the list of directions of every single step (or None if the goal can not be reached)
+def JumpPointSearch(table: JumpPointTable, start: int, goal: int, stats: Optional[SearchStats] = None) -> Optional[List[Direction]]:
+    search_start, expanded = time.perf_counter(), 0
+    width = table.width
+    goal_x, goal_y = goal % width, goal // width
+
+    # After a horizontal move, the shortest paths either keep going or turn up or down (and vice versa after a vertical move)
+    # so moving backward is never needed, the start node has no incoming direction so it tries all of them
+    turns = {
+        direction: (direction, direction.rotate(1), direction.rotate(-1)) for direction in Direction
+    }
+
+    def heuristic(cell: int) -> int:
+        return abs(cell % width - goal_x) + abs(cell // width - goal_y)
+
+    # The arena stores the jump points, the action of a node is the direction of the jump that reached it
+    nodes = NodeArena()
+    root = nodes.add(start)
+    frontier = IndexedPriorityQueue()
+    sequence = 0
+    frontier.push(start, (heuristic(start), heuristic(start), sequence), root)
+    explored = {start: root}
+    costs = nodes.costs
+    goal_node = None
+    while frontier:
+        cell, _, node = frontier.pop()
+        expanded += 1
+        if cell == goal:
+            goal_node = node
+            break
+        g_value = costs[node]
+        directions = tuple(Direction) if node == root else turns[nodes.action(node)]
+        for direction in directions:
+            next_cell, distance = table.jump(cell, direction, goal)
+            if next_cell is None: continue
+            next_g = g_value + distance
+            next_node = explored.get(next_cell)
+            if next_node is None:
+                next_node = nodes.add(next_cell, node, direction, next_g)
+                explored[next_cell] = next_node
+            elif next_g < costs[next_node]:
+                nodes.update(next_node, node, direction, next_g)
+            else:
+                continue
+            sequence += 1
+            # Among the cells with the same f-value, the one closest to the goal is expanded first (there are many ties on open grids)
+            next_h = heuristic(next_cell)
+            frontier.push(next_cell, (next_g + next_h, next_h, sequence), next_node)
+    if stats is not None:
+        stats.add_phase_time("search", time.perf_counter() - search_start)
+        stats.searches += 1
+        stats.nodes_generated += len(nodes)
+        stats.nodes_expanded += expanded
+        stats.observe_frontier(frontier.peak_size)
+    if goal_node is None:
+        return None
+    # Every jump is a straight line so it is expanded into one step per cell it crossed
+    path = []
+    parents = nodes.parents
+    node = goal_node
+    while node != root:
+        parent = parents[node]
+        path.extend([nodes.action(node)] * int(costs[node] - costs[parent]))
+        node = parent
+    path.reverse()
+    return path
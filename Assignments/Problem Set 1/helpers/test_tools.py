@@ -1,12 +1,15 @@
-from typing import List, Optional, Set, Tuple
+from typing import Callable, List, Optional, Set, Tuple, Union
 from agents import HeuristicFunction
 from graph import GraphRoutingProblem, graphrouting_heuristic
 from dungeon import DungeonProblem, Direction
+from parking import ParkingProblem
+# Imported here so it uses the parking problem of the problem set folder even after a solution module replaced it
+import pattern_database
 from problem import A, S, Problem
-from .utils import Result, fetch_recorded_calls, fetch_tracked_call_count, load_function
+from .utils import CacheContainer, Result, fetch_recorded_calls, fetch_tracked_call_count, load_function
 from .heuristic_checks import InconsistentHeuristicException, test_heuristic_consistency
 from functools import lru_cache
-import time
+import os, time
 
 def run_parking_trajectory(
     problem: Problem[S, A],
@@ -115,13 +118,17 @@ def compare_search_results_for_dungeon(
     message = f"Level:{nl}{level}{nl}Expected:{nl}{expected}{nl}Got:{nl}- Path: {path_to_str(output[0])}{nl}- Explored {output[1]} nodes"
     return Result(False, 0, message)
 
-def test_dungeon_heuristic(
-    function_path: str, 
-    problem: DungeonProblem) -> Tuple[float, int, str, float]:
-    fetch_tracked_call_count(DungeonProblem.is_goal)
-    heuristic = lru_cache(2**16)(load_function("dungeon_heuristic.strong_heuristic"))
-    original_get_successor = DungeonProblem.get_successor
-    DungeonProblem.get_successor = test_heuristic_consistency(heuristic)(DungeonProblem.get_successor)
+# Runs the search with the strong heuristic of the given module while checking the heuristic consistency on every transition
+# (the heuristic can also be given as a function instead of the path of a function)
+def _test_heuristic(
+    function_path: str,
+    problem: Problem[S, A],
+    heuristic_path: Union[str, Callable]) -> Tuple[float, int, str, float]:
+    problem_class = type(problem)
+    fetch_tracked_call_count(problem_class.is_goal)
+    heuristic = lru_cache(2**16)(load_function(heuristic_path) if isinstance(heuristic_path, str) else heuristic_path)
+    original_get_successor = problem_class.get_successor
+    problem_class.get_successor = test_heuristic_consistency(heuristic)(problem_class.get_successor)
     search_fn = load_function(function_path)
     initial_state = problem.get_initial_state()
     message = ""
@@ -132,9 +139,9 @@ def test_dungeon_heuristic(
         message = "Heuristic is inconsistent:\n" + str(err)
         return None, 1e10, message, 0
     finally:
-        DungeonProblem.get_successor = original_get_successor
+        problem_class.get_successor = original_get_successor
     elapsed = time.time() - start
-    explored = fetch_tracked_call_count(DungeonProblem.is_goal)
+    explored = fetch_tracked_call_count(problem_class.is_goal)
     path_cost = None
     if path is not None:
         path_cost = 0
@@ -146,6 +153,16 @@ def test_dungeon_heuristic(
         if goal_h != 0: message = f"Expected Heuristic at goal to be 0, got {goal_h}" + "\nGoal State:\n" + str(state)
     return path_cost, explored, message, elapsed
 
+def test_dungeon_heuristic(
+    function_path: str, 
+    problem: DungeonProblem) -> Tuple[float, int, str, float]:
+    return _test_heuristic(function_path, problem, "dungeon_heuristic.strong_heuristic")
+
+def test_parking_heuristic(
+    function_path: str, 
+    problem: ParkingProblem) -> Tuple[float, int, str, float]:
+    return _test_heuristic(function_path, problem, "parking_heuristic.strong_heuristic")
+
 def compare_heuristic_for_dungeon(
     output: Tuple[int, str, float],
     expected_path_cost: float,
@@ -164,4 +181,361 @@ def compare_heuristic_for_dungeon(
         for i, (u, l) in enumerate(zip(thresholds[:-1], thresholds[1:])):
             message += '\n' + f'grade = {i+1} if {u} >= nodes > {l}'
         message += '\n' + f'grade = {len(thresholds)} if {thresholds[-1]} >= nodes'
-    return Result(grade != 0, grade, message)
\ No newline at end of file
+    return Result(grade != 0, grade, message)
+
+# The parking heuristic is graded exactly like the dungeon heuristic (path cost and explored nodes thresholds)
+compare_heuristic_for_parking = compare_heuristic_for_dungeon
+
+# Runs a search function from the initial state of the problem (the extra arguments, e.g. a heuristic, are passed after the initial state)
+# and returns its path (None if it found no path), the cost of the path and a message that is not empty if the path does not lead to a goal
+def _solve(search_fn: Callable, problem: Problem[S, A], *args, **kwargs) -> Tuple[Optional[List[A]], Optional[float], str]:
+    initial_state = problem.get_initial_state()
+    path = search_fn(problem, initial_state, *args, **kwargs)
+    if path is None:
+        return None, None, ""
+    path_cost, state = 0, initial_state
+    for action in path:
+        path_cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    if not problem.is_goal(state):
+        return path, path_cost, "The path does not end at a goal state:\n" + str(state)
+    return path, path_cost, ""
+
+# Runs a search function (with the heuristic if one is given and any extra keyword arguments)
+# and returns the cost of its path (None if it found no path) and a message about the path
+# The additional algorithms are not part of the student's solution so they are always loaded from this folder
+def run_search_for_path_cost(
+    function_path: str,
+    problem: Problem[S, A],
+    heuristic_path: Optional[str] = None,
+    **kwargs) -> Tuple[Optional[float], str]:
+    heuristic = () if heuristic_path is None else (load_function(heuristic_path, use_local=True),)
+    _, path_cost, message = _solve(load_function(function_path, use_local=True), problem, *heuristic, **kwargs)
+    return path_cost, message
+
+# Checks that the cost is at most "bound" times the optimal cost (expected_path_cost is None if there is no solution)
+def compare_path_cost(
+    output: Tuple[Optional[float], str],
+    expected_path_cost: Optional[float],
+    bound: float = 1) -> Result:
+    path_cost, message = output
+    if message:
+        return Result(False, 0, message)
+    if expected_path_cost is None or path_cost is None:
+        if path_cost != expected_path_cost:
+            return Result(False, 0, f"Expected path cost to be {expected_path_cost}, got {path_cost}")
+        return Result(True, 1, "")
+    if not (expected_path_cost - 1e-9 <= path_cost <= bound * expected_path_cost + 1e-9):
+        expected = f"{expected_path_cost}" if bound == 1 else f"between {expected_path_cost} and {bound * expected_path_cost}"
+        return Result(False, 0, f"Expected path cost to be {expected}, got {path_cost}")
+    return Result(True, 1, f"Path cost: {path_cost}")
+
+# Returns the definition of a graph whose nodes are on a size x size grid and connected both ways to their 4 neighbors
+def _grid_graph_definition(size: int) -> dict:
+    name = lambda x, y: f"n{x}_{y}"
+    graph = {}
+    for y in range(size):
+        for x in range(size):
+            adjacent = [name(x + dx, y + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)) if 0 <= x + dx < size and 0 <= y + dy < size]
+            graph[name(x, y)] = {"position": [x, y], "adjacent": adjacent}
+    return graph
+
+# Moves an IncrementalReplanningAgent from a random start to a random goal of a size x size grid graph "runs" times
+# Every other step, the costs of "changes" random edges around the agent are set to 1, 3 or 10 times their length
+# (so the euclidean distance stays consistent) and the agent is told with notify_changes.
+# Every action is checked against the distances to the goal computed from scratch by Dijkstra
+# Returns an empty string if every action was on a shortest path, otherwise a description of the first wrong action
+def run_incremental_replanning(size: int, runs: int, changes: int, seed: int) -> str:
+    import random
+    from agents import IncrementalReplanningAgent
+    from graph import CompactGraph, CompactGraphProblem, compact_graph_distance
+    from landmarks import dijkstra_distances
+    rng = random.Random(seed)
+    base = CompactGraph.from_definition(_grid_graph_definition(size))
+    sources = [node for node in range(len(base)) for _ in base.edges(node)]
+    for run in range(runs):
+        graph = CompactGraph(base.names, base.xs, base.ys, base.offsets, base.targets, type(base.costs)(base.costs.typecode, base.costs))
+        start, goal = rng.sample(range(len(graph)), 2)
+        problem = CompactGraphProblem(graph, start, goal)
+        agent = IncrementalReplanningAgent(compact_graph_distance)
+        state, step = start, 0
+        while state != goal and step < 4 * size * size:
+            action = agent.act(problem, state)
+            distances = dijkstra_distances(graph, goal, reverse=True)
+            if action is None:
+                return f"Run {run + 1}, step {step}: no action was returned from node {graph.names[state]}"
+            if abs(graph.costs[action] + distances[graph.targets[action]] - distances[state]) > 1e-6:
+                return (f"Run {run + 1}, step {step}: the action from node {graph.names[state]} to {graph.names[graph.targets[action]]} "
+                        f"leads to a path of cost {graph.costs[action] + distances[graph.targets[action]]} but the shortest one costs {distances[state]}")
+            state, step = graph.targets[action], step + 1
+            if step % 2 == 0:
+                x, y = graph.xs[state], graph.ys[state]
+                nearby = [edge for edge in range(len(graph.costs)) if abs(graph.xs[sources[edge]] - x) + abs(graph.ys[sources[edge]] - y) <= 2]
+                edges = rng.sample(nearby, min(changes, len(nearby)))
+                for edge in edges:
+                    graph.costs[edge] = base.costs[edge] * rng.choice((1, 3, 10))
+                agent.notify_changes([(sources[edge], edge) for edge in edges])
+        if state != goal:
+            return f"Run {run + 1}: the agent did not reach the goal in {step} steps"
+    return ""
+
+# Passes if the test returned an empty message
+def check_no_error(output: str) -> Result:
+    return Result(not output, 0 if output else 1, output)
+
+# Returns a graph routing problem whose nodes are on a size x size grid (10 units apart and moved randomly by up to 3 units)
+# and connected to their 4 neighbors. Some of the edges are removed and some are one way
+# but the edges along the border always connect the start (the top left node) to the goal (the bottom right node).
+# The costs are the distances between the positions so the ties between paths are rare (the same size and seed always give the same graph)
+def random_graph_problem(size: int, seed: int) -> GraphRoutingProblem:
+    import random
+    rng = random.Random(seed)
+    name = lambda x, y: f"n{x}_{y}"
+    graph = {name(x, y): {"position": [10 * x + rng.randint(-3, 3), 10 * y + rng.randint(-3, 3)], "adjacent": []}
+             for y in range(size) for x in range(size)}
+    for y in range(size):
+        for x in range(size):
+            for dx, dy in ((1, 0), (0, 1)):
+                nx, ny = x + dx, y + dy
+                if nx >= size or ny >= size: continue
+                border = y == 0 or nx == size - 1
+                if not border and rng.random() < 0.2: continue
+                graph[name(x, y)]["adjacent"].append(name(nx, ny))
+                if border or rng.random() < 0.7:
+                    graph[name(nx, ny)]["adjacent"].append(name(x, y))
+    return GraphRoutingProblem.from_definition({"graph": graph, "start": name(0, 0), "goal": name(size - 1, size - 1)})
+
+# Runs Jump Point Search from the start of a dungeon to its exit (ignoring the coins)
+# and returns the length of its path (None if it found no path) and a message that is not empty if the path hits a wall or misses the exit
+def run_jump_point_search(problem: DungeonProblem) -> Tuple[Optional[int], str]:
+    layout = problem.layout
+    table = load_function("grid_path.JumpPointTable", use_local=True)(layout.grid, layout.width)
+    path = load_function("grid_path.JumpPointSearch", use_local=True)(table, layout.cell(layout.start), layout.exit_cell)
+    if path is None:
+        return None, ""
+    cell = layout.cell(layout.start)
+    for step, direction in enumerate(path):
+        cell = layout.neighbors[4 * cell + direction]
+        if cell == -1:
+            return len(path), f"Step {step + 1} of the path moves into a wall"
+    if cell != layout.exit_cell:
+        return len(path), f"The path ends at {layout.point(cell)} instead of the exit {layout.exit}"
+    return len(path), ""
+
+# Runs an anytime search (which returns a BoundedSolution) and returns the cost of its path, a message about the path
+# and the suboptimality bound that the search reported for its path
+def run_anytime_search_for_path_cost(
+    function_path: str,
+    problem: Problem[S, A],
+    heuristic_path: str,
+    **kwargs) -> Tuple[Optional[float], str, float]:
+    heuristic = load_function(heuristic_path, use_local=True)
+    path, path_cost, message = _solve(load_function(function_path, use_local=True), problem, heuristic, **kwargs)
+    return path_cost, message, getattr(path, "bound", 1)
+
+# Checks that the bound reported by the search is at most "bound" and that the cost respects the reported bound
+def compare_anytime_path_cost(
+    output: Tuple[Optional[float], str, float],
+    expected_path_cost: Optional[float],
+    bound: float = 1) -> Result:
+    path_cost, message, reported_bound = output
+    if reported_bound > bound:
+        return Result(False, 0, f"Expected the reported bound to be at most {bound}, got {reported_bound}")
+    return compare_path_cost((path_cost, message), expected_path_cost, reported_bound)
+
+# Runs A* on a parking problem with a pattern database heuristic while checking the heuristic consistency on every transition
+# (a consistent heuristic that is 0 at the goal never overestimates, so A* must return the optimal cost)
+# "combination" chooses the heuristic:
+#   "default" is parking_pattern_heuristic (the sum of the databases of disjoint groups of cars)
+#   "additive" and "max" combine the databases of the single cars with AdditivePatternDatabases and MaxPatternDatabases
+def test_pattern_database_heuristic(
+    function_path: str,
+    problem: ParkingProblem,
+    combination: str) -> Tuple[float, int, str, float]:
+    if combination == "default":
+        heuristic = pattern_database.parking_pattern_heuristic
+        # The databases are built on the first call: it is done before the consistency check is installed
+        # since the abstract problems are also parking problems and the check would run the heuristic on them
+        heuristic(problem, problem.get_initial_state())
+    else:
+        abstractions = [pattern_database.parking_abstraction(problem, (car,)) for car in range(len(problem.cars))]
+        databases = pattern_database.build_pattern_databases(abstractions, processes=1)
+        combine = {"additive": pattern_database.AdditivePatternDatabases, "max": pattern_database.MaxPatternDatabases}[combination]
+        heuristic = combine(databases)
+    return _test_heuristic(function_path, problem, heuristic)
+
+# Saves a pattern database of a parking problem in a temporary directory and checks that it is only loaded
+# with the key it was saved with, that the files of another format version are ignored
+# and that a file that refers to a function is rejected instead of calling it
+# Returns an empty string if every check passed, otherwise a description of the first failed check
+def check_pattern_database_files(problem: ParkingProblem) -> str:
+    import pickle, tempfile
+    abstract, projection = pattern_database.parking_abstraction(problem, (0,))
+    database = pattern_database.PatternDatabase.build(abstract, projection)
+    version = pattern_database.PDB_FORMAT_VERSION
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "database.pdb")
+        database.save(path, "key")
+        loaded = pattern_database.PatternDatabase.load(path, projection, "key")
+        if loaded is None or loaded.index != database.index or list(loaded.distances) != list(database.distances):
+            return "The saved database was not loaded back with the same states and distances"
+        if pattern_database.PatternDatabase.load(path, projection, "another key") is not None:
+            return "A database was loaded for another abstraction key"
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        for name, changed in (("an older format version", {**data, "format": version - 1}),
+                              ("a function", {**data, "states": [os.getcwd]})):
+            with open(path, 'wb') as f:
+                pickle.dump(changed, f)
+            if pattern_database.PatternDatabase.load(path, projection, "key") is not None:
+                return f"A database file with {name} was loaded"
+    return ""
+
+# Runs A* with the landmark heuristic (built with the given number of landmarks) and returns the cost of its path and a message about the path
+def run_landmark_search(problem: GraphRoutingProblem, count: int) -> Tuple[Optional[float], str]:
+    from landmarks import LandmarkHeuristic
+    heuristic = LandmarkHeuristic.build(problem.to_compact().graph, count)
+    _, path_cost, message = _solve(load_function("search.AStarSearch", use_local=True), problem, heuristic)
+    return path_cost, message
+
+# Saves the data computed from a graph with "save(path)" in a temporary directory then checks that "load(graph, path)"
+# returns the same data ("same" compares it with the saved data) and that the file is rejected
+# for another graph, with another format version and when a pickle is found instead
+# Returns an empty string if every check passed, otherwise a description of the first failed check
+def _check_graph_file(save: Callable[[str], None], load: Callable, graph, other_graph, same: Callable[[object], bool]) -> str:
+    import json, pickle, tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "graph.data")
+        save(path)
+        loaded = load(graph, path)
+        if loaded is None or not same(loaded):
+            return "The saved file was not loaded back with the same data"
+        if load(other_graph, path) is not None:
+            return "A file saved for another graph was loaded"
+        with open(path, 'rb') as f:
+            header, data = f.readline(), f.read()
+        header = json.loads(header)
+        header["format"] += 1
+        with open(path, 'wb') as f:
+            f.write(json.dumps(header).encode() + b"\n" + data)
+        if load(graph, path) is not None:
+            return "A file of another format version was loaded"
+        with open(path, 'wb') as f:
+            pickle.dump({"fingerprint": graph.fingerprint()}, f)
+        if load(graph, path) is not None:
+            return "A pickle file was loaded"
+    return ""
+
+# Checks that the landmarks of a random graph are saved and loaded back (see _check_graph_file)
+def check_landmark_files(size: int, seed: int, count: int) -> str:
+    from landmarks import LandmarkHeuristic
+    graph = random_graph_problem(size, seed).to_compact().graph
+    heuristic = LandmarkHeuristic.build(graph, count)
+    same = lambda loaded: loaded.landmarks == heuristic.landmarks and loaded.forward == heuristic.forward and loaded.backward == heuristic.backward
+    return _check_graph_file(heuristic.save, LandmarkHeuristic.load, graph, random_graph_problem(size, seed + 1).to_compact().graph, same)
+
+# Checks that the contraction hierarchy of a random graph is saved and loaded back (see _check_graph_file)
+def check_hierarchy_files(size: int, seed: int) -> str:
+    from contraction_hierarchy import ContractionHierarchy
+    graph = random_graph_problem(size, seed).to_compact().graph
+    hierarchy = ContractionHierarchy.build(graph)
+    same = lambda loaded: loaded.rank == hierarchy.rank and loaded.forward == hierarchy.forward and loaded.backward == hierarchy.backward
+    save = lambda path: hierarchy.save(graph, path)
+    return _check_graph_file(save, ContractionHierarchy.load, graph, random_graph_problem(size, seed + 1).to_compact().graph, same)
+
+# Solves "count" random queries (and as many queries from a single start to exercise the chunks) with solve_many
+# on a random graph (see random_graph_problem) saved in a temporary directory (so the landmarks and the hierarchy files are saved there)
+# and checks every result against the distances computed by Dijkstra
+# Returns an empty string if every result is a path with the shortest cost (or no path if the goal is unreachable), otherwise a description of the first wrong result
+def run_batch_routing(size: int, seed: int, algorithm: str, processes: int, count: int) -> str:
+    import json, random, tempfile
+    from landmarks import dijkstra_distances
+    solve_many = load_function("batch_routing.solve_many", use_local=True)
+    problem = random_graph_problem(size, seed)
+    graph = problem.to_compact().graph
+    rng = random.Random(seed)
+    queries = [(rng.choice(graph.names), rng.choice(graph.names)) for _ in range(count)]
+    start = rng.choice(graph.names)
+    queries += [(start, rng.choice(graph.names)) for _ in range(count)]
+    with tempfile.TemporaryDirectory() as directory:
+        graph_path = os.path.join(directory, "graph.json")
+        with open(graph_path, 'w') as f:
+            json.dump({"graph": {name: {"position": [graph.xs[node], graph.ys[node]], "adjacent": [graph.names[other] for other in graph.neighbors(node)]}
+                                 for node, name in enumerate(graph.names)}}, f)
+        results = list(solve_many(graph_path, queries, algorithm, processes))
+    if sorted(result.index for result in results) != list(range(len(queries))):
+        return f"Expected one result for each of the {len(queries)} queries, got {len(results)} results"
+    distances = {}
+    for result in results:
+        start, goal = graph.ids[result.start], graph.ids[result.goal]
+        if start not in distances:
+            distances[start] = dijkstra_distances(graph, start)
+        expected = distances[start][goal]
+        if result.path is None:
+            if expected != float('inf'):
+                return f"Query {result.index} ({result.start} -> {result.goal}): no path was found but the shortest one costs {expected}"
+            continue
+        nodes = [start] + [graph.ids[name] for name in result.path]
+        if nodes[-1] != goal or any(graph.edge(source, target) == -1 for source, target in zip(nodes, nodes[1:])):
+            return f"Query {result.index} ({result.start} -> {result.goal}): the path {result.path} is not a walk from the start to the goal"
+        cost = sum(graph.costs[graph.edge(source, target)] for source, target in zip(nodes, nodes[1:]))
+        if abs(cost - expected) > 1e-6 or abs(result.cost - cost) > 1e-6:
+            return f"Query {result.index} ({result.start} -> {result.goal}): the path costs {cost} (reported {result.cost}) but the shortest one costs {expected}"
+    return ""
+
+# Applies the operations to a new cache (created by CacheContainer.cache with the given policy and maxsize) and returns
+# the result of every "get" (None for a miss), the keys evicted by every "set" in order, the keys left in the cache (sorted)
+# and the (hits, misses, evictions) counts
+# Each operation is ("set", key, value), ("get", key) or ("del", key)
+def run_cache_operations(policy: str, maxsize: Optional[int], operations: List[tuple]) -> tuple:
+    cache = CacheContainer().cache("test", maxsize=maxsize, policy=policy)
+    values, evicted = [], []
+    for operation, key, *value in operations:
+        if operation == "set":
+            before = set(cache)
+            cache[key] = value[0]
+            evicted.extend(sorted(before - set(cache)))
+        elif operation == "get":
+            values.append(cache.get(key))
+        else:
+            del cache[key]
+    stats = cache.stats
+    return values, evicted, sorted(cache), (stats.hits, stats.misses, stats.evictions)
+
+# Checks that the invalid cache requests raise a ValueError
+# Returns an empty string if every check passed, otherwise a description of the first failed check
+def check_cache_errors() -> str:
+    container = CacheContainer()
+    container.cache("lru", maxsize=2, policy="lru")
+    requests = {
+        "a cache with a maxsize of 0": lambda: container.cache("zero", maxsize=0, policy="lru"),
+        "an unknown policy": lambda: container.cache("unknown", maxsize=2, policy="fifo"),
+        "an lru cache without a maxsize": lambda: container.cache("unbounded", policy="lru"),
+        "a bounded cache without a namespace": lambda: container.cache(maxsize=2),
+        "an existing cache with another policy": lambda: container.cache("lru", maxsize=2, policy="lfu"),
+        "an existing cache with another maxsize": lambda: container.cache("lru", maxsize=3, policy="lru"),
+    }
+    for name, request in requests.items():
+        try:
+            request()
+        except ValueError:
+            continue
+        return f"Requesting {name} did not raise a ValueError"
+    return ""
+
+# helpers/utils.py is copied in every problem set and the copies must stay identical
+# If the other problem sets are next to this one (as in the course repository), checks that their copies match this one
+# Returns an empty string if every copy matches (or if there is no other copy), otherwise the paths of the copies that differ
+def check_utils_copies() -> str:
+    import glob
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils.py")
+    with open(path, 'rb') as f:
+        content = f.read()
+    pattern = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(path))), "Problem Set *", "**", "helpers", "utils.py")
+    different = []
+    for copy in sorted(glob.glob(pattern, recursive=True)):
+        if os.path.samefile(copy, path): continue
+        with open(copy, 'rb') as f:
+            if f.read() != content:
+                different.append(copy)
+    return "" if not different else "These copies of helpers/utils.py differ from this one:\n" + "\n".join(different)
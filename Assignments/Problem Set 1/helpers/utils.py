@@ -1,7 +1,11 @@
-from typing import Any, Callable, Dict, List
+# This file is copied in the helpers folder of every problem set and the copies are kept identical on purpose:
+# a change made here must be copied to all of them (the "Caches" question of Problem Set 1 checks that they match)
+import os, sys
+from typing import Any, Callable, Dict, List, Optional
 from dataclasses import dataclass
-from collections import deque
-import importlib, os, sys
+from collections import deque, OrderedDict
+from collections.abc import MutableMapping
+import importlib
 from importlib import util as ilu
 import traceback
 
@@ -21,6 +25,13 @@ def load_function(name: str, use_local: bool = False) -> Callable:
             spec.loader.exec_module(module)
         else:
             module = importlib.import_module(path)
+            # The module may have been replaced by the one in the solution folder (when a solution function was loaded before)
+            # so the local version is read from the problem set folder
+            if use_local and solution_path and os.path.dirname(os.path.abspath(module.__file__)) == os.path.abspath(solution_path):
+                local_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                spec = ilu.spec_from_file_location(path, os.path.join(local_path, *path.split(".")) + ".py")
+                module = ilu.module_from_spec(spec)
+                spec.loader.exec_module(module)
         return getattr(module, function)
     except Exception as err:
         print(f"Error while loading function {name}")
@@ -77,14 +88,203 @@ def add_call_listener(listener):
         return decorated
     return decorator
 
+# The statistics of a cache: a lookup is a hit if the key was found and a miss otherwise
+# an eviction is an entry that was removed to make room for a new one
+@dataclass
+class CacheStats:
+    hits:       int = 0
+    misses:     int = 0
+    evictions:  int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+_MISSING = object()
+
+# A dictionary that counts its hits and misses (only "cache[key]" and "cache.get(key)" are counted, "key in cache" is not)
+# If a maxsize is given, the cache never holds more than maxsize entries
+# This class never evicts anything (policy "none"): once it is full, the new keys are not stored
+# The subclasses choose an entry to evict instead
+class Cache(MutableMapping):
+    policy = "none"
+
+    def __init__(self, maxsize: Optional[int] = None) -> None:
+        if maxsize is not None and maxsize <= 0:
+            raise ValueError(f"The maxsize of a cache must be positive, got {maxsize}")
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self.data = self._new_data()
+
+    def _new_data(self) -> Dict[Any, Any]:
+        return {}
+
+    # Called when an existing entry is read or replaced
+    def _touch(self, key: Any) -> None:
+        pass
+
+    # Called after a new entry is added and after an entry is deleted
+    def _added(self, key: Any) -> None:
+        pass
+
+    def _removed(self, key: Any) -> None:
+        pass
+
+    # Removes an entry to make room for a new one, returns False if nothing can be removed
+    def _evict(self) -> bool:
+        return False
+
+    def __getitem__(self, key: Any) -> Any:
+        value = self.data.get(key, _MISSING)
+        if value is _MISSING:
+            self.stats.misses += 1
+            raise KeyError(key)
+        self.stats.hits += 1
+        self._touch(key)
+        return value
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        value = self.data.get(key, _MISSING)
+        if value is _MISSING:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        self._touch(key)
+        return value
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        if key in self.data:
+            self.data[key] = value
+            self._touch(key)
+            return
+        if self.maxsize is not None and len(self.data) >= self.maxsize and not self._evict():
+            return
+        self.data[key] = value
+        self._added(key)
+
+    def __delitem__(self, key: Any) -> None:
+        del self.data[key]
+        self._removed(key)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def clear(self) -> None:
+        self.data = self._new_data()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(maxsize={self.maxsize}, size={len(self)}, stats={self.stats})"
+
+# Evicts the least recently used entry
+class LRUCache(Cache):
+    policy = "lru"
+
+    def _new_data(self) -> Dict[Any, Any]:
+        return OrderedDict()
+
+    def _touch(self, key: Any) -> None:
+        self.data.move_to_end(key)
+
+    def _evict(self) -> bool:
+        self.data.popitem(last=False)
+        self.stats.evictions += 1
+        return True
+
+# Evicts the least frequently used entry (the least recently used one among those with the same frequency)
+# The keys are grouped in buckets by their frequency so every operation takes a constant time
+class LFUCache(Cache):
+    policy = "lfu"
+
+    def _new_data(self) -> Dict[Any, Any]:
+        self.frequencies: Dict[Any, int] = {}
+        self.buckets: Dict[int, OrderedDict] = {}
+        self.min_frequency = 0
+        return {}
+
+    def _move(self, key: Any, frequency: int) -> None:
+        self.frequencies[key] = frequency
+        bucket = self.buckets.get(frequency)
+        if bucket is None:
+            bucket = self.buckets[frequency] = OrderedDict()
+        bucket[key] = None
+
+    def _unlink(self, key: Any) -> int:
+        frequency = self.frequencies.pop(key)
+        bucket = self.buckets[frequency]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[frequency]
+        return frequency
+
+    def _touch(self, key: Any) -> None:
+        frequency = self._unlink(key)
+        if frequency == self.min_frequency and frequency not in self.buckets:
+            self.min_frequency = frequency + 1
+        self._move(key, frequency + 1)
+
+    def _added(self, key: Any) -> None:
+        self._move(key, 1)
+        self.min_frequency = 1
+
+    def _removed(self, key: Any) -> None:
+        self._unlink(key)
+
+    def _evict(self) -> bool:
+        if self.min_frequency not in self.buckets:
+            # The least frequent entries were deleted by the user
+            self.min_frequency = min(self.buckets)
+        key, _ = self.buckets[self.min_frequency].popitem(last=False)
+        if not self.buckets[self.min_frequency]:
+            del self.buckets[self.min_frequency]
+        del self.frequencies[key]
+        del self.data[key]
+        self.stats.evictions += 1
+        return True
+
+CACHE_POLICIES = {cls.policy: cls for cls in (Cache, LRUCache, LFUCache)}
+
 class CacheContainer:
-    def cache(self) -> Dict[Any, Any]:
-        if hasattr(self, "_cache"):
-            return getattr(self, "_cache")
-        else:
-            cache = {}
-            setattr(self, "_cache", cache)
-            return cache
+    # Without arguments, returns the dictionary shared by everything that uses the object's cache
+    # With a namespace, returns an independent cache that is created on the first call
+    # (maxsize bounds the number of entries and the policy chooses what is evicted when it is full: "none", "lru" or "lfu")
+    def cache(self, namespace: Optional[str] = None, maxsize: Optional[int] = None, policy: str = "none") -> MutableMapping:
+        if namespace is None:
+            if maxsize is not None or policy != "none":
+                raise ValueError("A bounded cache needs a namespace")
+            if hasattr(self, "_cache"):
+                return getattr(self, "_cache")
+            else:
+                cache = {}
+                setattr(self, "_cache", cache)
+                return cache
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy '{policy}', expected one of {', '.join(CACHE_POLICIES)}")
+        if policy != "none" and maxsize is None:
+            raise ValueError(f"The '{policy}' policy needs a maxsize")
+        caches = getattr(self, "_caches", None)
+        if caches is None:
+            caches = {}
+            setattr(self, "_caches", caches)
+        cache = caches.get(namespace)
+        if cache is None:
+            cache = caches[namespace] = CACHE_POLICIES[policy](maxsize)
+        elif cache.policy != policy or cache.maxsize != maxsize:
+            raise ValueError(f"The cache '{namespace}' already exists with policy '{cache.policy}' and maxsize {cache.maxsize}")
+        return cache
+
+    # Returns the statistics of every namespaced cache
+    def cache_stats(self) -> Dict[str, CacheStats]:
+        return {namespace: cache.stats for namespace, cache in getattr(self, "_caches", {}).items()}
 
 # Unused
 def _cache_function(self) -> Dict[Any, Any]:
@@ -0,0 +1,128 @@
+from array import array
+from typing import List, Optional, Sequence, Union
+import heapq, os
+
+from graph import CompactGraph, CompactGraphProblem, GraphNode, GraphRoutingProblem, load_graph_arrays, save_graph_arrays
+
+# This file contains the landmark (ALT) heuristic of the graph routing problem
+# A few nodes are chosen as landmarks and the shortest distances from and to every landmark are computed once with Dijkstra.
+# Then, by the triangle inequality, for any landmark L, node v and goal t:
+#   d(v, t) >= d(L, t) - d(L, v)    and    d(v, t) >= d(v, L) - d(t, L)
+# so the largest of these differences is an admissible (and consistent) estimate of the distance from v to t.
+# The distances only depend on the graph, so they are saved next to the graph file and reused by all the queries on it.
+
+# The number of landmarks used by default
+DEFAULT_LANDMARK_COUNT = 8
+
+# Returns the distance from the source to every node using Dijkstra (infinity for the nodes that can not be reached)
+# If reverse is True, the edges are followed backwards so it returns the distance from every node to the source
+def dijkstra_distances(graph: CompactGraph, source: int, reverse: bool = False) -> array:
+    if reverse:
+        offsets, nodes, edges = graph.reverse()
+    else:
+        offsets, nodes, edges = graph.offsets, graph.targets, None
+    costs = graph.costs
+    distances = array('d', [float('inf')]) * len(graph)
+    distances[source] = 0
+    queue = [(0.0, source)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if distance > distances[node]: continue
+        for entry in range(offsets[node], offsets[node + 1]):
+            next_node = nodes[entry]
+            next_distance = distance + costs[entry if edges is None else edges[entry]]
+            if next_distance < distances[next_node]:
+                distances[next_node] = next_distance
+                heapq.heappush(queue, (next_distance, next_node))
+    return distances
+
+# Returns the path where the landmarks of the given graph file are saved (e.g. "graphs/graph1.json" -> "graphs/graph1.landmarks")
+def landmarks_path(graph_path: str) -> str:
+    return os.path.splitext(graph_path)[0] + ".landmarks"
+
+class LandmarkHeuristic:
+    def __init__(self, graph: CompactGraph, landmarks: Sequence[int], forward: List[array], backward: List[array]) -> None:
+        self.graph = graph
+        self.landmarks = list(landmarks)
+        # forward[i][v] is the distance from landmark 'i' to node 'v' and backward[i][v] is the distance from node 'v' to landmark 'i'
+        self.forward = forward
+        self.backward = backward
+
+    # Chooses the landmarks with the farthest point heuristic: each new landmark is the reachable node
+    # that is the farthest from the landmarks chosen so far (the first one is the farthest from node 0)
+    # Landmarks on the border of the graph give tighter estimates than random ones
+    @staticmethod
+    def build(graph: CompactGraph, count: int = DEFAULT_LANDMARK_COUNT) -> 'LandmarkHeuristic':
+        landmarks, forward, backward = [], [], []
+        if len(graph) == 0:
+            return LandmarkHeuristic(graph, landmarks, forward, backward)
+        inf = float('inf')
+        # The distance from every node to the closest chosen landmark (or node 0 before the first landmark is chosen)
+        closest = dijkstra_distances(graph, 0)
+        for _ in range(min(count, len(graph))):
+            landmark = max(range(len(graph)), key=lambda node: closest[node] if closest[node] < inf and node not in landmarks else -1)
+            if landmark in landmarks: break
+            landmarks.append(landmark)
+            forward.append(dijkstra_distances(graph, landmark))
+            backward.append(dijkstra_distances(graph, landmark, reverse=True))
+            if len(landmarks) == 1:
+                closest = array('d', forward[0])
+            else:
+                closest = array('d', map(min, closest, forward[-1]))
+        return LandmarkHeuristic(graph, landmarks, forward, backward)
+
+    # Returns the lower bound of the distance from the node to the goal
+    def estimate(self, node: int, goal: int) -> float:
+        best = 0.0
+        for forward, backward in zip(self.forward, self.backward):
+            # The differences are NaN if both distances are infinite and comparisons with NaN are False so they are ignored
+            value = forward[goal] - forward[node]
+            if value > best: best = value
+            value = backward[node] - backward[goal]
+            if value > best: best = value
+        return best
+
+    # The heuristic can be used with both versions of the graph routing problem
+    def __call__(self, problem: Union[GraphRoutingProblem, CompactGraphProblem], state: Union[GraphNode, int]) -> float:
+        if isinstance(state, GraphNode):
+            ids = self.graph.ids
+            return self.estimate(ids[state.name], ids[problem.goal.name])
+        return self.estimate(state, problem.goal)
+
+    # The landmarks and their distances are saved as plain arrays (see save_graph_arrays)
+    def save(self, path: str) -> None:
+        arrays = [("landmarks", array('i', self.landmarks))]
+        for index, (forward, backward) in enumerate(zip(self.forward, self.backward)):
+            arrays += [(f"forward{index}", forward), (f"backward{index}", backward)]
+        save_graph_arrays(path, "landmarks", self.graph, arrays)
+
+    # Loads the landmarks from the given file (None if the file does not exist, has another format or belongs to another graph)
+    @staticmethod
+    def load(graph: CompactGraph, path: str) -> Optional['LandmarkHeuristic']:
+        arrays = load_graph_arrays(path, "landmarks", graph)
+        if arrays is None or "landmarks" not in arrays:
+            return None
+        landmarks = list(arrays["landmarks"])
+        try:
+            forward = [arrays[f"forward{index}"] for index in range(len(landmarks))]
+            backward = [arrays[f"backward{index}"] for index in range(len(landmarks))]
+        except KeyError:
+            return None
+        if any(row.typecode != 'd' or len(row) != len(graph) for row in forward + backward):
+            return None
+        return LandmarkHeuristic(graph, landmarks, forward, backward)
+
+    # Loads the landmarks saved next to the graph file if they match the graph and have at least the requested count
+    # otherwise builds them and saves them (if the directory is not writable, they are still built but not saved)
+    @staticmethod
+    def load_or_build(graph: CompactGraph, graph_path: str, count: int = DEFAULT_LANDMARK_COUNT) -> 'LandmarkHeuristic':
+        path = landmarks_path(graph_path)
+        heuristic = LandmarkHeuristic.load(graph, path)
+        if heuristic is not None and len(heuristic.landmarks) >= min(count, len(graph)):
+            return LandmarkHeuristic(graph, heuristic.landmarks[:count], heuristic.forward[:count], heuristic.backward[:count])
+        heuristic = LandmarkHeuristic.build(graph, count)
+        try:
+            heuristic.save(path)
+        except OSError:
+            pass
+        return heuristic
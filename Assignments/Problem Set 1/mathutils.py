@@ -1,8 +1,16 @@
+from array import array
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import Iterator
+from operator import itemgetter
+from typing import Dict, Iterator, List, Tuple
 import math
 
+# NumPy is optional, it is only used to build the movement tables of large grids at once
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # the class Point will hold a 2D coordinate on a discrete grid
 # We use dataclass with frozen=True to automatically implement:
 #   the constructor, the == operator, the hash function and to make the class immutable
@@ -32,6 +40,66 @@ class Point:
     def __iter__(self) -> Iterator[int]:
         return iter((self.x, self.y))
 
+    # Frozen dataclasses with slots can not be unpickled by assigning their fields so we rebuild them with the constructor
+    # (this is needed to send points to other processes)
+    def __reduce__(self):
+        return (Point, (self.x, self.y))
+
+# An alternative implementation of Point as a tuple subclass with the same interface (x, y, unpacking, +, -, negative and str)
+# The tuple is created and hashed in C, so construction and hashing skip the dataclass __init__ (which sets every field
+# with object.__setattr__ because the class is frozen) and the generated __hash__ (which builds a tuple of the fields on every call).
+# The differences with Point: it is equal to the plain tuple with the same coordinates, it can be indexed (point[0] is x)
+# and the tuple operators that are not overridden (e.g. "*" and "<") behave like the tuple ones.
+# Run "python -m bench.point_benchmark" to compare the implementations before switching.
+class TuplePoint(tuple):
+    __slots__ = ()
+
+    def __new__(cls, x: int, y: int) -> 'TuplePoint':
+        return tuple.__new__(cls, (x, y))
+
+    # The getters are itemgetters so reading a coordinate does not call a Python function
+    x = property(itemgetter(0))
+    y = property(itemgetter(1))
+
+    def __add__(self, other: 'TuplePoint') -> 'TuplePoint':
+        return tuple.__new__(TuplePoint, (self[0] + other[0], self[1] + other[1]))
+
+    def __sub__(self, other: 'TuplePoint') -> 'TuplePoint':
+        return tuple.__new__(TuplePoint, (self[0] - other[0], self[1] - other[1]))
+
+    def __neg__(self) -> 'TuplePoint':
+        return tuple.__new__(TuplePoint, (-self[0], -self[1]))
+
+    def __str__(self) -> str:
+        return f'({self[0]}, {self[1]})'
+
+    def __repr__(self) -> str:
+        return f'TuplePoint(x={self[0]}, y={self[1]})'
+
+    def __reduce__(self):
+        return (TuplePoint, tuple(self))
+
+# The shared points of a grid: every cell requested from the table gets a single Point object shared by all the callers
+# so the tables and the layouts that hold many points do not keep many copies of the same coordinate.
+# Every grid owns its table, so the points are freed with the grid instead of living as long as the process.
+class PointTable:
+    __slots__ = ("width", "points")
+
+    def __init__(self, width: int) -> None:
+        self.width = width
+        self.points: Dict[int, Point] = {}
+
+    # Returns the shared Point of the cell with the given index (y * width + x), it is created on the first request
+    def point(self, cell: int) -> Point:
+        point = self.points.get(cell)
+        if point is None:
+            point = self.points[cell] = Point(cell % self.width, cell // self.width)
+        return point
+
+    # Returns the shared Point of the given coordinate
+    def at(self, x: int, y: int) -> Point:
+        return self.point(y * self.width + x)
+
 # This is a helper function to compute the manhattan distance between 2 points
 def manhattan_distance(p1: Point, p2: Point) -> int:
     return abs(p1.x - p2.x) + abs(p1.y - p2.y)
@@ -75,4 +143,54 @@ Direction._Vectors = [
     Point( 0, -1),
     Point(-1,  0),
     Point( 0,  1)
-]
\ No newline at end of file
+]
+
+# The walkable directions of a cell for every 4 bit mask where bit "d" is set if the direction "d" does not lead into a wall
+_DIRECTIONS_BY_MASK = [tuple(direction for direction in Direction if mask >> direction & 1) for mask in range(16)]
+
+# Returns the movement tables of a grid where grid[y * width + x] is 1 if the cell (x, y) is walkable and 0 otherwise:
+#   neighbors[4 * cell + direction] is the cell reached by moving in the direction (-1 if it is a wall or outside the grid)
+#   actions[cell] is the tuple of the directions that do not lead into a wall (in the order of Direction)
+# The problems use these tables to move between cell indices without creating a Point on every move
+def grid_neighbor_tables(grid: bytes, width: int, height: int) -> Tuple[array, List[Tuple[Direction, ...]]]:
+    size = width * height
+    if np is not None and size > 0:
+        walkable = np.frombuffer(grid, dtype=np.uint8).reshape(height, width) == 1
+        cells = np.arange(size, dtype=np.int32).reshape(height, width)
+        neighbors = np.full((height, width, 4), -1, dtype=np.int32)
+        # Every direction connects the slice of the source cells to the shifted slice of the destination cells
+        for direction, (source, destination) in {
+            Direction.RIGHT: ((slice(None), slice(None, -1)), (slice(None), slice(1, None))),
+            Direction.UP:    ((slice(1, None), slice(None)), (slice(None, -1), slice(None))),
+            Direction.LEFT:  ((slice(None), slice(1, None)), (slice(None), slice(None, -1))),
+            Direction.DOWN:  ((slice(None, -1), slice(None)), (slice(1, None), slice(None))),
+        }.items():
+            open_cells = walkable[source] & walkable[destination]
+            neighbors[source + (direction,)] = np.where(open_cells, cells[destination], -1)
+        masks = np.zeros((height, width), dtype=np.uint8)
+        for direction in Direction:
+            masks |= (neighbors[:, :, direction] != -1).astype(np.uint8) << np.uint8(direction)
+        # The direction tuples are picked by an object array lookup so the 16 tuples are shared by all the cells
+        actions_by_mask = np.empty(16, dtype=object)
+        actions_by_mask[:] = _DIRECTIONS_BY_MASK
+        table = array('i')
+        table.frombytes(neighbors.tobytes())
+        return table, actions_by_mask[masks.ravel()].tolist()
+    neighbors = array('i', [-1]) * (4 * size)
+    actions: List[Tuple[Direction, ...]] = [()] * size
+    cell = grid.find(1)
+    while cell != -1:
+        x, y = cell % width, cell // width
+        mask = 0
+        for direction, other, inside in (
+            (Direction.RIGHT, cell + 1, x + 1 < width),
+            (Direction.UP, cell - width, y > 0),
+            (Direction.LEFT, cell - 1, x > 0),
+            (Direction.DOWN, cell + width, y + 1 < height),
+        ):
+            if inside and grid[other] == 1:
+                neighbors[4 * cell + direction] = other
+                mask |= 1 << direction
+        actions[cell] = _DIRECTIONS_BY_MASK[mask]
+        cell = grid.find(1, cell + 1)
+    return neighbors, actions
@@ -0,0 +1,66 @@
+from array import array
+from typing import Any, Dict, Generic, List, Optional, TypeVar
+
+# S and A are used for generic typing where S represents the state type and A represents the action type
+S = TypeVar("S")
+A = TypeVar("A")
+
+# This file contains the node arena shared by the search functions
+# Instead of creating a (state, parent, action) tuple for every generated node and keeping a parent dictionary,
+# every node is an integer index into parallel arrays which hold its state, parent index, action id and path cost.
+# Actions are interned so each node stores a small integer instead of a reference to its own action object.
+# The frontiers then only need to store integers and the path is reconstructed by following the parent indices.
+
+# The parent index of the root node (the initial state)
+NO_PARENT = -1
+
+class NodeArena(Generic[S, A]):
+    def __init__(self) -> None:
+        self.states: List[S] = []
+        self.parents = array('q')
+        self.actions = array('q')
+        self.costs = array('d')
+        # Maps each distinct action to its id and each id back to its action
+        self._action_ids: Dict[Any, int] = {}
+        self._action_table: List[A] = []
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def _action_id(self, action: Optional[A]) -> int:
+        if action is None:
+            return NO_PARENT
+        action_id = self._action_ids.get(action)
+        if action_id is None:
+            action_id = len(self._action_table)
+            self._action_ids[action] = action_id
+            self._action_table.append(action)
+        return action_id
+
+    # Adds a node and returns its index
+    def add(self, state: S, parent: int = NO_PARENT, action: Optional[A] = None, cost: float = 0) -> int:
+        self.states.append(state)
+        self.parents.append(parent)
+        self.actions.append(self._action_id(action))
+        self.costs.append(cost)
+        return len(self.states) - 1
+
+    # Replaces the parent, action and path cost of an existing node (used when a cheaper path is found)
+    def update(self, node: int, parent: int, action: A, cost: float) -> None:
+        self.parents[node] = parent
+        self.actions[node] = self._action_id(action)
+        self.costs[node] = cost
+
+    # Returns the action that led to the given node
+    def action(self, node: int) -> A:
+        return self._action_table[self.actions[node]]
+
+    # Returns the list of actions from the root to the given node
+    def path(self, node: int) -> List[A]:
+        parents, actions, table = self.parents, self.actions, self._action_table
+        path = []
+        while parents[node] != NO_PARENT:
+            path.append(table[actions[node]])
+            node = parents[node]
+        path.reverse()
+        return path
@@ -1,10 +1,13 @@
-from typing import Any, Dict, Set, Tuple, List
+from typing import Any, Dict, List, Optional, Set, Tuple
 from problem import Problem
-from mathutils import Direction, Point
+from mathutils import Direction, Point, PointTable, grid_neighbor_tables
 from helpers import utils
 
 #TODO: (Optional) Instead of Any, you can define a type for the parking state
-ParkingState = Tuple[Point]
+# The parking state is a tuple (cells, occupied) where cells[i] is the index of the cell of car 'i' (y * width + x)
+# and occupied is a bitmask where the bit of every cell that contains a car is set.
+# So checking whether a cell is free is a bit test and hashing a state only hashes integers.
+ParkingState = Tuple[Tuple[int, ...], int]
 # An action of the parking problem is a tuple containing an index 'i' and a direction 'd' where car 'i' should move in the direction 'd'.
 ParkingAction = Tuple[int, Direction]
 
@@ -16,35 +19,60 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
                             # if a position does not contain a parking slot, it will not be in this dictionary.
     width: int              # The width of the parking lot.
     height: int             # The height of the parking lot.
+    # The following tables are built once in from_text and they are indexed by the cell index (y * width + x)
+    moves: List[Tuple[Tuple[Direction, int], ...]]  # moves[cell] contains a (direction, next cell) pair for every direction that does not lead into a wall.
+    neighbors: List[int]    # neighbors[4 * cell + direction] is the cell reached by moving in the direction (-1 if it is a wall).
+    slot_owners: List[int]  # slot_owners[cell] is the index of the car whose slot is on this cell (-1 if there is no slot).
+    goal_cells: Optional[Tuple[int, ...]] # The cell of the slot of every car (None if a car has no slot).
+    points: PointTable      # The shared Point of every cell (so the same cell always gives the same Point).
+
+    # Returns the index of the cell at the given point and the point at the given cell index
+    def cell(self, point: Point) -> int:
+        return point.y * self.width + point.x
+
+    def point(self, cell: int) -> Point:
+        return self.points.point(cell)
+
+    # Returns the positions of the cars in the given state
+    def car_positions(self, state: ParkingState) -> Tuple[Point, ...]:
+        return tuple(self.point(cell) for cell in state[0])
+
+    # Returns the grid representation of the parking lot at the given state
+    # where cars are letters, free slots are digits, walls are '#' and empty passages are '.'
+    def state_to_text(self, state: ParkingState) -> str:
+        owners = {cell: chr(ord('A') + car) for car, cell in enumerate(state[0])}
+        def cell_to_text(cell: int) -> str:
+            if cell in owners:
+                return owners[cell]
+            if self.slot_owners[cell] != -1:
+                return str(self.slot_owners[cell])
+            return '.' if self.moves[cell] or self.point(cell) in self.passages else '#'
+        return '\n'.join(''.join(cell_to_text(y * self.width + x) for x in range(self.width)) for y in range(self.height))
 
     # This function should return the initial state
     def get_initial_state(self) -> ParkingState:
         #TODO: ADD YOUR CODE HERE
-        return tuple(self.cars)
+        cells = tuple(self.cell(car) for car in self.cars)
+        occupied = 0
+        for cell in cells:
+            occupied |= 1 << cell
+        return cells, occupied
     
     # This function should return True if the given state is a goal. Otherwise, it should return False.
+    # Every car 'i' must be in the slot 'i' (and not in the slot of another car)
+    @utils.track_call_count
     def is_goal(self, state: ParkingState) -> bool:
-        # Loop through all the cars' positions
-        for i, car in enumerate(state):
-            print(f"\033[91mChecking car {i} at position {car}\033[0m")  
-            print(self.slots)
-            index_of_parked_car = self.slots.get(car, None)  # Get the index of the car parked at the current position
-            #print(f"\033[91mExpected slot position for car {i}: {slot_position}\033[0m")  
-            if i != index_of_parked_car:  # Check if the car is in its slot and not in the slot of another car
-                print(f"\033[91mCar {i} is not in its slot. Goal state: False\033[0m")  
-                return False
-        print(f"\033[91mAll cars are in their slots. Goal state: True\033[0m")  
-        return True
-        
+        return state[0] == self.goal_cells
     
     # This function returns a list of all the possible actions that can be applied to the given state
     def get_actions(self, state: ParkingState) -> List[ParkingAction]:
         #TODO: ADD YOUR CODE HERE
+        cells, occupied = state
+        moves = self.moves
         actions = []
-        for i, car in enumerate(state): # loop through all the cars
-            for direction in Direction: # loop through all the allowed directions
-                new_position = car + direction.to_vector() # calculate the new position of the car after the action
-                if new_position in self.passages and new_position not in state : # check if the new position is a passage and no car is already there
+        for i, cell in enumerate(cells): # loop through all the cars
+            for direction, next_cell in moves[cell]: # loop through all the directions that do not lead into a wall
+                if not occupied >> next_cell & 1: # check that no car is already there
                     actions.append((i, direction))
         return actions
     
@@ -52,26 +80,22 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
     def get_successor(self, state: ParkingState, action: ParkingAction) -> ParkingState:
         #TODO: ADD YOUR CODE HERE
         car_index, direction = action
-        car_position = state[car_index]
-        new_position = car_position + direction.to_vector()
-        new_state = list(state)
-        new_state[car_index] = new_position
-        return tuple(new_state)
+        cells, occupied = state
+        cell = cells[car_index]
+        next_cell = self.neighbors[4 * cell + direction]
+        if next_cell == -1:
+            # If the car tries to move into a wall, the state does not change
+            return state
+        return cells[:car_index] + (next_cell,) + cells[car_index + 1:], occupied ^ (1 << cell | 1 << next_cell)
     
     # This function returns the cost of applying the given action to the given state
     def get_cost(self, state: ParkingState, action: ParkingAction) -> float:
         #TODO: ADD YOUR CODE HERE
         car_index, direction = action
-        car_position = state[car_index]
-        
-        # debugging
-        # print(f"\033[91m{direction.to_vector()}\033[0m")
-        # print(f"\033[91m{car_position}\033[0m")
-        
-        new_position = car_position + direction.to_vector()
-        
+        next_cell = self.neighbors[4 * state[0][car_index] + direction]
         # Check if the new position is another car's parking slot
-        if new_position in self.slots and self.slots[new_position] != car_index:
+        owner = self.slot_owners[next_cell]
+        if owner != -1 and owner != car_index:
             return 101.0
         return 1.0
     
@@ -82,22 +106,40 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         cars, slots = {}, {}
         lines = [line for line in (line.strip() for line in text.splitlines()) if line]
         width, height = max(len(line) for line in lines), len(lines)
+        points = PointTable(width)
         for y, line in enumerate(lines):
             for x, char in enumerate(line):
                 if char != "#":
-                    passages.add(Point(x, y))
+                    position = points.at(x, y)
+                    passages.add(position)
                     if char == '.':
                         pass
                     elif char in "ABCDEFGHIJ":
-                        cars[ord(char) - ord('A')] = Point(x, y)
+                        cars[ord(char) - ord('A')] = position
                     elif char in "0123456789":
-                        slots[int(char)] = Point(x, y)
+                        slots[int(char)] = position
         problem = ParkingProblem()
         problem.passages = passages
         problem.cars = tuple(cars[i] for i in range(len(cars)))
         problem.slots = {position:index for index, position in slots.items()}
         problem.width = width
         problem.height = height
+        problem.points = points
+        # Build the move tables of every cell (a wall has no moves)
+        grid = bytearray(width * height)
+        for position in passages:
+            grid[problem.cell(position)] = 1
+        neighbors, directions = grid_neighbor_tables(grid, width, height)
+        problem.neighbors = list(neighbors)
+        problem.moves = [
+            tuple((direction, neighbors[4 * cell + direction]) for direction in cell_directions)
+            for cell, cell_directions in enumerate(directions)
+        ]
+        problem.slot_owners = [-1] * (width * height)
+        for index, position in slots.items():
+            problem.slot_owners[problem.cell(position)] = index
+        # The goal can not be reached if a car has no slot
+        problem.goal_cells = tuple(problem.cell(slots[i]) for i in range(len(cars))) if all(i in slots for i in range(len(cars))) else None
         return problem
 
     # Read a parking problem from file containing a grid of tiles
@@ -0,0 +1,49 @@
+from typing import List, Sequence, Tuple
+from parking import ParkingProblem, ParkingState
+from mathutils import Direction
+import heapq
+
+# This file contains the heuristic of the parking problem
+# Every car has to drive at least from its cell to its slot and, since every action moves a single car,
+# the sum of the cheapest drive of every car is a lower bound on the cost of solving the level (it is admissible).
+# The cheapest drive of a car ignores the other cars but it uses the costs of the problem:
+#   entering a cell costs 1, or 101 if it is the slot of another car
+# so the penalty of crossing the other cars' slots is only counted when the car can not avoid it.
+# An action changes the drive of a single car by at most the cost of the action, so the heuristic is also consistent.
+
+# Returns a list where entry 'i' contains the cost of driving car 'i' from every cell to its slot (infinity if it can not reach it)
+# It runs Dijkstra backward from the slot: the cost of a move only depends on the cell it enters and every move can be reversed
+# It only reads the cell tables of the level (see ParkingProblem) so it can be used with any representation of the level
+def slot_distances(moves: Sequence[Sequence[Tuple[Direction, int]]], slot_owners: Sequence[int], goal_cells: Sequence[int], size: int, car_count: int) -> List[List[float]]:
+    maps = []
+    for car in range(car_count):
+        distances = [float('inf')] * size
+        slot = goal_cells[car]
+        distances[slot] = 0
+        queue = [(0, slot)]
+        while queue:
+            distance, cell = heapq.heappop(queue)
+            if distance > distances[cell]: continue
+            owner = slot_owners[cell]
+            # The cost of moving from a neighbor into this cell
+            cost = 101 if owner != -1 and owner != car else 1
+            for _, previous in moves[cell]:
+                if distance + cost < distances[previous]:
+                    distances[previous] = distance + cost
+                    heapq.heappush(queue, (distance + cost, previous))
+        maps.append(distances)
+    return maps
+
+def slot_distance_maps(problem: ParkingProblem) -> List[List[float]]:
+    return slot_distances(problem.moves, problem.slot_owners, problem.goal_cells, problem.width * problem.height, len(problem.cars))
+
+def strong_heuristic(problem: ParkingProblem, state: ParkingState) -> float:
+    # If a car has no slot, the goal can not be reached
+    if problem.goal_cells is None:
+        return float('inf')
+    # The maps only depend on the level so they are computed once and stored in the problem's cache
+    cache = problem.cache()
+    maps = cache.get("slot_distance_maps")
+    if maps is None:
+        maps = cache["slot_distance_maps"] = slot_distance_maps(problem)
+    return sum(distances[cell] for distances, cell in zip(maps, state[0]))
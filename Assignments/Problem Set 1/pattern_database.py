@@ -0,0 +1,273 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generic, Hashable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+import hashlib, heapq, multiprocessing, os, pickle
+
+from problem import Problem, S, A
+from dungeon import DungeonLayout, DungeonProblem, DungeonState
+from parking import ParkingProblem, ParkingState
+
+# This file contains the pattern database heuristics
+# A pattern database is built from an abstraction of a problem: a smaller problem (e.g. the parking lot with only some of the cars)
+# and a projection that maps every state of the original problem to a state of the smaller one.
+# The abstraction must only remove constraints (every move of the original problem is still possible in the smaller one
+# with the same or a lower cost) so the exact cost to the goal in the smaller problem is an admissible heuristic.
+# The database is built in two sweeps:
+#   1. a forward sweep that enumerates every abstract state reachable from the abstract initial state and records the transitions
+#   2. a backward Dijkstra from the abstract goal states over the reversed transitions
+# Then the heuristic of a state is a single lookup of its projection.
+
+# AS is the type of the abstract states
+AS = TypeVar("AS", bound=Hashable)
+
+# The directory where the databases are saved by default (it is ignored by git)
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "pattern_databases")
+
+# The version of the database files. It is stored in every file and it is part of the default file names,
+# so it must be increased whenever the file content or an abstraction changes: the old files are then built again instead of being used.
+PDB_FORMAT_VERSION = 2
+
+# The database files only contain builtin values (the abstract states and the distances) so the unpickler refuses every class or function:
+# a file that was changed to run code when it is loaded fails to load (and the database is built again)
+class _BuiltinUnpickler(pickle.Unpickler):
+    def find_class(self, module: str, name: str) -> Any:
+        raise pickle.UnpicklingError(f"A pattern database file can not contain '{module}.{name}'")
+
+# The goal tests are usually counted to measure the explored nodes of a search (see track_call_count and record_calls)
+# so the goal tests done while building a database (possibly in the middle of a search) are not counted
+@contextmanager
+def _untracked_goal_tests(problem: Problem) -> Iterator[None]:
+    is_goal = type(problem).is_goal
+    calls = getattr(is_goal, "calls", None)
+    saved = calls.copy() if hasattr(calls, "copy") else calls
+    try:
+        yield
+    finally:
+        if calls is not None:
+            setattr(is_goal, "calls", saved)
+
+class PatternDatabase(Generic[S, AS]):
+    def __init__(self, projection: Callable[[S], AS], index: Dict[AS, int], distances: array) -> None:
+        self.projection = projection
+        # The index of every abstract state and the exact cost from it to the nearest abstract goal
+        self.index = index
+        self.distances = distances
+
+    def __len__(self) -> int:
+        return len(self.distances)
+
+    # Enumerates the abstract problem and computes the cost to the goal of every abstract state
+    @staticmethod
+    def build(abstract_problem: Problem[AS, Any], projection: Callable[[S], AS]) -> 'PatternDatabase[S, AS]':
+        index: Dict[AS, int] = {}
+        states: List[AS] = []
+        # The reversed transitions: for every state, the list of (previous state, cost) pairs
+        predecessors: List[List[Tuple[int, float]]] = []
+        goals: List[int] = []
+        initial_state = abstract_problem.get_initial_state()
+        index[initial_state] = 0
+        states.append(initial_state)
+        predecessors.append([])
+        with _untracked_goal_tests(abstract_problem):
+            head = 0
+            while head < len(states):
+                state = states[head]
+                if abstract_problem.is_goal(state):
+                    goals.append(head)
+                for action in abstract_problem.get_actions(state):
+                    next_state = abstract_problem.get_successor(state, action)
+                    next_index = index.get(next_state)
+                    if next_index is None:
+                        next_index = index[next_state] = len(states)
+                        states.append(next_state)
+                        predecessors.append([])
+                    predecessors[next_index].append((head, abstract_problem.get_cost(state, action)))
+                head += 1
+        distances = array('d', [float('inf')]) * len(states)
+        queue = []
+        for goal in goals:
+            distances[goal] = 0
+            queue.append((0, goal))
+        while queue:
+            distance, state = heapq.heappop(queue)
+            if distance > distances[state]: continue
+            for previous, cost in predecessors[state]:
+                if distance + cost < distances[previous]:
+                    distances[previous] = distance + cost
+                    heapq.heappush(queue, (distance + cost, previous))
+        return PatternDatabase(projection, index, distances)
+
+    # The heuristic: the cost to the goal of the projected state
+    # A state whose projection was not enumerated (it is not reachable from the abstract initial state) gets 0
+    def __call__(self, problem: Problem[S, A], state: S) -> float:
+        position = self.index.get(self.projection(state))
+        return 0 if position is None else self.distances[position]
+
+    # Saves the abstract states and their distances with the format version and the key of the abstraction
+    # The projection is not saved (it is given again to load), so the abstract states must be builtin values (e.g. tuples of ints) to be loaded
+    def save(self, path: str, key: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as f:
+            pickle.dump({
+                "format": PDB_FORMAT_VERSION,
+                "key": key,
+                "states": list(self.index),
+                "distances": self.distances.tobytes(),
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+    # Loads the database saved for the abstraction with the given key
+    # Returns None if the file does not exist, can not be read, has another format version or belongs to another abstraction
+    @staticmethod
+    def load(path: str, projection: Callable[[S], AS], key: str) -> Optional['PatternDatabase[S, AS]']:
+        try:
+            with open(path, 'rb') as f:
+                data = _BuiltinUnpickler(f).load()
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(data, dict) or data.get("format") != PDB_FORMAT_VERSION or data.get("key") != key:
+            return None
+        states, distances = data.get("states"), array('d')
+        try:
+            distances.frombytes(data.get("distances"))
+            index = {state: position for position, state in enumerate(states)}
+        except (TypeError, ValueError):
+            return None
+        if len(index) != len(distances):
+            return None
+        return PatternDatabase(projection, index, distances)
+
+# The sum of databases built from disjoint patterns
+# It is only admissible if every action cost is counted by at most one of the patterns
+# (e.g. parking patterns with disjoint sets of cars since every action moves a single car)
+class AdditivePatternDatabases:
+    def __init__(self, databases: Sequence[PatternDatabase]) -> None:
+        self.databases = list(databases)
+
+    def __call__(self, problem: Problem[S, A], state: S) -> float:
+        return sum(database(problem, state) for database in self.databases)
+
+# The maximum of any admissible heuristics (e.g. databases built from overlapping patterns) is admissible
+class MaxPatternDatabases:
+    def __init__(self, databases: Sequence[Callable[[Problem[S, A], S], float]]) -> None:
+        self.databases = list(databases)
+
+    def __call__(self, problem: Problem[S, A], state: S) -> float:
+        return max(database(problem, state) for database in self.databases)
+
+def _build(abstraction: Tuple[Problem, Callable]) -> PatternDatabase:
+    return PatternDatabase.build(*abstraction)
+
+# Builds the databases of the given (abstract problem, projection) pairs in parallel using a process pool
+# If a directory is given, each database is loaded from "<directory>/<name>.pdb" if it exists and saved there otherwise
+# The name of an abstraction is also its key: it must change whenever the abstraction changes (e.g. parking_abstraction_key)
+def build_pattern_databases(abstractions: Sequence[Tuple[Problem, Callable]], names: Optional[Sequence[str]] = None,
+                            directory: Optional[str] = None, processes: Optional[int] = None) -> List[PatternDatabase]:
+    paths = [None] * len(abstractions)
+    if directory is not None and names is not None:
+        paths = [os.path.join(directory, f"{name}.pdb") for name in names]
+    databases: List[Optional[PatternDatabase]] = [None] * len(abstractions)
+    for position, path in enumerate(paths):
+        if path is not None:
+            databases[position] = PatternDatabase.load(path, abstractions[position][1], names[position])
+    missing = [position for position, database in enumerate(databases) if database is None]
+    if len(missing) == 1 or processes == 1:
+        built = [_build(abstractions[position]) for position in missing]
+    elif missing:
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+            built = list(executor.map(_build, [abstractions[position] for position in missing]))
+    else:
+        built = []
+    for position, database in zip(missing, built):
+        databases[position] = database
+        if paths[position] is not None:
+            database.save(paths[position], names[position])
+    return databases
+
+# The projection of a parking state to the state of a lot that only contains some of the cars
+class ParkingProjection:
+    def __init__(self, cars: Sequence[int]) -> None:
+        self.cars = tuple(cars)
+
+    def __call__(self, state: ParkingState) -> ParkingState:
+        cells = tuple(state[0][car] for car in self.cars)
+        occupied = 0
+        for cell in cells:
+            occupied |= 1 << cell
+        return cells, occupied
+
+# Returns the abstraction of a parking problem that only keeps the given cars (they are renumbered in the given order)
+# The slots of the removed cars stay in the lot so entering them still costs 101
+def parking_abstraction(problem: ParkingProblem, cars: Sequence[int]) -> Tuple[ParkingProblem, ParkingProjection]:
+    cars = tuple(cars)
+    renumbered = {car: position for position, car in enumerate(cars)}
+    abstract = ParkingProblem()
+    abstract.passages = problem.passages
+    abstract.width, abstract.height = problem.width, problem.height
+    abstract.cars = tuple(problem.cars[car] for car in cars)
+    abstract.slots = {position: renumbered[car] for position, car in problem.slots.items() if car in renumbered}
+    abstract.moves, abstract.neighbors, abstract.points = problem.moves, problem.neighbors, problem.points
+    # The slots of the removed cars get owners that are not the index of any kept car
+    abstract.slot_owners = [
+        owner if owner == -1 else renumbered.get(owner, len(cars) + owner) for owner in problem.slot_owners
+    ]
+    abstract.goal_cells = None if problem.goal_cells is None else tuple(problem.goal_cells[car] for car in cars)
+    return abstract, ParkingProjection(cars)
+
+# The projection of a dungeon state to the state of a layout that only contains some of the coins
+class DungeonProjection:
+    def __init__(self, layout: DungeonLayout, coins: Sequence[int]) -> None:
+        self.layout = layout
+        self.coins = tuple(coins)
+
+    def __call__(self, state: DungeonState) -> DungeonState:
+        mask = state.coin_mask
+        abstract_mask = 0
+        for position, coin in enumerate(self.coins):
+            if mask >> coin & 1:
+                abstract_mask |= 1 << position
+        return DungeonState(self.layout, state.player_cell | (abstract_mask << self.layout.cell_bits))
+
+# Returns the abstraction of a dungeon problem that only keeps the given coins (given by their index in layout.coins)
+def dungeon_abstraction(problem: DungeonProblem, coins: Sequence[int]) -> Tuple[DungeonProblem, DungeonProjection]:
+    layout = problem.layout
+    coins = tuple(coins)
+    abstract_layout = DungeonLayout(layout.width, layout.height, layout.walkable, layout.exit,
+                                    tuple(layout.coins[coin] for coin in coins), layout.start)
+    abstract = DungeonProblem()
+    abstract.layout = abstract_layout
+    projection = DungeonProjection(abstract_layout, coins)
+    abstract.initial_state = projection(problem.initial_state)
+    return abstract, projection
+
+# Returns the key of a parking abstraction: a hash of the file format version, the original lot, the abstract lot
+# (its cars, their slots and the slots of the removed cars) and the projection (its class and the kept cars)
+def parking_abstraction_key(problem: ParkingProblem, abstract: ParkingProblem, projection: ParkingProjection) -> str:
+    digest = hashlib.sha1(f"{PDB_FORMAT_VERSION}:{type(projection).__qualname__}:{projection.cars}".encode())
+    digest.update(problem.state_to_text(problem.get_initial_state()).encode())
+    digest.update(repr((abstract.get_initial_state(), abstract.slot_owners, abstract.goal_cells)).encode())
+    return digest.hexdigest()
+
+# The number of cars in each pattern of the default parking databases
+PARKING_PATTERN_SIZE = 3
+
+# A ready to use parking heuristic: the sum of the databases of disjoint groups of (at most) PARKING_PATTERN_SIZE cars
+# The databases are built on the first call, kept in the problem cache and saved to CACHE_DIRECTORY
+# (the file names are the keys of the abstractions so that the next runs on the same lot load them instead)
+def parking_pattern_heuristic(problem: ParkingProblem, state: ParkingState) -> float:
+    cache = problem.cache()
+    heuristic = cache.get("pattern_databases")
+    if heuristic is None:
+        if problem.goal_cells is None:
+            heuristic = lambda *_: float('inf')
+        else:
+            cars = range(len(problem.cars))
+            patterns = [tuple(cars[i:i + PARKING_PATTERN_SIZE]) for i in range(0, len(cars), PARKING_PATTERN_SIZE)]
+            abstractions = [parking_abstraction(problem, pattern) for pattern in patterns]
+            names = [f"parking-v{PDB_FORMAT_VERSION}-{parking_abstraction_key(problem, *abstraction)}" for abstraction in abstractions]
+            heuristic = AdditivePatternDatabases(build_pattern_databases(abstractions, names, CACHE_DIRECTORY))
+        cache["pattern_databases"] = heuristic
+    return heuristic(problem, state)
@@ -1,9 +1,11 @@
 from typing import List
 from dungeon import DungeonProblem, Direction, DungeonState, DungeonTile
-from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
+from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent, IncrementalReplanningAgent
 from helpers.utils import fetch_tracked_call_count
 from helpers.heuristic_checks import test_heuristic_consistency
-from functools import lru_cache
+from search_stats import SearchStats, current_commit
+from mathutils import manhattan_distance
+from functools import lru_cache, partial
 import argparse, time
 
 def colored_dungeon(level: str):
@@ -57,6 +59,9 @@ def create_agent(args: argparse.Namespace):
     if agent_type == "ucs":
         from search import UniformCostSearch
         return UninformedSearchAgent(UniformCostSearch)
+    if agent_type == "bidir":
+        from search import BidirectionalSearch
+        return UninformedSearchAgent(BidirectionalSearch)
     if agent_type == "astar":
         from search import AStarSearch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
@@ -65,6 +70,36 @@ def create_agent(args: argparse.Namespace):
         if args.checks:
             DungeonProblem.get_successor = test_heuristic_consistency(heuristic)(DungeonProblem.get_successor)
         return InformedSearchAgent(AStarSearch, heuristic)
+    if agent_type in ("idastar", "smastar"):
+        from search import IterativeDeepeningAStar, SimplifiedMemoryBoundedAStar
+        search_fn = IterativeDeepeningAStar if agent_type == "idastar" else SimplifiedMemoryBoundedAStar
+        # The memory bounded searches are given the node budget chosen by the user
+        search_fn = partial(search_fn, node_budget=args.node_budget)
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        if args.checks:
+            DungeonProblem.get_successor = test_heuristic_consistency(heuristic)(DungeonProblem.get_successor)
+        return InformedSearchAgent(search_fn, heuristic)
+    if agent_type in ("wastar", "portfolio"):
+        from search import WeightedAStarSearch, PortfolioSearch
+        # Weighted A* uses the weight chosen by the user and the portfolio only accepts results within the chosen bound
+        if agent_type == "wastar":
+            search_fn = partial(WeightedAStarSearch, weight=args.weight)
+        else:
+            search_fn = partial(PortfolioSearch, bound=args.bound)
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        if args.checks:
+            DungeonProblem.get_successor = test_heuristic_consistency(heuristic)(DungeonProblem.get_successor)
+        return InformedSearchAgent(search_fn, heuristic)
+    if agent_type == "arastar":
+        from search import AnytimeRepairingAStar
+        # Every time the anytime search finds a better path (or a tighter bound), we tell the user
+        def report_solution(path, bound):
+            print(f"Found a path with {len(path)} steps (at most {bound:.3f} times the optimal cost)")
+        search_fn = partial(AnytimeRepairingAStar, initial_weight=args.weight, time_budget=args.time_budget, on_solution=report_solution)
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        if args.checks:
+            DungeonProblem.get_successor = test_heuristic_consistency(heuristic)(DungeonProblem.get_successor)
+        return InformedSearchAgent(search_fn, heuristic)
     if agent_type == "gbfs":
         from search import BestFirstSearch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
@@ -73,6 +108,16 @@ def create_agent(args: argparse.Namespace):
         if args.checks:
             DungeonProblem.get_successor = test_heuristic_consistency(heuristic)(DungeonProblem.get_successor)
         return InformedSearchAgent(BestFirstSearch, heuristic)
+    if agent_type == "dstar":
+        # The dungeon heuristics estimate the distance to the goal, but D* Lite needs the distance between any two states
+        if args.heuristic != "zero":
+            print(f"Heuristic '{args.heuristic}' cannot be used with D* Lite (it always uses the manhattan distance between the players)")
+            exit(-1)
+        # D* Lite needs the distance between any two states: the manhattan distance between the players is consistent
+        # since every action moves the player by one tile and costs 1
+        def player_distance(problem: DungeonProblem, state: DungeonState, other: DungeonState) -> float:
+            return manhattan_distance(state.player, other.player)
+        return IncrementalReplanningAgent(player_distance)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -80,11 +125,18 @@ def main(args: argparse.Namespace):
     state_printer = lambda state: print(state)
     if args.ansicolors: state_printer = lambda state: print(colored_dungeon(str(state)))
     start = time.time() # Track run time
-    problem = DungeonProblem.from_file(args.level) # create the problem
+    stats = SearchStats() # This will collect the statistics of all the searches done by the agent
+    with stats.phase("load"):
+        problem = DungeonProblem.from_file(args.level) # create the problem
     state = problem.get_initial_state() # Get the initial state
     print("Initial State:")
     state_printer(state)
     agent = create_agent(args)
+    # Search agents report their searches to the stats object
+    if isinstance(agent, (UninformedSearchAgent, InformedSearchAgent)):
+        agent.search_fn = partial(agent.search_fn, stats=stats)
+    elif isinstance(agent, IncrementalReplanningAgent):
+        agent.stats = stats
     step = 0 # This will store the current step
     total_explored_nodes = 0 # This will store the number of traversed nodes during search
     unsolvable = False # This will store whether the problem is unsolvable or not
@@ -96,8 +148,11 @@ def main(args: argparse.Namespace):
             print("Agent cannot find a solution, exiting...")
             unsolvable = True
             break
-        # Get the number of traversed nodes
-        total_explored_nodes += fetch_tracked_call_count(DungeonProblem.is_goal)
+        # Get the number of traversed nodes (D* Lite does not test for the goal, it counts its own expansions)
+        if isinstance(agent, IncrementalReplanningAgent):
+            total_explored_nodes = agent.expanded
+        else:
+            total_explored_nodes += fetch_tracked_call_count(DungeonProblem.is_goal)
         # Apply the action to the state
         state = problem.get_successor(state, action)
         step += 1
@@ -115,6 +170,12 @@ def main(args: argparse.Namespace):
     # This was a search agent, display the number of traversed nodes
     if not isinstance(agent, HumanAgent):
         print(f"Search explored {total_explored_nodes} nodes")
+        # If desired by the user, we print and/or export the search statistics
+        if args.stats:
+            print("Search Statistics:")
+            print(stats)
+        if args.stats_json:
+            stats.save(args.stats_json, level=args.level, agent=args.agent, commit=current_commit())
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
 
@@ -124,11 +185,23 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Dungeon as Human or AI")
     parser.add_argument("level", help="path to the dungeon to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'bidir', 'astar', 'wastar', 'arastar', 'idastar', 'smastar', 'portfolio', 'gbfs', 'dstar'],
                         help="the agent that will play the game")
+    parser.add_argument("--stats", "-s", action="store_true", default=False,
+                        help="print the search statistics (generated and expanded nodes, frontier size, heuristic time, ...)")
+    parser.add_argument("--stats-json", default=None,
+                        help="export the search statistics to the given json file")
     parser.add_argument("--heuristic", '-hf', default="zero",
                         choices=["zero", "weak", "strong"],
-                        help="choose the heuristic to use with A* or Greedy Best First Search")
+                        help="choose the heuristic to use with A*, Weighted A*, ARA*, IDA*, SMA*, the portfolio or Greedy Best First Search (D* Lite only accepts 'zero' since it uses the manhattan distance between the players)")
+    parser.add_argument("--node-budget", "-nb", type=int, default=100000,
+                        help="the maximum number of nodes kept in memory by IDA* (transposition table) and SMA*")
+    parser.add_argument("--weight", "-w", type=float, default=2.0,
+                        help="the weight of the heuristic in Weighted A* (and the initial weight of ARA*)")
+    parser.add_argument("--time-budget", "-tb", type=float, default=None,
+                        help="the number of seconds after which ARA* stops improving its path and returns the best one it found")
+    parser.add_argument("--bound", "-b", type=float, default=float('inf'),
+                        help="the portfolio only accepts a path whose cost is guaranteed to be at most bound times the optimal cost")
     parser.add_argument("--checks", "-c", action='store_true', default=False,
                         help="Enable consistency checks for the heuristic")
     parser.add_argument("--ansicolors", "-ac", action="store_true",
@@ -1,12 +1,24 @@
 import time
-from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic
-from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
-from helpers.utils import fetch_recorded_calls
+from graph import GraphRoutingProblem, GraphNode, CompactGraphProblem, graphrouting_heuristic, compact_graph_heuristic
+from graph import graphrouting_distance, compact_graph_distance
+from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent, IncrementalReplanningAgent
+from helpers.utils import fetch_recorded_calls, fetch_tracked_call_count
+from search_stats import SearchStats, current_commit
+from functools import partial
 import argparse, os, json
 
 # Create an agent based on the user selections
-def create_agent(args: argparse.Namespace):
+def create_agent(args: argparse.Namespace, problem: GraphRoutingProblem):
     agent_type: str = args.agent
+    # The compact problem has integer states so it needs the integer version of the heuristic
+    heuristic = compact_graph_heuristic if args.compact else graphrouting_heuristic
+    if args.heuristic == "landmarks" and agent_type in ("astar", "wastar", "portfolio", "gbfs"):
+        # The landmark distances are loaded from the file next to the graph (or computed and saved there on the first run)
+        from landmarks import LandmarkHeuristic
+        heuristic = LandmarkHeuristic.load_or_build(problem.graph, args.graph, args.landmarks)
+    if agent_type == "human" and args.compact:
+        print("The human agent can not play the compact problem")
+        exit(-1)
     if agent_type == "human":
         # This function reads the action from the user (human)
         def graph_user_action(problem: GraphRoutingProblem, state: GraphNode) -> GraphNode:
@@ -35,19 +47,43 @@ def create_agent(args: argparse.Namespace):
     if agent_type == "ucs":
         from search import UniformCostSearch
         return UninformedSearchAgent(UniformCostSearch)
+    if agent_type == "bidir":
+        from search import BidirectionalSearch
+        return UninformedSearchAgent(BidirectionalSearch)
+    if agent_type == "ch":
+        # The hierarchy is loaded from the file next to the graph (or built and saved there on the first run)
+        from contraction_hierarchy import ContractionHierarchy, ContractionHierarchySearch
+        hierarchy = ContractionHierarchy.load_or_build(problem.graph, args.graph)
+        return UninformedSearchAgent(partial(ContractionHierarchySearch, hierarchy=hierarchy))
     if agent_type == "astar":
         from search import AStarSearch
-        return InformedSearchAgent(AStarSearch, graphrouting_heuristic)
+        return InformedSearchAgent(AStarSearch, heuristic)
+    if agent_type == "wastar":
+        from search import WeightedAStarSearch
+        return InformedSearchAgent(partial(WeightedAStarSearch, weight=args.weight), heuristic)
+    if agent_type == "portfolio":
+        from search import PortfolioSearch
+        return InformedSearchAgent(partial(PortfolioSearch, bound=args.bound), heuristic)
     if agent_type == "gbfs":
         from search import BestFirstSearch
-        return InformedSearchAgent(BestFirstSearch, graphrouting_heuristic)
+        return InformedSearchAgent(BestFirstSearch, heuristic)
+    if agent_type == "dstar":
+        return IncrementalReplanningAgent(compact_graph_distance if args.compact else graphrouting_distance)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
 def main(args: argparse.Namespace):
     start = time.time() # Track run time
     graph_path = args.graph
-    problem = GraphRoutingProblem.from_file(graph_path) # create the problem
+    stats = SearchStats() # This will collect the statistics of all the searches done by the agent
+    with stats.phase("load"):
+        problem = GraphRoutingProblem.from_file(graph_path) # create the problem
+        # If desired by the user, we search on the integer version of the problem (faster on large graphs)
+        if args.compact:
+            problem = problem.to_compact()
+    # This returns the name of a node for both versions of the problem
+    def node_name(node) -> str:
+        return problem.graph.names[node] if args.compact else node.name
     # Check if there is a figure for the graph that we can display on the console
     figure_path = json.load(open(graph_path, 'r')).get("figure")
     figure = None
@@ -59,17 +95,24 @@ def main(args: argparse.Namespace):
     print("Initial State:")
     if figure:
         print(figure)
-    print("Current Node:", state)
-    agent = create_agent(args)
+    print("Current Node:", node_name(state))
+    with stats.phase("preprocess"):
+        agent = create_agent(args, problem)
+    # Search agents report their searches to the stats object
+    if isinstance(agent, (UninformedSearchAgent, InformedSearchAgent)):
+        agent.search_fn = partial(agent.search_fn, stats=stats)
     step = 0 # This will store the current step
     path_cost = 0 # This will store the total path cost
     traversed_nodes = [] # This will store all the traversed nodes in order of traversal
+    total_explored_nodes = 0 # This will store the number of traversed nodes (for the compact problem, only the count is tracked)
     unsolvable = False # This will store whether the problem is unsolvable or not
     while not problem.is_goal(state):
         fetch_recorded_calls(GraphRoutingProblem.is_goal) # Clear the recorded calls
+        fetch_tracked_call_count(CompactGraphProblem.is_goal) # Clear the call counter
         action = agent.act(problem, state) # Request an action from the agent
         # Retrieve the traversed nodes
         traversed_nodes += [call["args"][1].name for call in list(fetch_recorded_calls(GraphRoutingProblem.is_goal))]
+        total_explored_nodes += fetch_tracked_call_count(CompactGraphProblem.is_goal)
         # If no solution was found, break
         if action is None:
             print("Agent cannot find a solution, exiting...")
@@ -83,15 +126,27 @@ def main(args: argparse.Namespace):
         step += 1
         # Print any useful information to the user
         print("Step:", step)
-        print("Action:", str(action), f"(cost: {cost})")
+        print("Action:", node_name(state), f"(cost: {cost})")
         if figure:
             print(figure)
-        print("Current Node:", state)
+        print("Current Node:", node_name(state))
     if not unsolvable: print("YOU WON!!")
     print("Path Cost:", path_cost)
     # This was a search agent, display the traversed nodes
     if not isinstance(agent, HumanAgent):
-        print(f"Traversal Order: {'->'.join(traversed_nodes)}")
+        if isinstance(agent, IncrementalReplanningAgent):
+            # D* Lite searches backward from the goal without goal tests, so it reports its own expansions
+            print(f"Search expanded {agent.expanded} nodes")
+        elif args.compact:
+            print(f"Search explored {total_explored_nodes} nodes")
+        else:
+            print(f"Traversal Order: {'->'.join(traversed_nodes)}")
+        # If desired by the user, we print and/or export the search statistics
+        if args.stats:
+            print("Search Statistics:")
+            print(stats)
+        if args.stats_json:
+            stats.save(args.stats_json, graph=args.graph, agent=args.agent, commit=current_commit())
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
 
@@ -100,8 +155,22 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Graph as Human or AI")
     parser.add_argument("graph", help="path to the graph to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'bidir', 'ch', 'astar', 'wastar', 'portfolio', 'gbfs', 'dstar'],
                         help="the agent that will play the game")
+    parser.add_argument("--stats", "-s", action="store_true", default=False,
+                        help="print the search statistics (generated and expanded nodes, frontier size, heuristic time, ...)")
+    parser.add_argument("--stats-json", default=None,
+                        help="export the search statistics to the given json file")
+    parser.add_argument("--weight", "-w", type=float, default=2.0,
+                        help="the weight of the heuristic in Weighted A*")
+    parser.add_argument("--bound", "-b", type=float, default=float('inf'),
+                        help="the portfolio only accepts a path whose cost is guaranteed to be at most bound times the optimal cost")
+    parser.add_argument("--heuristic", "-hf", default="euclidean", choices=["euclidean", "landmarks"],
+                        help="choose the heuristic to use with A*, Weighted A*, the portfolio or Greedy Best First Search")
+    parser.add_argument("--landmarks", "-l", type=int, default=8,
+                        help="the number of landmarks used by the landmarks heuristic")
+    parser.add_argument("--compact", "-c", action="store_true", default=False,
+                        help="search on the integer version of the graph (faster on large graphs)")
 
     args = parser.parse_args()
     try:
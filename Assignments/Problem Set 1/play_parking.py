@@ -0,0 +1,148 @@
+from parking import ParkingProblem, ParkingAction, ParkingState
+from mathutils import Direction
+from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
+from helpers.utils import fetch_tracked_call_count
+from helpers.heuristic_checks import test_heuristic_consistency
+from search_stats import SearchStats, current_commit
+from functools import lru_cache, partial
+import argparse, time
+
+# Return the heuristic selected by the user
+def get_heuristic(name: str):
+    if name == "zero":
+        return lambda *_: 0
+    if name == "strong":
+        from parking_heuristic import strong_heuristic
+        return strong_heuristic
+    if name == "pdb":
+        from pattern_database import parking_pattern_heuristic
+        return parking_pattern_heuristic
+    print(f"Requested Heuristic '{name}' is invalid")
+    exit(-1)
+
+# Create an agent based on the user selections
+def create_agent(args: argparse.Namespace):
+    agent_type: str = args.agent
+    if agent_type == "human":
+        # This function reads the action from the user (human) as a car letter followed by a direction (WASD)
+        def parking_user_action(problem: ParkingProblem, state: ParkingState) -> ParkingAction:
+            possible_actions = problem.get_actions(state)
+            while True:
+                user_input = input("Enter action (car letter then WASD, e.g. 'A d'): ").replace(" ", "").lower()
+                if len(user_input) == 2:
+                    car = ord(user_input[0]) - ord('a')
+                    direction = {
+                        'w': Direction.UP,
+                        's': Direction.DOWN,
+                        'a': Direction.LEFT,
+                        'd': Direction.RIGHT
+                    }.get(user_input[1])
+                    if (car, direction) in possible_actions:
+                        return car, direction
+                print("Invalid Action")
+        return HumanAgent(parking_user_action)
+    if agent_type == "bfs":
+        from search import BreadthFirstSearch
+        return UninformedSearchAgent(BreadthFirstSearch)
+    if agent_type == "dfs":
+        from search import DepthFirstSearch
+        return UninformedSearchAgent(DepthFirstSearch)
+    if agent_type == "ucs":
+        from search import UniformCostSearch
+        return UninformedSearchAgent(UniformCostSearch)
+    if agent_type in ("astar", "wastar", "gbfs"):
+        from search import AStarSearch, WeightedAStarSearch, BestFirstSearch
+        search_fn = {
+            "astar": AStarSearch,
+            "wastar": partial(WeightedAStarSearch, weight=args.weight),
+            "gbfs": BestFirstSearch
+        }[agent_type]
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            ParkingProblem.get_successor = test_heuristic_consistency(heuristic)(ParkingProblem.get_successor)
+        return InformedSearchAgent(search_fn, heuristic)
+    print(f"Requested Agent '{agent_type}' is invalid")
+    exit(-1)
+
+def main(args: argparse.Namespace):
+    start = time.time() # Track run time
+    stats = SearchStats() # This will collect the statistics of all the searches done by the agent
+    with stats.phase("load"):
+        problem = ParkingProblem.from_file(args.level) # create the problem
+    state = problem.get_initial_state() # Get the initial state
+    print("Initial State:")
+    print(problem.state_to_text(state))
+    agent = create_agent(args)
+    # Search agents report their searches to the stats object
+    if isinstance(agent, (UninformedSearchAgent, InformedSearchAgent)):
+        agent.search_fn = partial(agent.search_fn, stats=stats)
+    step = 0 # This will store the current step
+    total_cost = 0 # This will store the cost of the actions done so far
+    total_explored_nodes = 0 # This will store the number of traversed nodes during search
+    unsolvable = False # This will store whether the problem is unsolvable or not
+    while not problem.is_goal(state):
+        fetch_tracked_call_count(ParkingProblem.is_goal) # Clear the call counter
+        action = agent.act(problem, state) # Request an action from the agent
+        # If no solution was found, break
+        if action is None:
+            print("Agent cannot find a solution, exiting...")
+            unsolvable = True
+            break
+        # Get the number of traversed nodes
+        total_explored_nodes += fetch_tracked_call_count(ParkingProblem.is_goal)
+        # Apply the action to the state
+        total_cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+        step += 1
+        # Print any useful information to the user
+        car, direction = action
+        print("Step:", step)
+        print("Action:", f"{chr(ord('A') + car)} {direction}")
+        print(problem.state_to_text(state))
+    if not unsolvable:
+        # If desired by the user, we check that the heuristic is zero at the goal state
+        if args.checks and isinstance(agent, InformedSearchAgent):
+            goal_heuristic = agent.heuristic(problem, state)
+            if goal_heuristic != 0:
+                print(f"ERROR: Expected heuristic at goal to be 0, got {goal_heuristic}")
+        print("YOU WON!!")
+        print(f"Total Cost: {total_cost}")
+    # This was a search agent, display the number of traversed nodes
+    if not isinstance(agent, HumanAgent):
+        print(f"Search explored {total_explored_nodes} nodes")
+        # If desired by the user, we print and/or export the search statistics
+        if args.stats:
+            print("Search Statistics:")
+            print(stats)
+        if args.stats_json:
+            stats.save(args.stats_json, level=args.level, agent=args.agent, commit=current_commit())
+    # Finally print the elapsed time for the whole process
+    print(f"Elapsed time: {time.time() - start} seconds")
+
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Play Parking as Human or AI")
+    parser.add_argument("level", help="path to the parking lot to play")
+    parser.add_argument("--agent", "-a", default="human",
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'wastar', 'gbfs'],
+                        help="the agent that will play the game")
+    parser.add_argument("--stats", "-s", action="store_true", default=False,
+                        help="print the search statistics (generated and expanded nodes, frontier size, heuristic time, ...)")
+    parser.add_argument("--stats-json", default=None,
+                        help="export the search statistics to the given json file")
+    parser.add_argument("--heuristic", '-hf', default="zero",
+                        choices=["zero", "strong", "pdb"],
+                        help="choose the heuristic to use with A*, Weighted A* or Greedy Best First Search")
+    parser.add_argument("--weight", "-w", type=float, default=2.0,
+                        help="the weight of the heuristic in Weighted A*")
+    parser.add_argument("--checks", "-c", action='store_true', default=False,
+                        help="Enable consistency checks for the heuristic")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Generic, Iterable, List, TypeVar, Union
+from typing import Callable, Generic, Iterable, List, Tuple, TypeVar, Union
 from helpers.utils import CacheContainer, with_cache
 
 # S and A are used for generic typing where S represents the state type and A represents the action type
@@ -34,6 +34,25 @@ class Problem(ABC, Generic[S, A], CacheContainer):
     def get_cost(self, state: S, action: A) -> float:
         return 1.0
 
+    # The following two functions are optional and should only be implemented by reversible problems
+    # (problems where the previous states can be derived from the actions)
+    # They allow the search to also go backwards from the goal (e.g. BidirectionalSearch)
+
+    # This function returns all the goal states
+    def get_goal_states(self) -> Iterable[S]:
+        raise NotImplementedError()
+
+    # Given a state, this function returns all the pairs (previous state, action)
+    # where applying the action to the previous state leads to the given state
+    def get_predecessors(self, state: S) -> Iterable[Tuple[S, A]]:
+        raise NotImplementedError()
+
+    # This function returns True if the two functions above are implemented so the problem can be searched backward from its goals
+    # A problem may return False if searching backward is much more expensive than searching forward
+    def is_reversible(self) -> bool:
+        problem_class = type(self)
+        return problem_class.get_goal_states is not Problem.get_goal_states and problem_class.get_predecessors is not Problem.get_predecessors
+
 # These are type aliases for:
 # A solution which is a list of actions (or None if no solution is found)
 Solution = Union[List[A], None]
@@ -1,7 +1,14 @@
 from problem import HeuristicFunction, Problem, S, A, Solution
 from collections import deque
-from queue import PriorityQueue
-import heapq
+from dataclasses import dataclass
+from functools import partial
+from itertools import chain
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+import heapq, multiprocessing, queue, time
+from frontier import IndexedPriorityQueue
+from grid_path import JumpPointSearch, JumpPointTable
+from node_arena import NodeArena
+from search_stats import SearchStats
 from helpers import utils
 
 #TODO: Import any modules you want to use
@@ -14,222 +21,796 @@ from helpers import utils
 # 1. A list of actions which represent the path from the initial state to the final state
 # 2. None if there is no solution
 
-def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+# All the search functions store their nodes in a NodeArena (see node_arena.py)
+# a node is an integer index and the arena holds its state, parent index, action and path cost
+# so the frontiers only store integers and the path is reconstructed by walking the parent indices
+
+# All the search functions also accept an optional SearchStats object (see search_stats.py)
+# if it is given, the search adds its counters (generated and expanded nodes, peak frontier size, heuristic calls, ...)
+# and the time of its phases ("search" and "path" reconstruction) to it
+
+# Copies the counters of a finished search into the stats object
+def _report(stats: SearchStats, search_start: float, generated: int, expanded: int, peak_frontier: int = 0, reopenings: int = 0, stale_pops: int = 0) -> None:
+    stats.add_phase_time("search", time.perf_counter() - search_start)
+    stats.searches += 1
+    stats.nodes_generated += generated
+    stats.nodes_expanded += expanded
+    stats.reopenings += reopenings
+    stats.stale_pops += stale_pops
+    stats.observe_frontier(peak_frontier)
+
+# Reconstructs the path to the given node (None means that no solution was found) and reports the search to the stats object
+def _finish(stats: Optional[SearchStats], search_start: float, nodes: NodeArena, node: Optional[int], expanded: int, peak_frontier: int, reopenings: int = 0, stale_pops: int = 0) -> Solution:
+    if stats is None:
+        return None if node is None else nodes.path(node)
+    _report(stats, search_start, len(nodes), expanded, peak_frontier, reopenings, stale_pops)
+    with stats.phase("path"):
+        return None if node is None else nodes.path(node)
+
+def BreadthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
-     # Initialize frontier as queue with initial state
-    frontier = deque([(initial_state, None, None)])  # (state, parent, action)
-    
+    search_start, expanded, peak_frontier = time.perf_counter(), 0, 1
+    nodes = NodeArena()
+    # Initialize frontier as queue with the root node (the initial state has no parent and no action)
+    frontier = deque([nodes.add(initial_state)])
+
     # Initialize explored set
     explored = {initial_state}
-    
-    # Initialize parent dictionary for path reconstruction
-    parent = {}  # {state: (parent_state, action)}
-    
+
     while frontier:
-        # Get next state from frontier
-        current_state, parent_state, action = frontier.popleft()
-        
+        # Get next node from frontier
+        node = frontier.popleft()
+        current_state = nodes.states[node]
+        expanded += 1
+
         # Check if current state is goal
         if problem.is_goal(current_state):
-            # Reconstruct path
-            path = []
-            # Traverse back from the goal state to the start state using the parent dictionary
-            while parent_state is not None: 
-                path.append(action)
-                current_state = parent_state # Move to the parent state
-                # Get the parent state and the action that led to the current state from the parent dictionary
-                parent_state, action = parent.get(current_state, (None, None))
-            # Reverse the path to get the correct order from start to goal
-            return list(reversed(path))
-        
+            # Reconstruct path by traversing back from the goal node to the root using the parent indices
+            return _finish(stats, search_start, nodes, node, expanded, peak_frontier)
+
         # Expand current state
         for next_action in problem.get_actions(current_state):
             next_state = problem.get_successor(current_state, next_action) # Get the successor state for the current action
-            
+
             # Add unexplored states to frontier
             if next_state not in explored:
-                frontier.append((next_state, current_state, next_action)) # Add the next state, current state, and action to the frontier
+                # the child node remembers its parent node and the action that led to it so we can use it later above in getting the path
+                frontier.append(nodes.add(next_state, node, next_action))
                 explored.add(next_state) # Mark the next state as explored
-                parent[current_state] = (parent_state, action) # Record the parent state and action that led to the next state so that we can use it later above in getting the path
-    
+        if stats is not None and len(frontier) > peak_frontier: peak_frontier = len(frontier)
+
     # No solution found
-    return None
+    return _finish(stats, search_start, nodes, None, expanded, peak_frontier)
 
-def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+def DepthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
-    # Initialize frontier as stack with initial state
-    frontier = [(initial_state, None, None)]  # (state, parent, action)
-    
-    # Initialize explored set and parent dictionary
+    search_start, expanded, peak_frontier = time.perf_counter(), 0, 1
+    nodes = NodeArena()
+    # Initialize frontier as stack with the root node
+    frontier = [nodes.add(initial_state)]
+
+    # Initialize explored set
     explored = {initial_state}
-    parent = {}  # {state: (parent_state, action)}
-    
+
     while frontier:
-        # Get next state from frontier (LIFO)
-        current_state, parent_state, action = frontier.pop()
-        
+        # Get next node from frontier (LIFO)
+        node = frontier.pop()
+        current_state = nodes.states[node]
+        expanded += 1
+
         # Check if current state is goal
         if problem.is_goal(current_state):
-            # Reconstruct path
-            path = []
             # same as in BFS didnt change
-            while parent_state is not None:
-                path.append(action)
-                current_state = parent_state
-                parent_state, action = parent.get(current_state, (None, None))
-            return list(reversed(path))
-        
-        # here also same as in BFS 
+            return _finish(stats, search_start, nodes, node, expanded, peak_frontier)
+
+        # here also same as in BFS
         # Expand current state
         for next_action in problem.get_actions(current_state):
             next_state = problem.get_successor(current_state, next_action)
-           
+
             # Add unexplored states to frontier
             if next_state not in explored:
-                frontier.append((next_state, current_state, next_action))
+                frontier.append(nodes.add(next_state, node, next_action))
                 explored.add(next_state)
-                parent[current_state] = (parent_state, action)
-    
+        if stats is not None and len(frontier) > peak_frontier: peak_frontier = len(frontier)
+
     # No solution found
-    return None
-    
-def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+    return _finish(stats, search_start, nodes, None, expanded, peak_frontier)
+
+# The frontier can be an IndexedPriorityQueue (decrease-key in place) or a LazyPriorityQueue (the old entry is skipped when it is popped)
+def UniformCostSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None, frontier_type: Callable[[], Any] = IndexedPriorityQueue) -> Solution:
     #TODO: ADD YOUR CODE HERE
- 
-    # Initialize frontier with (cost, sequence, state, parent, action)
-    frontier = PriorityQueue()
+    search_start, expanded, reopenings = time.perf_counter(), 0, 0
+    nodes = NodeArena()
+    root = nodes.add(initial_state)
+
+    # Initialize frontier keyed by state with priority (cost, sequence) and the node as item
+    # the frontier replaces the entry of a state that is pushed again so a state is never popped twice for the same path
+    frontier = frontier_type()
     sequence = 0
-    frontier.put((0, sequence, initial_state, None, None)) # this time we add the cost of the path to the state and also sequence to break tie if we have two states with the same cost
-    
-    # Track explored states and their cumulative costs
-    explored = {initial_state: 0}  # state -> cumulative_cost
-    parent = {}   # state -> (parent_state, action)
-    
-    while not frontier.empty():
+    frontier.push(initial_state, (0, sequence), root) # this time we add the cost of the path to the state and also sequence to break tie if we have two states with the same cost
+
+    # Track explored states and their nodes, the cumulative cost of a state is the cost of its node
+    explored = {initial_state: root}  # state -> node
+    costs = nodes.costs
+
+    while frontier:
         # Get state with lowest cumulative cost
-        cost, _, current_state, parent_state, action = frontier.get() # note in priority queue of python it prioritize the first element in the tuple and then second in case of tie
-        
-        # Skip if we've found a better path to this state
-        if current_state in explored and explored[current_state] < cost:
-            continue
-            
+        current_state, (cost, _), node = frontier.pop() # the priority is compared as a tuple so it prioritize the cost and then the sequence in case of tie
+        expanded += 1
+
+        # No need to skip stale entries here: the frontier replaces the entry of a state when a better path is found
+
         # Check if goal reached Literally the same as BFS and DFS
         if problem.is_goal(current_state):
-            path = []
-            while parent_state is not None:
-                path.append(action)
-                current_state = parent_state
-                parent_state, action = parent.get(current_state, (None, None))
-            return list(reversed(path))
-        
-        # Expand current state and loop over all possible actions for that current state 
+            return _finish(stats, search_start, nodes, node, expanded, frontier.peak_size, reopenings, frontier.stale_pops)
+
+        # Expand current state and loop over all possible actions for that current state
         for next_action in problem.get_actions(current_state):
             next_state = problem.get_successor(current_state, next_action)
             next_cost = cost + problem.get_cost(current_state, next_action) # get the cumulative cost of the path to the next state
-            
+
             # Add if unexplored or found better cumulative path
-            if next_state not in explored or next_cost < explored[next_state]:
-                sequence += 1
-                frontier.put((next_cost, sequence, next_state, current_state, next_action)) # next_state is the current state and current state is the parent of the next state
-                explored[next_state] = next_cost  # Track cumulative cost
-                parent[next_state] = (current_state, next_action)  # Fix parent tracking
-    
-    return None
+            next_node = explored.get(next_state)
+            if next_node is None:
+                next_node = nodes.add(next_state, node, next_action, next_cost)
+                explored[next_state] = next_node
+            elif next_cost < costs[next_node]:
+                nodes.update(next_node, node, next_action, next_cost)  # the node now points to the cheaper parent
+                if next_state not in frontier: reopenings += 1 # it was already expanded so it is opened again
+            else:
+                continue
+            sequence += 1
+            frontier.push(next_state, (next_cost, sequence), next_node) # decrease-key if next_state is already in the frontier otherwise insert it
 
-def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+    return _finish(stats, search_start, nodes, None, expanded, frontier.peak_size, reopenings, frontier.stale_pops)
+
+# The frontier can be an IndexedPriorityQueue or a LazyPriorityQueue (see UniformCostSearch)
+def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None, frontier_type: Callable[[], Any] = IndexedPriorityQueue) -> Solution:
     #TODO: ADD YOUR CODE HERE
+    search_start, expanded, reopenings = time.perf_counter(), 0, 0
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    nodes = NodeArena()
+    initial_g_value = 0
+    root = nodes.add(initial_state, cost=initial_g_value)
 
-    # Initialize frontier with (f_value, sequence, g_value, state, parent, action)
-    frontier = PriorityQueue()
+    # Initialize frontier keyed by state with priority (f_value, sequence) and the node as item
+    frontier = frontier_type()
     sequence = 0
-    initial_g_value = 0
     initial_f_value = heuristic(problem, initial_state)
-    frontier.put((initial_f_value, sequence, initial_g_value, initial_state, None, None))
-    
-    # Track explored states and their cumulative g-values
-    explored = {initial_state: initial_g_value}  # state -> minimum g_value encountered you will find that below in the code we update the g_value if we found a better path to the state
-    parent = {}  # state -> (parent_state, action)
-    
-    while not frontier.empty(): # while the frontier is not empty we will keep searching and expanding the states in the above searches i didnt write this comment 
+    frontier.push(initial_state, (initial_f_value, sequence), root)
+
+    # Track explored states and their nodes, the g-value of a state is the cost of its node
+    # you will find that below in the code we update the node (parent and g_value) if we found a better path to the state
+    explored = {initial_state: root}  # state -> node
+    costs = nodes.costs
+
+    while frontier: # while the frontier is not empty we will keep searching and expanding the states in the above searches i didnt write this comment
         # Get state with the lowest f-value
-        f_value, _, g_value, current_state, parent_state, action = frontier.get()
-        
-        # If we already have a lower g-value for this state, skip it to make sure that we are not going to expand the state again if we found a better path to it
-        if current_state in explored and explored[current_state] < g_value:
-            continue
-
-        # Store parent information for path reconstruction if state is not the initial state aka we store only nodes with parents (inital state has no parent)
-        if parent_state is not None:
-            parent[current_state] = (parent_state, action)
-            # so if iam the current state i will store my parent and the action that led me to this state to know how to return exactly like i came here
-            # Point(1, 1): (Point(1, 0), "DOWN"), The current position/state 
-            # parent_state: The previous position/state that led here
-            # action: The move that got us from parent to current state
-
-
-        
+        # the frontier only returns the latest entry of a state (the one with the lowest g-value) so there is nothing stale to skip here
+        current_state, _, node = frontier.pop()
+        g_value = costs[node]
+        expanded += 1
+
+        # The parent information for path reconstruction is stored in the node itself
+        # so if iam the current node i know my parent node and the action that led me here to know how to return exactly like i came here
+
         # Check if goal is reached
         # notice that iam here only stop when we dequeue the goal state not stop when we enqueue it why ?? because if we checked goal in the enqueue step we will not be sure that this is the best path to the goal maybe there will be better path
         if problem.is_goal(current_state):
             # Reconstruct path from goal to initial state
-            path = []
-            while parent_state is not None: # we keep going up and saving the actions that led us to the goal state
-                path.append(action)
-                current_state = parent_state
-                parent_state, action = parent.get(current_state, (None, None))
-            return list(reversed(path))
-        
+            return _finish(stats, search_start, nodes, node, expanded, frontier.peak_size, reopenings, frontier.stale_pops)
+
         # Expand current state after we checked that the current state is not the goal state with all possible actions
         for next_action in problem.get_actions(current_state):
             next_state = problem.get_successor(current_state, next_action)
             next_g = g_value + problem.get_cost(current_state, next_action)  # Cumulative g-cost = g-value is the cumulative cost of last actions + cost of new action
             next_f = next_g + heuristic(problem, next_state) # we prioritize the states with the lowest f-value which is the sum of the g-value and the heuristic value of the state
-            
+
             # Only add next_state to frontier if it has a lower g-value than previously found or it is unexplored
-            if next_state not in explored or next_g < explored[next_state]:
-                sequence += 1 # increment the sequence to break the tie if we have two states with the same f-value
-                frontier.put((next_f, sequence, next_g, next_state, current_state, next_action))
-                explored[next_state] = next_g  # Update to the new lowest g-value
+            next_node = explored.get(next_state)
+            if next_node is None:
+                next_node = nodes.add(next_state, node, next_action, next_g)
+                explored[next_state] = next_node
+            elif next_g < costs[next_node]:
+                nodes.update(next_node, node, next_action, next_g)  # Update to the new lowest g-value
+                if next_state not in frontier: reopenings += 1 # it was already expanded (only possible if the heuristic is inconsistent)
+            else:
+                continue
+            sequence += 1 # increment the sequence to break the tie if we have two states with the same f-value
+            frontier.push(next_state, (next_f, sequence), next_node) # decrease-key if it is already in the frontier
 
     # No solution found
-    return None
+    return _finish(stats, search_start, nodes, None, expanded, frontier.peak_size, reopenings, frontier.stale_pops)
 
-def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
-    # or its called Greedy Best First Search its the same as A* but it doesnt consider the cost of the path only the heuristic value its the rabbit 
-    # Initialize frontier with (h_value, sequence, state, parent, action)
-    frontier = PriorityQueue()
+    search_start, expanded = time.perf_counter(), 0
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    # or its called Greedy Best First Search its the same as A* but it doesnt consider the cost of the path only the heuristic value its the rabbit
+    nodes = NodeArena()
+    # Initialize frontier keyed by state with priority (h_value, sequence) and the node as item
+    frontier = IndexedPriorityQueue()
     sequence = 0
-    frontier.put((heuristic(problem, initial_state), sequence, initial_state, None, None))
-    
+    frontier.push(initial_state, (heuristic(problem, initial_state), sequence), nodes.add(initial_state))
+
     # Track explored states
     explored = {initial_state} # we only need to track the explored states because we dont consider the cost of the path not like above
-    parent = {}  # state -> (parent_state, action)
-    
-    while not frontier.empty():
+
+    while frontier:
         # Get state with lowest h-value (and earliest sequence for ties)
-        h_value, _, current_state, parent_state, action = frontier.get()
-        
+        current_state, (h_value, _), node = frontier.pop()
+        expanded += 1
+
         # Check if goal reached
         if problem.is_goal(current_state):
             # Reconstruct path
-            path = []
-            while parent_state is not None:
-                path.append(action)
-                current_state = parent_state
-                parent_state, action = parent.get(current_state, (None, None))
-            return list(reversed(path))
-        
+            return _finish(stats, search_start, nodes, node, expanded, frontier.peak_size)
+
         # Expand current state
         for next_action in problem.get_actions(current_state):
             next_state = problem.get_successor(current_state, next_action)
-            
+
             # Add unexplored states to frontier
             if next_state not in explored:
                 sequence += 1  # Increment sequence for FIFO ordering
                 next_h = heuristic(problem, next_state)
-                frontier.put((next_h, sequence, next_state, current_state, next_action))
+                frontier.push(next_state, (next_h, sequence), nodes.add(next_state, node, next_action))
                 explored.add(next_state)
-                parent[current_state] = (parent_state, action)
-    
-    return None
\ No newline at end of file
+
+    return _finish(stats, search_start, nodes, None, expanded, frontier.peak_size)
+
+# Weighted A* orders the frontier by g + weight * h
+# It usually explores far fewer nodes than A* and, if the heuristic is admissible, the cost of the path it returns
+# is at most "weight" times the optimal cost (weight = 1 is A* and a very large weight behaves like greedy best first search)
+def WeightedAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, weight: float = 2.0, stats: Optional[SearchStats] = None) -> Solution:
+    search_start, expanded, reopenings = time.perf_counter(), 0, 0
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    nodes = NodeArena()
+    root = nodes.add(initial_state)
+    frontier = IndexedPriorityQueue()
+    sequence = 0
+    frontier.push(initial_state, (weight * heuristic(problem, initial_state), sequence), root)
+    explored = {initial_state: root}
+    costs = nodes.costs
+    while frontier:
+        state, _, node = frontier.pop()
+        expanded += 1
+        if problem.is_goal(state):
+            return _finish(stats, search_start, nodes, node, expanded, frontier.peak_size, reopenings)
+        g_value = costs[node]
+        for action in problem.get_actions(state):
+            next_state = problem.get_successor(state, action)
+            next_g = g_value + problem.get_cost(state, action)
+            next_node = explored.get(next_state)
+            if next_node is None:
+                next_node = nodes.add(next_state, node, action, next_g)
+                explored[next_state] = next_node
+            elif next_g < costs[next_node]:
+                # The inflated heuristic is not consistent so an expanded state can be reached again with a cheaper path
+                nodes.update(next_node, node, action, next_g)
+                if next_state not in frontier: reopenings += 1
+            else:
+                continue
+            sequence += 1
+            frontier.push(next_state, (next_g + weight * heuristic(problem, next_state), sequence), next_node)
+    return _finish(stats, search_start, nodes, None, expanded, frontier.peak_size, reopenings)
+
+# The solution returned by the anytime searches: a list of actions that also holds its suboptimality bound
+# (its cost is at most "bound" times the optimal cost) so it can be used anywhere a list of actions is expected
+class BoundedSolution(list):
+    def __init__(self, actions: Iterable[A] = (), bound: float = 1.0) -> None:
+        super().__init__(actions)
+        self.bound = bound
+
+# The weights used by AnytimeRepairingAStar after the initial one if no schedule is given
+def _decreasing_weights(initial_weight: float, step: float = 0.5) -> Iterator[float]:
+    weight = initial_weight
+    while weight > 1:
+        weight = max(1.0, weight - step)
+        yield weight
+
+# Anytime Repairing A* (ARA*) runs Weighted A* repeatedly with a decreasing weight to quickly find a path and then improve it
+# Instead of starting over, each iteration reuses the g-values of the previous ones:
+# only the states whose g-value decreased since they were expanded (the inconsistent states) are expanded again.
+# After each iteration, the suboptimality bound of the best path is min(weight, cost / the lowest g + h among the states that are
+# still in the frontier or inconsistent) if the heuristic is admissible and "on_solution" (if given) is called with the path and its bound.
+# The search stops when the path is proven optimal (bound = 1), when the weight schedule ends or when the time budget (in seconds) is exceeded.
+# It returns the best path found so far as a BoundedSolution (or None if no path was found in time).
+def AnytimeRepairingAStar(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+                          initial_weight: float = 3.0, time_budget: Optional[float] = None,
+                          weight_schedule: Optional[Iterable[float]] = None,
+                          on_solution: Optional[Callable[[List[A], float], None]] = None,
+                          stats: Optional[SearchStats] = None) -> Solution:
+    search_start, expanded, reopenings = time.perf_counter(), 0, 0
+    deadline = None if time_budget is None else search_start + time_budget
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    weights = iter(_decreasing_weights(initial_weight) if weight_schedule is None else weight_schedule)
+    weight = initial_weight
+
+    nodes = NodeArena()
+    root = nodes.add(initial_state)
+    costs = nodes.costs
+    # The heuristic of every node is computed once since the priorities are recomputed after every weight change
+    h_values = [heuristic(problem, initial_state)]
+    explored = {initial_state: root} # state -> node
+    frontier = IndexedPriorityQueue()
+    sequence = 0
+    frontier.push(initial_state, (weight * h_values[root], sequence), root)
+    peak_frontier = 0
+    # closed holds the nodes expanded in the current iteration and inconsistent holds the closed nodes that got a cheaper path since
+    closed, inconsistent = set(), set()
+    goal_node, goal_cost, bound = None, float('inf'), float('inf')
+    reported = None
+
+    while True:
+        # Expand the nodes until the best goal is not worse than the (weighted) f-value of every node in the frontier
+        out_of_time = False
+        while frontier and frontier.peek()[1][0] < goal_cost:
+            if deadline is not None and time.perf_counter() >= deadline:
+                out_of_time = True
+                break
+            state, _, node = frontier.pop()
+            closed.add(node)
+            expanded += 1
+            g_value = costs[node]
+            if problem.is_goal(state):
+                # A goal expanded by Weighted A* costs at most "weight" times the optimal cost
+                goal_node, goal_cost, bound = node, g_value, min(bound, weight)
+                continue
+            for action in problem.get_actions(state):
+                next_state = problem.get_successor(state, action)
+                next_g = g_value + problem.get_cost(state, action)
+                next_node = explored.get(next_state)
+                if next_node is None:
+                    next_node = nodes.add(next_state, node, action, next_g)
+                    explored[next_state] = next_node
+                    h_values.append(heuristic(problem, next_state))
+                elif next_g < costs[next_node]:
+                    nodes.update(next_node, node, action, next_g)
+                else:
+                    continue
+                if next_node in closed:
+                    # It will be expanded again in the next iteration
+                    inconsistent.add(next_node)
+                    reopenings += 1
+                else:
+                    sequence += 1
+                    frontier.push(next_state, (next_g + weight * h_values[next_node], sequence), next_node)
+        peak_frontier = max(peak_frontier, frontier.peak_size)
+        if out_of_time or goal_node is None:
+            break
+        # If no node left in the frontier can lead to a cheaper goal, the goal is optimal (so the lower bound never exceeds its cost)
+        lower_bound = min(chain((costs[node] + h_values[node] for _, node in frontier.items()), (costs[node] + h_values[node] for node in inconsistent)), default=goal_cost)
+        lower_bound = min(lower_bound, goal_cost)
+        if lower_bound > 0:
+            bound = min(bound, goal_cost / lower_bound)
+        elif goal_cost == 0:
+            bound = 1.0
+        # The callback is only called when the path or its bound improved
+        if on_solution is not None and (goal_cost, bound) != reported:
+            reported = (goal_cost, bound)
+            on_solution(nodes.path(goal_node), bound)
+        if bound <= 1:
+            break
+        next_weight = next(weights, None)
+        if next_weight is None:
+            break
+        weight = max(1.0, next_weight)
+        # The inconsistent nodes go back to the frontier and every priority is recomputed with the new weight
+        pending = [(nodes.states[node], node) for _, node in frontier.items()] + [(nodes.states[node], node) for node in inconsistent]
+        frontier = IndexedPriorityQueue()
+        for state, node in pending:
+            sequence += 1
+            frontier.push(state, (costs[node] + weight * h_values[node], sequence), node)
+        closed.clear()
+        inconsistent.clear()
+
+    if stats is not None:
+        _report(stats, search_start, len(nodes), expanded, peak_frontier, reopenings)
+    if goal_node is None:
+        return None
+    return BoundedSolution(nodes.path(goal_node), bound)
+
+# Bidirectional uniform cost search: it runs one UCS forward from the initial state and another one backward from the goal states
+# (using problem.get_predecessors) and stops when the two searches meet in the middle
+# so instead of exploring around b^d nodes, each direction only explores around b^(d/2) nodes
+# It requires a reversible problem which implements get_goal_states and get_predecessors
+# (see Problem.is_reversible), any other problem is solved by UniformCostSearch
+# Every expanded node (in both directions) is passed to problem.is_goal so the explored nodes count stays the number of is_goal calls
+def BidirectionalSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
+    if not problem.is_reversible():
+        return UniformCostSearch(problem, initial_state, stats)
+    search_start, expanded = time.perf_counter(), 0
+    forward_nodes, backward_nodes = NodeArena(), NodeArena()
+    forward_frontier, backward_frontier = IndexedPriorityQueue(), IndexedPriorityQueue()
+    forward_explored, backward_explored = {}, {} # state -> node in the search of the same direction
+    sequence = 0
+
+    root = forward_nodes.add(initial_state)
+    forward_explored[initial_state] = root
+    forward_frontier.push(initial_state, (0, sequence), root)
+    for goal_state in problem.get_goal_states():
+        if goal_state in backward_explored: continue
+        sequence += 1
+        goal_node = backward_nodes.add(goal_state)
+        backward_explored[goal_state] = goal_node
+        backward_frontier.push(goal_state, (0, sequence), goal_node)
+
+    # The cheapest complete path found so far goes through the meeting state
+    best_cost = float('inf')
+    meeting_state = None
+    if initial_state in backward_explored:
+        best_cost, meeting_state = 0, initial_state
+
+    while forward_frontier and backward_frontier:
+        forward_cost = forward_frontier.peek()[1][0]
+        backward_cost = backward_frontier.peek()[1][0]
+        # No path that goes through an unexpanded node can be cheaper than the best one we already have
+        if forward_cost + backward_cost >= best_cost:
+            break
+        # Expand the direction with the cheaper frontier so both searches grow at the same pace
+        if forward_cost <= backward_cost:
+            current_state, (cost, _), node = forward_frontier.pop()
+            expanded += 1
+            problem.is_goal(current_state)
+            for action in problem.get_actions(current_state):
+                next_state = problem.get_successor(current_state, action)
+                next_cost = cost + problem.get_cost(current_state, action)
+                next_node = forward_explored.get(next_state)
+                if next_node is None:
+                    next_node = forward_nodes.add(next_state, node, action, next_cost)
+                    forward_explored[next_state] = next_node
+                elif next_cost < forward_nodes.costs[next_node]:
+                    forward_nodes.update(next_node, node, action, next_cost)
+                else:
+                    continue
+                sequence += 1
+                forward_frontier.push(next_state, (next_cost, sequence), next_node)
+                # If the backward search already reached this state, we have a complete path
+                other_node = backward_explored.get(next_state)
+                if other_node is not None and next_cost + backward_nodes.costs[other_node] < best_cost:
+                    best_cost = next_cost + backward_nodes.costs[other_node]
+                    meeting_state = next_state
+        else:
+            current_state, (cost, _), node = backward_frontier.pop()
+            expanded += 1
+            problem.is_goal(current_state)
+            # In the backward search, the node of a state stores the action that leads from it towards the goal
+            for previous_state, action in problem.get_predecessors(current_state):
+                previous_cost = cost + problem.get_cost(previous_state, action)
+                previous_node = backward_explored.get(previous_state)
+                if previous_node is None:
+                    previous_node = backward_nodes.add(previous_state, node, action, previous_cost)
+                    backward_explored[previous_state] = previous_node
+                elif previous_cost < backward_nodes.costs[previous_node]:
+                    backward_nodes.update(previous_node, node, action, previous_cost)
+                else:
+                    continue
+                sequence += 1
+                backward_frontier.push(previous_state, (previous_cost, sequence), previous_node)
+                other_node = forward_explored.get(previous_state)
+                if other_node is not None and previous_cost + forward_nodes.costs[other_node] < best_cost:
+                    best_cost = previous_cost + forward_nodes.costs[other_node]
+                    meeting_state = previous_state
+
+    if stats is not None:
+        _report(stats, search_start, len(forward_nodes) + len(backward_nodes), expanded,
+                forward_frontier.peak_size + backward_frontier.peak_size)
+    if meeting_state is None:
+        return None
+    # The forward half is read from the initial state to the meeting state
+    # and the backward half is read from the meeting state to the goal (which is the reverse of the arena's path order)
+    path = forward_nodes.path(forward_explored[meeting_state])
+    backward_path = backward_nodes.path(backward_explored[meeting_state])
+    backward_path.reverse()
+    return path + backward_path
+
+# A marker returned by next() when the actions of a state are exhausted
+_NO_ACTION = object()
+
+# Iterative deepening A*: a depth first search that cuts off every path whose f-value exceeds a bound
+# and repeats the search with the bound raised to the smallest f-value that was cut off in the previous iteration
+# It only keeps the current path in memory, so unlike A* its memory does not grow with the number of explored nodes.
+# To avoid re-exploring the same state through different paths (which is very common on grids),
+# each iteration also keeps a transposition table (state -> lowest g-value) that holds at most "node_budget" states;
+# when it is full, new states are not recorded anymore so the memory stays flat.
+def IterativeDeepeningAStar(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, node_budget: int = 100000, stats: Optional[SearchStats] = None) -> Solution:
+    search_start, generated, expanded, peak_frontier = time.perf_counter(), 1, 1, 1
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    path = None
+    if problem.is_goal(initial_state):
+        path, bound = [], float('inf')
+    else:
+        bound = heuristic(problem, initial_state)
+    while bound != float('inf'):
+        next_bound = float('inf') # the smallest f-value that exceeded the bound in this iteration
+        transpositions = {initial_state: 0}
+        # The current path is stored as parallel stacks of states, g-values, remaining actions and the taken actions
+        states, costs, actions = [initial_state], [0], [iter(problem.get_actions(initial_state))]
+        path = []
+        on_path = {initial_state}
+        # while ... else: the else block only runs if the loop was not stopped by "break" (when the goal is found)
+        while states:
+            action = next(actions[-1], _NO_ACTION)
+            if action is _NO_ACTION:
+                # All the children of this state were visited, so we backtrack
+                on_path.discard(states.pop())
+                costs.pop()
+                actions.pop()
+                if path: path.pop()
+                continue
+            current_state = states[-1]
+            next_state = problem.get_successor(current_state, action)
+            generated += 1
+            if next_state in on_path: continue # avoid cycles
+            next_g = costs[-1] + problem.get_cost(current_state, action)
+            next_f = next_g + heuristic(problem, next_state)
+            if next_f > bound:
+                next_bound = min(next_bound, next_f)
+                continue
+            # If this state was already reached in this iteration with a lower or equal g-value, its subtree was already searched
+            seen_g = transpositions.get(next_state)
+            if seen_g is not None and seen_g <= next_g: continue
+            if seen_g is not None or len(transpositions) < node_budget:
+                transpositions[next_state] = next_g
+            path.append(action)
+            expanded += 1
+            if problem.is_goal(next_state):
+                next_bound = float('inf')
+                break
+            states.append(next_state)
+            costs.append(next_g)
+            actions.append(iter(problem.get_actions(next_state)))
+            on_path.add(next_state)
+            # The "frontier" of a depth first search is the current path
+            if len(states) > peak_frontier: peak_frontier = len(states)
+        else:
+            path = None # the iteration ended without finding a goal
+        bound = next_bound
+    if stats is not None:
+        _report(stats, search_start, generated, expanded, peak_frontier)
+    return path
+
+# A search node of the simplified memory-bounded A* search
+# unlike the NodeArena, the nodes can be forgotten (deleted) when the memory is full
+class _MemoryBoundedNode:
+    __slots__ = ("state", "parent", "action", "g", "f", "base_f", "depth", "children", "unexplored", "forgotten", "version", "in_open")
+
+    def __init__(self, state, parent, action, g: float, f: float, depth: int) -> None:
+        self.state = state
+        self.parent = parent
+        self.action = action
+        self.g = g
+        # f is the backed-up value: a lower bound on the cost of any solution through this node, it never decreases
+        self.f = f
+        # base_f is the f-value of the node when it was generated, it is the lower bound of the successors that are not generated yet
+        self.base_f = f
+        self.depth = depth
+        self.children = []
+        # The actions whose successors were never generated (None until the node is selected for the first time)
+        self.unexplored = None
+        # The successors that were deleted to free memory as a heap of (f, sequence, action)
+        self.forgotten = []
+        # The version is used to ignore the outdated entries of the node in the heaps
+        self.version = 0
+        self.in_open = False
+
+    # The lowest f-value among the successors that the node can still generate (infinity if there is none)
+    def next_f(self) -> float:
+        f = self.forgotten[0][0] if self.forgotten else float('inf')
+        if self.unexplored is None or self.unexplored:
+            f = min(f, self.base_f)
+        return f
+
+# Simplified memory-bounded A* (SMA*): it works like A* until "node_budget" nodes are stored in memory,
+# then it deletes the worst leaf (highest f-value, shallowest) to make room for each new node.
+# The parent of a deleted leaf remembers the leaf's f-value and is put back in the open list with that value,
+# so the leaf is only regenerated once it is the best node again. The f-values only go up so the search always makes progress.
+# As in the original algorithm, a selected node generates one successor at a time so a single path always fits in memory:
+# a path of depth d needs d + 1 nodes, so the optimal solution is found as long as its depth is less than the node budget.
+# If the root's backed-up f-value becomes infinite, there is no solution within the budget and None is returned.
+def SimplifiedMemoryBoundedAStar(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, node_budget: int = 100000, stats: Optional[SearchStats] = None) -> Solution:
+    search_start, generated, expanded, peak_memory = time.perf_counter(), 1, 0, 1
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    inf = float('inf')
+    max_depth = max(node_budget - 1, 0) # the deepest node that fits in memory with all of its ancestors
+    root = _MemoryBoundedNode(initial_state, None, None, 0, heuristic(problem, initial_state), 0)
+    in_memory = {initial_state: root} # state -> the node with the lowest g-value for that state in memory
+    memory_size = 1
+    best_heap, worst_heap = [], [] # the open list ordered by (lowest f, deepest) and the leaves ordered by (highest f, shallowest)
+    sequence = 0
+
+    # Puts the node in the open list with the f-value of the next successor it can generate (or removes it if there is none)
+    def open_node(node: _MemoryBoundedNode) -> None:
+        nonlocal sequence
+        node.version += 1
+        f = node.next_f()
+        node.in_open = f != inf
+        if not node.in_open: return
+        sequence += 1
+        heapq.heappush(best_heap, (f, -node.depth, sequence, node.version, node))
+        heapq.heappush(worst_heap, (-f, node.depth, sequence, node.version, node))
+
+    # Raises the backed-up f-values of the node and its ancestors to the lowest f-value below them
+    def back_up(node: _MemoryBoundedNode) -> None:
+        while node is not None:
+            new_f = min([node.next_f()] + [child.f for child in node.children])
+            if new_f <= node.f: break
+            node.f = new_f
+            node = node.parent
+
+    # Deletes a leaf from memory and lets its parent remember its f-value so it can be regenerated later
+    # A parent that is left with nothing in memory and nothing to generate is a dead end so it is deleted too (unless it is "keep")
+    def forget(node: _MemoryBoundedNode, keep: Optional[_MemoryBoundedNode] = None) -> None:
+        nonlocal memory_size, sequence
+        while node is not root:
+            memory_size -= 1
+            node.in_open = False
+            node.version += 1
+            if in_memory.get(node.state) is node:
+                del in_memory[node.state]
+            parent = node.parent
+            parent.children.remove(node)
+            if node.f != inf:
+                sequence += 1
+                heapq.heappush(parent.forgotten, (node.f, sequence, node.action))
+            open_node(parent)
+            back_up(parent)
+            if parent is keep or parent.children or parent.in_open: return
+            parent.f = inf
+            node = parent
+        root.f = inf
+
+    open_node(root)
+    while best_heap and root.f != inf:
+        f, _, _, version, node = heapq.heappop(best_heap)
+        if not node.in_open or version != node.version: continue # outdated entry
+        if node.unexplored is None:
+            # This is the first time the node is selected so we check if it is the goal before generating its successors
+            expanded += 1
+            if problem.is_goal(node.state):
+                path = []
+                while node.parent is not None:
+                    path.append(node.action)
+                    node = node.parent
+                path.reverse()
+                if stats is not None:
+                    _report(stats, search_start, generated, expanded, peak_memory)
+                return path
+            if node.depth < max_depth:
+                node.unexplored = list(problem.get_actions(node.state))
+                node.unexplored.reverse() # so that pop() returns the actions in their original order
+            else:
+                node.unexplored = [] # its successors would not fit in memory
+        # Generate the next successor that is worth keeping in memory (the forgotten one with the lowest f-value first)
+        child = None
+        while child is None and node.next_f() != inf:
+            # Free memory for the successor by deleting the worst leaves (the selected node is kept)
+            # There is always a leaf to delete since the path to the selected node is shorter than the budget
+            # It is done before the action is chosen: the deleted children of the node go back to its forgotten heap
+            # and the f-values backed up while deleting must still count the successor that is about to be generated
+            skipped = []
+            while memory_size >= node_budget and worst_heap:
+                entry = heapq.heappop(worst_heap)
+                leaf = entry[-1]
+                if not leaf.in_open or entry[3] != leaf.version: continue
+                if leaf is root or leaf is node or leaf.children:
+                    skipped.append(entry) # an open node that still has children in memory is not a leaf
+                    continue
+                forget(leaf, keep=node)
+            for entry in skipped:
+                heapq.heappush(worst_heap, entry)
+            if node.forgotten and (not node.unexplored or node.forgotten[0][0] <= node.base_f):
+                forgotten_f, _, action = heapq.heappop(node.forgotten)
+            else:
+                forgotten_f, action = 0, node.unexplored.pop()
+            next_state = problem.get_successor(node.state, action)
+            next_g = node.g + problem.get_cost(node.state, action)
+            # Skip the successor if memory already holds a path to it that is as cheap and not deeper (this also covers the ancestors)
+            # Any continuation of the skipped path also fits in memory after the other one, and if the other one is deleted
+            # its parent remembers its f-value so it can be regenerated. A deeper copy is not enough: its continuations
+            # may not fit in memory, so the successor would be lost since a skipped successor is not remembered.
+            other = in_memory.get(next_state)
+            if other is not None and other.g <= next_g and other.depth <= node.depth + 1: continue
+            # pathmax keeps the f-values monotonic and a regenerated successor gets back the f-value it had before
+            next_f = max(node.f, next_g + heuristic(problem, next_state), forgotten_f)
+            if next_f == inf: continue # the heuristic says the goal can not be reached from there
+            child = _MemoryBoundedNode(next_state, node, action, next_g, next_f, node.depth + 1)
+            node.children.append(child)
+            other = in_memory.get(next_state)
+            if other is None or next_g < other.g or (next_g == other.g and child.depth < other.depth):
+                in_memory[next_state] = child
+            memory_size += 1
+            generated += 1
+            if memory_size > peak_memory: peak_memory = memory_size
+            open_node(child)
+        open_node(node)
+        back_up(node)
+        if child is None and not node.children:
+            # A node without any successor in memory or to generate is a dead end
+            node.f = inf
+            forget(node)
+    # No solution found within the memory budget
+    if stats is not None:
+        _report(stats, search_start, generated, expanded, peak_memory)
+    return None
+
+# A search function of a portfolio and the bound it guarantees on the cost of its path
+# (the cost of the path it returns is at most "bound" times the optimal cost, infinity means that there is no guarantee)
+# Informed members are called with the heuristic and the others are called without it
+@dataclass(frozen=True)
+class PortfolioMember:
+    name: str
+    search_fn: Callable[..., Solution]
+    bound: float = 1.0
+    informed: bool = True
+
+# The portfolio used by PortfolioSearch if none is given
+DEFAULT_PORTFOLIO: Tuple[PortfolioMember, ...] = (
+    PortfolioMember("astar", AStarSearch, 1.0),
+    PortfolioMember("wastar", partial(WeightedAStarSearch, weight=2.0), 2.0),
+    PortfolioMember("gbfs", BestFirstSearch, float('inf')),
+    PortfolioMember("ucs", UniformCostSearch, 1.0, informed=False),
+)
+
+# Runs a single member of a portfolio (in its own process) and sends its result back through the queue
+def _run_portfolio_member(index: int, member: PortfolioMember, problem: Problem[S, A], initial_state: S,
+                          heuristic: Optional[HeuristicFunction], results: Any) -> None:
+    stats = SearchStats()
+    try:
+        if member.informed:
+            path = member.search_fn(problem, initial_state, heuristic, stats=stats)
+        else:
+            path = member.search_fn(problem, initial_state, stats=stats)
+        results.put((index, path, stats, None))
+    except Exception as error:
+        results.put((index, None, stats, f"{type(error).__name__}: {error}"))
+
+# Runs the members of the portfolio in parallel (one process each) and returns the result of the first one to finish
+# Only the members whose bound is within the requested "bound" are run so any result they return is acceptable
+# and the other processes are terminated as soon as it arrives. If no heuristic is given, only the uninformed members are run.
+# It has the same signature as the other search functions so it can be used as the search function of
+# an UninformedSearchAgent (without the heuristic) or an InformedSearchAgent.
+# The problem, the heuristic and the search functions are shared with the processes by forking where it is available,
+# otherwise (e.g. on Windows) they must be picklable.
+# NOTE: the searches run in other processes so the calls they make (e.g. to is_goal) are not tracked in this process.
+def PortfolioSearch(problem: Problem[S, A], initial_state: S, heuristic: Optional[HeuristicFunction] = None,
+                    members: Sequence[PortfolioMember] = DEFAULT_PORTFOLIO, bound: float = float('inf'),
+                    stats: Optional[SearchStats] = None) -> Solution:
+    search_start = time.perf_counter()
+    candidates = [member for member in members if member.bound <= bound and (heuristic is not None or not member.informed)]
+    if not candidates:
+        raise ValueError(f"No search in the portfolio guarantees a bound of {bound}" + ("" if heuristic is not None else " without a heuristic"))
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_run_portfolio_member, args=(index, member, problem, initial_state, heuristic, results), daemon=True)
+        for index, member in enumerate(candidates)
+    ]
+    errors = []
+    try:
+        for process in processes:
+            process.start()
+        remaining = len(processes)
+        while remaining > 0:
+            try:
+                index, path, member_stats, error = results.get(timeout=0.1)
+            except queue.Empty:
+                # Stop waiting if every process died without sending a result
+                if not any(process.is_alive() for process in processes) and results.empty(): break
+                continue
+            remaining -= 1
+            if error is not None:
+                errors.append(f"{candidates[index].name}: {error}")
+                continue
+            if stats is not None:
+                stats.merge(member_stats)
+                stats.add_phase_time("portfolio", time.perf_counter() - search_start)
+            return path
+    finally:
+        for process in processes:
+            if process.is_alive(): process.terminate()
+        for process in processes:
+            process.join()
+    raise RuntimeError("Every search in the portfolio failed:\n" + "\n".join(errors))
@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, Optional
+import json, subprocess, time
+
+from problem import HeuristicFunction, Problem, S, A
+
+# This file contains the statistics object that the search functions can optionally fill in
+# Every search function in search.py accepts a "stats" keyword argument; if it is None (the default), nothing is recorded.
+# The counters are accumulated, so passing the same object to multiple searches (e.g. the searches done by an agent) sums them.
+@dataclass
+class SearchStats:
+    nodes_generated: int = 0        # The number of search nodes created (including the initial one)
+    nodes_expanded: int = 0         # The number of nodes removed from the frontier and expanded
+    stale_pops: int = 0             # The number of outdated frontier entries that were popped and skipped
+    reopenings: int = 0             # The number of already expanded states that were put back in the frontier with a cheaper path
+    peak_frontier_size: int = 0     # The largest size reached by the frontier
+    heuristic_calls: int = 0        # The number of heuristic evaluations
+    heuristic_time: float = 0.0     # The time spent inside the heuristic (in seconds)
+    searches: int = 0               # The number of searches that reported to this object
+    phase_times: Dict[str, float] = field(default_factory=dict) # The wall time of each phase (in seconds)
+
+    # Adds the elapsed time of the code inside the "with" block to the given phase
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase_time(name, time.perf_counter() - start)
+
+    def add_phase_time(self, name: str, elapsed: float) -> None:
+        self.phase_times[name] = self.phase_times.get(name, 0.0) + elapsed
+
+    # Returns a heuristic that behaves exactly like the given one but counts and times its calls
+    def timed_heuristic(self, heuristic: HeuristicFunction) -> HeuristicFunction:
+        def timed(problem: Problem[S, A], state: S) -> float:
+            start = time.perf_counter()
+            value = heuristic(problem, state)
+            self.heuristic_time += time.perf_counter() - start
+            self.heuristic_calls += 1
+            return value
+        return timed
+
+    # Records the size of a frontier that does not track its own peak
+    def observe_frontier(self, size: int) -> None:
+        if size > self.peak_frontier_size:
+            self.peak_frontier_size = size
+
+    # Adds the counters of another stats object (e.g. one filled in by another process) to this one
+    def merge(self, other: 'SearchStats') -> None:
+        self.nodes_generated += other.nodes_generated
+        self.nodes_expanded += other.nodes_expanded
+        self.stale_pops += other.stale_pops
+        self.reopenings += other.reopenings
+        self.observe_frontier(other.peak_frontier_size)
+        self.heuristic_calls += other.heuristic_calls
+        self.heuristic_time += other.heuristic_time
+        self.searches += other.searches
+        for name, elapsed in other.phase_times.items():
+            self.add_phase_time(name, elapsed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    # Writes the statistics (and any extra information such as the level or the agent) to a json file
+    def save(self, path: str, **metadata: Any) -> None:
+        with open(path, 'w') as f:
+            json.dump({**metadata, "stats": self.to_dict()}, f, indent=2)
+
+    def __str__(self) -> str:
+        lines = [
+            f"Nodes generated: {self.nodes_generated}",
+            f"Nodes expanded: {self.nodes_expanded}",
+            f"Stale pops: {self.stale_pops}",
+            f"Re-openings: {self.reopenings}",
+            f"Peak frontier size: {self.peak_frontier_size}",
+            f"Heuristic calls: {self.heuristic_calls} ({self.heuristic_time:.4f} seconds)",
+        ]
+        lines += [f"Phase '{name}': {elapsed:.4f} seconds" for name, elapsed in self.phase_times.items()]
+        return '\n'.join(lines)
+
+# Returns the hash of the current git commit (if any) so that exported statistics can be compared across commits
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
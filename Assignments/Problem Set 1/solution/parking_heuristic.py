@@ -0,0 +1,58 @@
+from typing import List, Optional, Tuple
+from parking import ParkingProblem, ParkingState
+from mathutils import Direction
+from importlib import util as ilu
+import os
+
+# This file contains the same heuristic as parking_heuristic.py in the problem set folder
+# Every car has to drive at least from its cell to its slot and, since every action moves a single car,
+# the sum of the cheapest drive of every car is a lower bound on the cost of solving the level (it is admissible).
+# The cheapest drive of a car ignores the other cars but it uses the costs of the problem:
+#   entering a cell costs 1, or 101 if it is the slot of another car
+# The ParkingProblem of this folder stores points (a set of passages and a dictionary of slots) instead of cell tables,
+# so the tables used by the other file are derived from it first, then the distances are computed by the same code.
+
+# The other file has the same module name as this one, so it is loaded from its path
+_spec = ilu.spec_from_file_location("_local_parking_heuristic", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "parking_heuristic.py"))
+_local_heuristic = ilu.module_from_spec(_spec)
+_spec.loader.exec_module(_local_heuristic)
+
+# Returns the tables of the level where the cell (x, y) has the index "y * width + x":
+#   moves[cell] contains a (direction, next cell) pair for every direction that does not lead into a wall
+#   slot_owners[cell] is the index of the car whose slot is on this cell (-1 if there is no slot)
+#   goal_cells is the cell of the slot of every car (None if a car has no slot)
+def cell_tables(problem: ParkingProblem) -> Tuple[List[Tuple[Tuple[Direction, int], ...]], List[int], Optional[Tuple[int, ...]]]:
+    width, size = problem.width, problem.width * problem.height
+    cell = lambda point: point.y * width + point.x
+    moves: List[Tuple[Tuple[Direction, int], ...]] = [()] * size
+    for position in problem.passages:
+        moves[cell(position)] = tuple(
+            (direction, cell(position + direction.to_vector())) for direction in Direction
+            if position + direction.to_vector() in problem.passages
+        )
+    slot_owners = [-1] * size
+    for position, car in problem.slots.items():
+        slot_owners[cell(position)] = car
+    slots = {car: cell(position) for position, car in problem.slots.items()}
+    goal_cells = tuple(slots[car] for car in range(len(problem.cars))) if all(car in slots for car in range(len(problem.cars))) else None
+    return moves, slot_owners, goal_cells
+
+# Returns a list where entry 'i' contains the cost of driving car 'i' from every cell to its slot (infinity if it can not reach it)
+# If a car has no slot, it returns None
+def slot_distance_maps(problem: ParkingProblem) -> Optional[List[List[float]]]:
+    moves, slot_owners, goal_cells = cell_tables(problem)
+    if goal_cells is None:
+        return None
+    return _local_heuristic.slot_distances(moves, slot_owners, goal_cells, problem.width * problem.height, len(problem.cars))
+
+def strong_heuristic(problem: ParkingProblem, state: ParkingState) -> float:
+    # The maps only depend on the level so they are computed once and stored in the problem's cache
+    cache = problem.cache()
+    if "slot_distance_maps" not in cache:
+        cache["slot_distance_maps"] = slot_distance_maps(problem)
+    maps = cache["slot_distance_maps"]
+    # If a car has no slot, the goal can not be reached
+    if maps is None:
+        return float('inf')
+    width = problem.width
+    return sum(distances[position.y * width + position.x] for distances, position in zip(maps, state))
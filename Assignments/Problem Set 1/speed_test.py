@@ -1,28 +1,172 @@
 import time
+from typing import Callable, Dict, Iterable, Optional
 
-# This speed test approximates PI
-# by integrating the arc length of the function sqrt(1 - x^2) over x in [0, 1] to get PI/2
+# The speed test measures a few short kernels that represent the work done by the problem sets
+# (dictionary/set hashing, heap operations, object allocation and recursion) and compares them with the grading machine.
+# Each kernel gives its own multiplier and each problem in "testcases/problems.json" can pick the kernels it depends on
+# using a "profile" (a list of kernel names). The multipliers are cached per host in "time_config.json".
 
-start = time.time()
+# The number of times each kernel is run (the fastest run is kept to ignore the noise from other processes)
+REPEATS = 3
 
-steps = int(1e7)
-arc_length = 0
+def hashing_test(size: int = int(3e4), verbose: bool = False) -> float:
+    # Counts tuple keys in a dictionary, adds them to a set then looks up the transposed keys (half of them are missing)
+    start = time.perf_counter()
 
-x, y = 0, 1
-for index in range(1, steps+1):
-    new_x = index / steps
-    new_y = (1 - new_x * new_x) ** 0.5
-    
-    dx = new_x - x
-    dy = new_y - y
-    
-    arc_length += (dx * dx + dy * dy) ** 0.5
-    
-    x, y = new_x, new_y
+    counts, seen = {}, set()
+    for index in range(size):
+        key = (index % 300, index // 300)
+        counts[key] = counts.get(key, 0) + 1
+        seen.add(key)
+    hits = 0
+    for index in range(size):
+        if (index // 300, index % 300) in seen: hits += 1
 
-pi = 2 * arc_length
+    elapsed = time.perf_counter() - start
 
-elapsed = time.time() - start
+    if verbose: print(f"Hashing Test: Done in {elapsed} seconds")
 
-print(f"PI Estimation in {steps} steps: {pi}")
-print(f"Done in {elapsed} seconds")
\ No newline at end of file
+    return elapsed
+
+def heap_test(size: int = int(1.5e4), verbose: bool = False) -> float:
+    # Pushes (priority, index) pairs in random order into a heap then pops all of them (like a search frontier)
+    import heapq, random
+
+    random.seed(123)
+    priorities = [random.random() for _ in range(size)]
+
+    start = time.perf_counter()
+
+    heap = []
+    for index, priority in enumerate(priorities):
+        heapq.heappush(heap, (priority, index))
+    while heap:
+        heapq.heappop(heap)
+
+    elapsed = time.perf_counter() - start
+
+    if verbose: print(f"Heap Test: Done in {elapsed} seconds")
+
+    return elapsed
+
+# A small object like the nodes and states created by the searches
+class _Node:
+    __slots__ = ("state", "parent", "actions")
+    def __init__(self, state, parent, actions) -> None:
+        self.state = state
+        self.parent = parent
+        self.actions = actions
+
+def allocation_test(size: int = int(3e4), verbose: bool = False) -> float:
+    # Builds a linked chain of small objects that each own a small list and a tuple
+    start = time.perf_counter()
+
+    node = None
+    for index in range(size):
+        node = _Node((index, index), node, [index, index])
+
+    elapsed = time.perf_counter() - start
+
+    if verbose: print(f"Allocation Test: Done in {elapsed} seconds")
+
+    return elapsed
+
+def _fibonacci(n: int) -> int:
+    return n if n < 2 else _fibonacci(n - 1) + _fibonacci(n - 2)
+
+def recursion_test(n: int = 25, verbose: bool = False) -> float:
+    # Computes a fibonacci number with the naive recursion (mostly the cost of function calls)
+    start = time.perf_counter()
+
+    _fibonacci(n)
+
+    elapsed = time.perf_counter() - start
+
+    if verbose: print(f"Recursion Test: Done in {elapsed} seconds")
+
+    return elapsed
+
+KERNELS: Dict[str, Callable[..., float]] = {
+    "hashing": hashing_test,
+    "heap": heap_test,
+    "allocation": allocation_test,
+    "recursion": recursion_test,
+}
+
+# The time of each kernel (with the default sizes) on the grading machine
+# They were derived from the references of the previous speed test (12 seconds for the 1e7 steps math test
+# and 24 seconds for sorting 1e7 numbers): the kernels and the old tests were timed alternately on the same machine
+# and each kernel time was divided by the old multiplier (the median over 7 rounds), so the limits stay the same on average
+reference_times = {
+    "hashing": 0.059,
+    "heap": 0.055,
+    "allocation": 0.078,
+    "recursion": 0.049,
+}
+
+def warm_up():
+    hashing_test(int(1e3))
+    heap_test(int(1e3))
+    allocation_test(int(1e3))
+    recursion_test(10)
+
+# Identifies the machine and the python version since the multipliers of one do not apply to the other
+def host_fingerprint() -> str:
+    import platform
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo", 'r') as f:
+            for line in f:
+                if line.startswith("model name"):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{cpu} | {platform.python_implementation()} {platform.python_version()}"
+
+def speed_test() -> Dict[str, float]:
+    multipliers = {}
+    for name, kernel in KERNELS.items():
+        elapsed = min(kernel() for _ in range(REPEATS))
+        print(f"{name.capitalize()} Test: Done in {elapsed} seconds")
+        multipliers[name] = elapsed / reference_times[name]
+    return multipliers
+
+# Returns the multiplier of every kernel for this host (measured once and saved in the config file)
+def get_kernel_multipliers(overwrite: bool = False) -> Dict[str, float]:
+    import os, json
+    file_name = "time_config.json"
+    fingerprint = host_fingerprint()
+    hosts = {}
+    if os.path.exists(file_name):
+        try:
+            hosts = json.load(open(file_name, 'r')).get("hosts", {})
+        except (ValueError, AttributeError):
+            hosts = {}
+    multipliers = hosts.get(fingerprint)
+    if overwrite or multipliers is None or set(multipliers) != set(KERNELS):
+        print("Measuring the speed of your machine...")
+        warm_up()
+        multipliers = speed_test()
+        multiplier = profile_multiplier(multipliers)
+        if multiplier < 1:
+            print(f"Your machine is {1.0/multiplier} times faster than the grading machine. Time limits will be decreased accordingly.")
+        elif multiplier > 1:
+            print(f"Your machine is {multiplier} time slower than the grading machine. Time limits will be increased accordingly.")
+        hosts[fingerprint] = multipliers
+        json.dump({'hosts': hosts}, open(file_name, 'w'), indent=2)
+    return multipliers
+
+# Combines the multipliers of the kernels in the profile (all the kernels if the profile is None)
+def profile_multiplier(multipliers: Dict[str, float], profile: Optional[Iterable[str]] = None) -> float:
+    names = list(KERNELS if profile is None else profile)
+    for name in names:
+        if name not in multipliers:
+            raise ValueError(f"Unknown speed test kernel '{name}', expected one of {', '.join(KERNELS)}")
+    return sum(multipliers[name] for name in names) / len(names)
+
+def get_time_limit_multiplier(overwrite: bool = False, profile: Optional[Iterable[str]] = None) -> float:
+    return profile_multiplier(get_kernel_multipliers(overwrite), profile)
+
+if __name__ == "__main__":
+    get_time_limit_multiplier(overwrite=True)
@@ -1,9 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from copy import deepcopy
 from typing import Iterable, List, Optional, Set, Tuple
 from enum import Enum
 
-from mathutils import Direction, Point
+from mathutils import Direction, NeighborTable, Point
 from game import Game
 from helpers.utils import track_call_count
 from helpers.mt19937 import RandomGenerator
@@ -25,12 +25,18 @@ class DungeonTile(str, Enum):
     KEY = "K"
 
 # Dungeon layout specifies the walkable locations and the exit location
+# The neighbor table is built from the walkable locations so the game can move the player and the monsters
+# without creating a new Point for every move (see NeighborTable)
 @dataclass
 class DungeonLayout:
     width: int
     height: int
     walkable: Set[Point]
     exit: Point
+    neighbors: NeighborTable = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.neighbors = NeighborTable.from_walkable(self.walkable)
 
     def __deepcopy__(self, memo):
         return self
@@ -138,26 +144,25 @@ class DungeonGame(Game[DungeonState, Direction]):
     def get_actions(self, state: DungeonState) -> Iterable[Direction]:
         if state.turn == 0:
             # Find an return actions to be done by the player
-            position_position = state.player.position
-            positions = ((direction, position_position + direction.to_vector()) for direction in Direction)
-            # prevent the player from getting into a wall
-            return [direction for direction, position in positions if position in state.layout.walkable]
+            # prevent the player from getting into a wall (the neighbor table has None for the walls)
+            neighbors = state.layout.neighbors[state.player.position]
+            return [direction for direction, position in zip(Direction, neighbors) if position is not None]
         else:
             # Find an return actions to be done by a monster
             index = state.turn - 1
             if not state.monsters[index].alive: return []
             monster_locations = {monster.position for i, monster in enumerate(state.monsters) if i != index and monster.alive} 
-            monster_position = state.monsters[index].position
-            positions = ((direction, monster_position + direction.to_vector()) for direction in Direction)
+            neighbors = state.layout.neighbors[state.monsters[index].position]
             # prevent the monster from getting into a wall or another monster
-            return [direction for direction, position in positions if position in state.layout.walkable and position not in monster_locations]
+            return [direction for direction, position in zip(Direction, neighbors) if position is not None and position not in monster_locations]
 
+    # The new positions are read from the neighbor table (the actions returned by get_actions never lead into a wall)
     def get_successor(self, state: DungeonState, action: Direction) -> DungeonState:
         state = deepcopy(state)
         current_turn = state.turn
         if current_turn == 0:
             # This action is done by the player
-            new_position = state.player.position + action.to_vector()
+            new_position = state.layout.neighbors[state.player.position][action]
             state.player.position = new_position
             if new_position in state.coins:
                 # If we walk over a coin, we take it
@@ -186,7 +191,7 @@ class DungeonGame(Game[DungeonState, Direction]):
         else:
             # This action is done by a monster
             monster = state.monsters[current_turn - 1]
-            new_position = monster.position + action.to_vector()
+            new_position = state.layout.neighbors[monster.position][action]
             monster.position = new_position
             if new_position == state.player.position:
                 if state.player.inventory.daggers != 0:
@@ -215,19 +220,20 @@ class DungeonGame(Game[DungeonState, Direction]):
         for y, line in enumerate(lines):
             for x, char in enumerate(line):
                 if char != DungeonTile.WALL:
-                    walkable.add(Point(x, y))
+                    position = Point(x, y)
+                    walkable.add(position)
                     if char == DungeonTile.PLAYER:
-                        player = Point(x, y)
+                        player = position
                     elif char == DungeonTile.COIN:
-                        coins.add(Point(x, y))
+                        coins.add(position)
                     elif char == DungeonTile.KEY:
-                        keys.add(Point(x, y))
+                        keys.add(position)
                     elif char == DungeonTile.MONSTER:
-                        monsters.append(Monster(Point(x, y), True))
+                        monsters.append(Monster(position, True))
                     elif char == DungeonTile.DAGGER:
-                        daggers.add(Point(x, y))
+                        daggers.add(position)
                     elif char == DungeonTile.EXIT:
-                        exit = Point(x, y)
+                        exit = position
         problem = DungeonGame()
         problem.layout = DungeonLayout(width, height, walkable, exit)
         player = Player(player, True, Player.Inventory(0, 0, 0))
@@ -291,9 +297,8 @@ def compute_path(game: DungeonGame, p1: Point, p2: Point) -> List[Point]:
         while queue:
             parent = queue.popleft()
             path = path_map[parent]
-            for direction in Direction:
-                child = parent + direction.to_vector()
-                if child in path_map or child not in game.layout.walkable:
+            for child in game.layout.neighbors[parent]:
+                if child is None or child in path_map:
                     continue
                 path_map[child] = path + [child]
                 queue.append(child)
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import Iterator
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 import math
 
 # the class Point will hold a 2D coordinate on a discrete grid
@@ -67,4 +67,34 @@ Direction._Vectors = [
     Point(-1,  0),
     Point( 0,  1),
     Point( 0,  0)
-]
\ No newline at end of file
+]
+
+# The neighbor table of a grid is a dictionary that maps every walkable point to the tuple of the points
+# reached by moving in each direction (indexed by the direction), so "table[point][direction]" replaces
+# "point + direction.to_vector()" and the walkable check without creating a new Point on every move.
+# A move into a wall gives None, or the point itself if stay_on_walls is True.
+# The table shares its points: every walkable coordinate has a single Point object (the one given in walkable)
+# which is used as the key, in the neighbors of the other points and returned by "table.point(x, y)",
+# so the table does not hold many copies of the same coordinate and the points are freed with the table.
+class NeighborTable(Dict[Point, Tuple[Optional[Point], ...]]):
+    points: Dict[Point, Point] # Maps every walkable point to its shared Point
+
+    # Returns the shared Point of the given coordinate (a new Point if the coordinate is not walkable)
+    def point(self, x: int, y: int) -> Point:
+        point = Point(x, y)
+        return self.points.get(point, point)
+
+    @staticmethod
+    def from_walkable(walkable: Iterable[Point], stay_on_walls: bool = False) -> 'NeighborTable':
+        table = NeighborTable()
+        table.points = points = {point: point for point in walkable}
+        for point in points:
+            neighbors = []
+            for direction in Direction:
+                neighbor = points.get(point + direction.to_vector())
+                if neighbor is not None:
+                    neighbors.append(neighbor)
+                else:
+                    neighbors.append(point if stay_on_walls else None)
+            table[point] = tuple(neighbors)
+        return table
@@ -1,7 +1,7 @@
 from typing import Dict, List, Optional, Set, Tuple
 from mdp import MarkovDecisionProcess
 from environment import Environment
-from mathutils import Point, Direction
+from mathutils import NeighborTable, Point, Direction
 from helpers.mt19937 import RandomGenerator
 import json
 
@@ -13,6 +13,7 @@ class GridMDP(MarkovDecisionProcess[Point, Direction]):
     terminals: Set[Point] # A set of positions where the episode would end when the player reaches it
     rewards: Dict[Point, float] # The reward of each position
     noise: float # The action noise, aka the probability of steering left or right of the intended direction
+    neighbors: NeighborTable # The position reached by moving in each direction from every walkable position (itself if it is a wall)
 
     def __init__(self, 
             size: Tuple[int, int], 
@@ -26,6 +27,7 @@ class GridMDP(MarkovDecisionProcess[Point, Direction]):
         self.terminals = terminals
         self.rewards = rewards
         self.noise = noise
+        self.neighbors = NeighborTable.from_walkable(walkable, stay_on_walls=True)
 
     # Returns all possible states (where there is no walls)
     def get_states(self) -> List[Point]:
@@ -53,16 +55,22 @@ class GridMDP(MarkovDecisionProcess[Point, Direction]):
             (action.rotate(3), 0.5 * self.noise)
         ]
         states = {}
+        # The neighbor table already keeps the player in place if it moves into a wall
+        neighbors = self.neighbors.get(state)
         for direction, prob in noisy_actions:
-            next_state = state + direction.to_vector()
-            if next_state not in self.walkable: next_state = state
+            if neighbors is not None:
+                next_state = neighbors[direction]
+            else:
+                # The state is not walkable so it is not in the table, the player stays in place if it moves into a wall
+                next_state = state + direction.to_vector()
+                if next_state not in self.walkable: next_state = state
             if next_state in states: states[next_state] += prob
             else: states[next_state] = prob
         return states
     
     def parse_state(self, string: str) -> Point:
         x, y = eval(string)
-        return Point(x, y)
+        return self.neighbors.point(x, y)
     
     def format_state(self, state: Point) -> str:
         return str(state)